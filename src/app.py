@@ -4,7 +4,15 @@ This script:
 - sets up logging
 - defines the top-level Tk widget that everything is gridded on to
 - runs the top-level Tk widget
+
+The tabs are built the first time they are selected (see LazyTab), and their
+modules are imported at the same time, so the plotting stack (matplotlib,
+mplcursors) and the exercise sets aren't loaded before the window appears.
+How long each startup step takes is logged at INFO level.
 """
+import time
+STARTUP_START = time.perf_counter()
+
 import json
 import logging.config
 from tkinter import Tk
@@ -13,12 +21,10 @@ import sys
 
 from screeninfo import get_monitors
 
-from sql_utility import create_tables
-from src.ui.tab_export_sets import TabExportSets
-from src.ui.tab_view_edit_sets import TabViewEditSets
-from src.ui.tab_import_sets import TabImportSets
-from src.ui.tab_progress_plots import TabProgressPlots
-from src.ui.tab_training_arcs import TabTrainingArcs
+from src.events import bus
+from src.plot_renderer import renderer
+from src.sql_utility import create_tables, db, writer
+from src.ui.lazy_tab import LazyTab
 
 
 # LOAD + CONFIGURE LOGGER
@@ -40,12 +46,20 @@ from src.ui.tab_training_arcs import TabTrainingArcs
 # In order to see DEBUG messages, you need to manually update one of the
 #  handlers in logging_config.json. None of the handlers enable this by default
 #  to reduce clutter.
-with open("logging_config.json", "r") as f:
-    config = json.load(f)
-
-logging.config.dictConfig(config)
+#
+# The logging is configured in configure_logging, under the __main__ guard:
+#  the worker processes of the plot renderer and of batch imports are spawned,
+#  so they import this module as __mp_main__, and must not open their own
+#  handlers on the log file.
 logger = logging.getLogger()  # root logger
 
+def configure_logging():
+    """Configure logging from logging_config.json, and log uncaught exceptions."""
+    with open("logging_config.json", "r") as f:
+        config = json.load(f)
+    logging.config.dictConfig(config)
+    sys.excepthook = log_uncaught_exceptions
+
 def log_uncaught_exceptions(exc_type, exc_value, exc_traceback):
     if issubclass(exc_type, KeyboardInterrupt):
         # Don't log Ctrl+C
@@ -53,7 +67,41 @@ def log_uncaught_exceptions(exc_type, exc_value, exc_traceback):
         return
     logger.critical("Uncaught exception", exc_info=(exc_type, exc_value, exc_traceback))
 
-sys.excepthook = log_uncaught_exceptions
+
+def log_startup_time(step: str) -> None:
+    """Log how long after the start of the app a startup step finished."""
+    logger.info(f"Startup: {step} after {time.perf_counter() - STARTUP_START:.3f} s")
+
+
+# Functions that build each tab, in notebook order. The tab modules are
+# imported inside them, so their imports are deferred until the tab is built.
+def build_tab_progress_plots(parent, app):
+    from src.ui.tab_progress_plots import TabProgressPlots
+    return TabProgressPlots(parent, app.mpl_scale)
+
+def build_tab_view_edit_sets(parent, app):
+    from src.ui.tab_view_edit_sets import TabViewEditSets
+    return TabViewEditSets(parent)
+
+def build_tab_import_sets(parent, app):
+    from src.ui.tab_import_sets import TabImportSets
+    return TabImportSets(parent, app.screen_height_px)
+
+def build_tab_export_sets(parent, app):
+    from src.ui.tab_export_sets import TabExportSets
+    return TabExportSets(parent)
+
+def build_tab_training_arcs(parent, app):
+    from src.ui.tab_training_arcs import TabTrainingArcs
+    return TabTrainingArcs(parent)
+
+TABS = [
+    ("Progress Plots", build_tab_progress_plots),
+    ("View & Edit Sets", build_tab_view_edit_sets),
+    ("Import Sets", build_tab_import_sets),
+    ("Export Sets", build_tab_export_sets),
+    ("Training Arcs", build_tab_training_arcs),
+]
 
 
 class LiftLog(Tk):
@@ -75,6 +123,7 @@ class LiftLog(Tk):
         # If the screen isn't 1920x1080, we can use the scale to adjust the
         # size + fonts of the MPL plots so they display nicely.
         self.mpl_scale = min(screen_width_px / 1920, screen_height_px / 1080)
+        self.screen_height_px = screen_height_px
 
         # The app looks consistently best at full screen, so make that the
         # default dimensions
@@ -82,37 +131,36 @@ class LiftLog(Tk):
 
         # Initialize SQLite data first.
         create_tables()
+        # Deliver data change events to the tabs, on this thread.
+        bus.attach(self)
+
+        log_startup_time("SQLite ready")
 
-        # Init main notebook and tabs. Each notebook tab is a frame.
+        # Init main notebook and tabs. Each notebook tab is a frame. The tabs
+        # are empty placeholders until they are selected.
         main_notebook = ttk.Notebook(self)
-        self.tab_progress_plots = TabProgressPlots(main_notebook, self.mpl_scale)
-        self.tab_view_edit_sets = TabViewEditSets(main_notebook)
-        self.tab_import_sets = TabImportSets(main_notebook, screen_height_px)
-        self.tab_export_sets = TabExportSets(main_notebook)
-        self.tab_training_arcs = TabTrainingArcs(main_notebook)
+        self.tabs = {name: LazyTab(main_notebook, name, lambda parent, build=build: build(parent, self))
+                     for name, build in TABS}
 
         # Define layout. For the frames to stretch:
         # - specify sticky when gridding AND
         # - specify weight on the parent's rows and columns!!
         main_notebook.grid(row=0, column=0, sticky='NSEW')
-        self.tab_progress_plots.grid(row=0, column=0, sticky='NSEW')
-        self.tab_view_edit_sets.grid(row=0, column=0, sticky='NSEW')
-        self.tab_import_sets.grid(row=0, column=0, sticky='NSEW')
-        self.tab_export_sets.grid(row=0, column=0, sticky='NSEW')
-        self.tab_training_arcs.grid(row=0, column=0, sticky='NSEW')
 
         # This Tk widget is configured to resize as the window resizes.
         #  Any frames placed on it can configure its own row/col resizing.
         self.rowconfigure(0, weight=1)
         self.columnconfigure(0, weight=1)
 
-        main_notebook.add(self.tab_progress_plots, text="Progress Plots")
-        main_notebook.add(self.tab_view_edit_sets, text="View & Edit Sets")
-        main_notebook.add(self.tab_import_sets, text="Import Sets")
-        main_notebook.add(self.tab_export_sets, text="Export Sets")
-        main_notebook.add(self.tab_training_arcs, text="Training Arcs")
+        for name, lazy_tab in self.tabs.items():
+            lazy_tab.grid(row=0, column=0, sticky='NSEW')
+            main_notebook.add(lazy_tab, text=name)
 
+        # The first tab is selected by default. It's built once the main loop
+        # runs, so the window is shown before the tab is built.
         main_notebook.bind('<<NotebookTabChanged>>', self.on_tab_change)
+        self.after_idle(log_startup_time, "main loop started")
+        self.after_idle(lambda: self.tabs[main_notebook.tab('current')['text']].build())
 
     # This is needed for full exception logging: sometimes Tkinter swallows exceptions.
     def report_callback_exception(self, exc_type, exc_value, exc_traceback):
@@ -121,17 +169,17 @@ class LiftLog(Tk):
         # messagebox.showerror("Error", str(exc_value))
 
     # Tab change events.
+    # Built tabs keep themselves up to date through the event bus (see
+    # RefreshWhenShown), so a tab change only has to build new tabs.
     def on_tab_change(self, event):
-        tab = event.widget.tab('current')['text']
-        if tab == "Progress Plots":
-            self.tab_progress_plots.update_exercises()
-        elif tab == "View & Edit Sets":
-            self.tab_view_edit_sets.update_sheet()
-        elif tab == "Training Arcs":
-            self.tab_training_arcs.update_exercises()
+        self.tabs[event.widget.tab('current')['text']].build()
 
 if __name__ == '__main__':
+    configure_logging()
     logger.info("App started")
     lift_log = LiftLog()
     lift_log.mainloop()
+    writer.shutdown()  # let queued writes finish
+    renderer.shutdown()
+    db.close_all()
     logger.info("App closed\n")
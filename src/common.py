@@ -1,9 +1,14 @@
 """
 Common utility functions for the project.
 """
+import collections
+from concurrent.futures import Future
 import hashlib
-from tkinter import END, Text
+import queue
+import re
+from tkinter import END, Misc, Text
 from tkinter import ttk
+from typing import Callable
 import zlib
 
 ALL = 'all'
@@ -35,26 +40,236 @@ def hash_html(content: str) -> str:
     """
     return hashlib.sha256(content.encode('utf-8')).hexdigest()
 
-def compress_html(content: str) -> bytes:
+# zlib can only refer back 32 KB, so a preset dictionary longer than that is
+# never used.
+ZDICT_MAX_SIZE = 32 * 1024
+
+# Preset dictionary used until one is trained from the user's own imports.
+# It's made of the boilerplate every Apple Notes export shares. Text near the
+# end of a dictionary is the cheapest to refer to, so the lines that repeat
+# the most go last.
+DEFAULT_ZDICT = """<!DOCTYPE html PUBLIC "-//W3C//DTD HTML 4.01//EN" "http://www.w3.org/TR/html4/strict.dtd">
+<html>
+<head>
+  <meta http-equiv="Content-Type" content="text/html; charset=utf-8">
+  <meta http-equiv="Content-Style-Type" content="text/css">
+  <title></title>
+  <meta name="Generator" content="Cocoa HTML Writer">
+  <meta name="CocoaVersion" content="
+  <style type="text/css">
+    p.p1 {margin: 0.0px 0.0px 0.0px 0.0px; font: 12.0px Helvetica}
+    p.p2 {margin: 0.0px 0.0px 0.0px 0.0px; font: 12.0px Helvetica; min-height: 14.0px}
+    span.Apple-tab-span {white-space:pre}
+  </style>
+</head>
+<body>
+  <h1>My Workouts</h1>
+</body>
+</html>
+<div><br></div>
+<ul>
+</ul>
+<h2>/2021</h2>
+<h2>/2022</h2>
+<h2>/2023</h2>
+<h2>/2024</h2>
+<h2>/2025</h2>
+<li>Bench : 3 x 10 at 135</li>
+<li>Squats : 10 at 225, 8 at 245</li>
+<li>Shoulder press : 3 x 8 at 45</li>
+<li>Lat pulldowns : 3 x 12 at 120</li>
+<li>Curls : 3 x 10 at 30</li>
+<div>Deadlift : 5 at 315, 2 x 3 at 335</div>
+<li>Rows : 2 x 10 at 50, 12 at 45</li>
+<li>Tricep extensions : 3 x 12 at 40</li>
+<li>Lateral raises : 3 x 15 at 15</li>
+""".encode('utf-8')
+
+def compress_html(content: str, zdict: bytes = None) -> bytes:
     """
     Compress a string into bytes. This produces a binary string that is
     reverse engineerable.
 
     :param content: string
+    :param zdict: optional preset dictionary (see train_zdict). The same
+           dictionary is needed to decompress the result.
     :return: binary string
     """
-    return zlib.compress(content.encode('utf-8'))
+    if zdict is None:
+        return zlib.compress(content.encode('utf-8'))
+    compressor = zlib.compressobj(zdict=zdict)
+    return compressor.compress(content.encode('utf-8')) + compressor.flush()
 
-def decompress_html(blob: bytes) -> str:
+def decompress_html(blob: bytes, zdict: bytes = None) -> str:
     """
     Reverse engineer binary string.
 
     :param blob: binary string
+    :param zdict: the preset dictionary the blob was compressed with, if any
     :return: string
     """
-    return zlib.decompress(blob).decode('utf-8')
+    if zdict is None:
+        return zlib.decompress(blob).decode('utf-8')
+    decompressor = zlib.decompressobj(zdict=zdict)
+    return (decompressor.decompress(blob) + decompressor.flush()).decode('utf-8')
+
+def train_zdict(samples: list[str], size: int = ZDICT_MAX_SIZE) -> bytes:
+    """
+    Build a zlib preset dictionary from sample HTML files.
+
+    Lines are split at numbers, because the numbers (dates, reps, weights)
+    rarely repeat but the text around them does. Ex: '<li>Squats : ', ' at '.
+    Each distinct fragment is scored by how many bytes it accounts for across
+    the samples (occurrences * length). The best fragments are kept until the
+    dictionary is full, and ordered so the best one is last, where zlib can
+    refer to it most cheaply.
+
+    :param samples: content of HTML files, ex: the user's previous imports
+    :param size: max size of the dictionary in bytes
+    :return: dictionary for compress_html/decompress_html
+    """
+    counts = collections.Counter()
+    for sample in samples:
+        for line in sample.splitlines(keepends=True):
+            counts.update(f for f in re.split(r"\d+", line) if len(f) >= 3)
+
+    scored = sorted(counts.items(), key=lambda item: item[1] * len(item[0]), reverse=True)
+    chosen = []
+    total = 0
+    for fragment, count in scored:
+        encoded = fragment.encode('utf-8')
+        # A fragment seen once is already handled by zlib's own window.
+        if count < 2 or total + len(encoded) > size:
+            continue
+        chosen.append(encoded)
+        total += len(encoded)
+    return b"".join(reversed(chosen))
+
+# Size of the chunks HTML files are read in.
+READ_CHUNK_SIZE = 64 * 1024
+
+def _read_chunks(html_filepath: str):
+    """Yield the text of a file in chunks of READ_CHUNK_SIZE characters."""
+    with open(html_filepath, 'r') as f:
+        while chunk := f.read(READ_CHUNK_SIZE):
+            yield chunk
+
+def hash_html_file(html_filepath: str) -> str:
+    """
+    Hash the content of a file without reading all of it into memory.
+    Gives the same result as hash_html(content).
+    """
+    sha = hashlib.sha256()
+    for chunk in _read_chunks(html_filepath):
+        sha.update(chunk.encode('utf-8'))
+    return sha.hexdigest()
+
+class HtmlFileReader:
+    """
+    Reads an HTML file once, in chunks. While the lines are being read, the
+    content is also hashed and (optionally) compressed, so the file doesn't
+    have to be read again or held in memory as a whole.
+
+    Usage:
+        reader = HtmlFileReader(html_filepath, compress=True, zdict=zdict)
+        for line in reader.lines():
+            ...
+        reader.file_hash, reader.compressed_content  # set once lines() is done
+    """
+    def __init__(self, html_filepath: str, compress: bool = True, zdict: bytes = None):
+        """
+        :param html_filepath: file to read
+        :param compress: if False, compressed_content stays None
+        :param zdict: preset dictionary to compress with, see compress_html
+        """
+        self.html_filepath = html_filepath
+        self.compress = compress
+        self.zdict = zdict
+        self.file_hash: str = None
+        self.compressed_content: bytes = None
+
+    def lines(self):
+        """
+        Yield the lines of the file without their line endings, like
+        f.read().split('\n') without a trailing empty line.
+        """
+        sha = hashlib.sha256()
+        compressor = None
+        if self.compress:
+            compressor = zlib.compressobj() if self.zdict is None else zlib.compressobj(zdict=self.zdict)
+        compressed_parts = []
+        partial_line = ''
+
+        for chunk in _read_chunks(self.html_filepath):
+            encoded = chunk.encode('utf-8')
+            sha.update(encoded)
+            if compressor is not None:
+                compressed_parts.append(compressor.compress(encoded))
+
+            # The last part may be the start of a line that continues in the next chunk.
+            lines = (partial_line + chunk).split('\n')
+            partial_line = lines.pop()
+            yield from lines
+        if partial_line:
+            yield partial_line
+
+        self.file_hash = sha.hexdigest()
+        if compressor is not None:
+            compressed_parts.append(compressor.flush())
+            self.compressed_content = b"".join(compressed_parts)
 
 def print_to_text_widget(msg: str, text_widget: Text, level: str = "INFO"):
     """Print msg to a text widget."""
     if text_widget is not None:
         text_widget.insert(END, msg + "\n", level)
+
+
+def after_future(widget: Misc, future: Future, callback: Callable[[Future], None],
+                 on_poll: Callable[[], None] = None, poll_ms: int = 100):
+    """
+    Call callback(future) on the Tk main thread once the future is done.
+
+    Tkinter isn't thread-safe, so a worker thread can't call back into the GUI
+    directly. Instead, this polls the future with after(), the same way the
+    Apple Notes import monitors its thread.
+
+    :param widget: any widget, used to schedule the polling
+    :param future: future returned by a worker thread (e.g. the SQL writer)
+    :param callback: called with the done future. Call future.result() inside
+           the callback to get the return value or re-raise the exception.
+    :param on_poll: optionally called on every poll, e.g. to flush a
+           QueuedTextWidget while the work is still running
+    :param poll_ms: how often to check the future
+    """
+    if on_poll is not None:
+        on_poll()
+    if future.done():
+        callback(future)
+    else:
+        widget.after(poll_ms, lambda: after_future(widget, future, callback, on_poll, poll_ms))
+
+class QueuedTextWidget:
+    """
+    Stand-in for a Text widget that can be written to from any thread.
+
+    Calls to insert, delete and configure are queued, and applied to the real
+    widget when flush() is called on the Tk main thread.
+    """
+    def __init__(self, text_widget: Text):
+        self.text_widget = text_widget
+        self._calls = queue.SimpleQueue()
+
+    def insert(self, *args, **kwargs):
+        self._calls.put((self.text_widget.insert, args, kwargs))
+
+    def delete(self, *args, **kwargs):
+        self._calls.put((self.text_widget.delete, args, kwargs))
+
+    def configure(self, *args, **kwargs):
+        self._calls.put((self.text_widget.configure, args, kwargs))
+
+    def flush(self):
+        """Apply the queued calls. Only call this from the Tk main thread."""
+        while not self._calls.empty():
+            method, args, kwargs = self._calls.get()
+            method(*args, **kwargs)
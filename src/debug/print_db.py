@@ -13,7 +13,10 @@ r = cur.execute("SELECT date_time, file_hash, name, rowid FROM import")
 print(r.fetchall())
 print()
 print("\n---daily_sets table---")
-r = cur.execute("SELECT exercise, date, sets_string, import_id, rowid FROM daily_sets")
+r = cur.execute("""
+    SELECT exercise.name, date, sets_string, import_id, daily_sets.rowid
+    FROM daily_sets LEFT JOIN exercise ON exercise.id = daily_sets.exercise_id
+""")
 print(r.fetchall())
 
 
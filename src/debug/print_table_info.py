@@ -20,6 +20,22 @@ r = cur.execute("PRAGMA table_info(import)")
 print("\n---import schema---")
 print_result_set(r)
 
+r = cur.execute("PRAGMA table_info(import_file)")
+print("\n---import_file schema---")
+print_result_set(r)
+
+r = cur.execute("PRAGMA table_info(import_section)")
+print("\n---import_section schema---")
+print_result_set(r)
+
+r = cur.execute("PRAGMA table_info(exercise)")
+print("\n---exercise schema---")
+print_result_set(r)
+
 r = cur.execute("PRAGMA table_info(daily_sets)")
 print("\n---daily_sets schema---")
 print_result_set(r)
+
+r = cur.execute("PRAGMA table_info(exercise_set)")
+print("\n---exercise_set schema---")
+print_result_set(r)
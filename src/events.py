@@ -0,0 +1,107 @@
+"""
+Change notifications from the data layer to the tabs.
+
+The write functions in sql_utility publish an event once their transaction is
+committed, describing what changed. Tabs subscribe to the events they show,
+and refresh only the exercises an event touches, instead of reloading
+everything whenever they are selected:
+
+    bus.subscribe((SetsEdited, SetsDeleted), self.on_sets_changed)
+
+The writes run on the writer thread (see sql_writer), but Tkinter isn't
+thread-safe, so events are queued, and dispatched on the Tk main thread by
+polling with after(), the same way after_future works. Call bus.attach(root)
+once to start dispatching.
+"""
+import logging
+import queue
+from typing import Callable, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+
+class SetsImported(NamedTuple):
+    """New daily_sets items were imported (or re-imported into an existing import)."""
+    import_ids: tuple[int, ...]
+    exercises: frozenset[str]
+
+
+class ImportDeleted(NamedTuple):
+    """An import was deleted, with its daily_sets items."""
+    import_id: int
+    exercises: frozenset[str]
+
+
+class SetsEdited(NamedTuple):
+    """daily_sets items were edited. exercises has the old and new names."""
+    rowids: tuple[int, ...]
+    exercises: frozenset[str]
+
+
+class SetsDeleted(NamedTuple):
+    """daily_sets items were deleted."""
+    rowids: tuple[int, ...]
+    exercises: frozenset[str]
+
+
+class AliasesChanged(NamedTuple):
+    """Items were moved to other exercises by an alias update. exercises has the old and new names."""
+    exercises: frozenset[str]
+
+
+# Every event that changes the exercise sets. Each has an 'exercises' field.
+SETS_CHANGED = (SetsImported, ImportDeleted, SetsEdited, SetsDeleted, AliasesChanged)
+
+
+class EventBus:
+    """Queues events from any thread, and calls their subscribers on one thread."""
+
+    def __init__(self):
+        self._subscribers: dict[type, list[Callable]] = {}
+        self._events = queue.SimpleQueue()
+
+    def subscribe(self, event_types: type | tuple[type, ...], callback: Callable) -> Callable[[], None]:
+        """
+        Call callback(event) for every event of the given type(s).
+        :return: a function that unsubscribes the callback
+        """
+        if not isinstance(event_types, tuple):
+            event_types = (event_types,)
+        for event_type in event_types:
+            self._subscribers.setdefault(event_type, []).append(callback)
+
+        def unsubscribe():
+            for event_type in event_types:
+                self._subscribers[event_type].remove(callback)
+        return unsubscribe
+
+    def publish(self, event) -> None:
+        """Queue an event. Can be called from any thread."""
+        logger.debug(f"Publishing {type(event).__name__}")
+        self._events.put(event)
+
+    def dispatch_pending(self) -> None:
+        """Call the subscribers of the queued events, in order, on this thread."""
+        while not self._events.empty():
+            event = self._events.get()
+            # Copy, so a callback can unsubscribe while the event is dispatched.
+            for callback in list(self._subscribers.get(type(event), ())):
+                try:
+                    callback(event)
+                except Exception:
+                    # One broken subscriber shouldn't keep the others stale.
+                    logger.exception(f"Subscriber failed to handle {type(event).__name__}")
+
+    def attach(self, widget, poll_ms: int = 100) -> None:
+        """
+        Dispatch queued events on the Tk main thread, every poll_ms.
+        :param widget: any widget, used to schedule the polling, e.g. the root window
+        """
+        def poll():
+            self.dispatch_pending()
+            widget.after(poll_ms, poll)
+        poll()
+
+
+# The app's event bus.
+bus = EventBus()
@@ -0,0 +1,164 @@
+"""
+Normalizes the exercise names parsed from imported lines.
+
+People write the same exercise many ways ('Barbell rows', 'bb row', ...). A
+list of replacement rules turns those into one name before the alias file is
+applied. Ex: '<li>Barbell Rows SS1' -> 'bb row'
+
+The rules used to be applied one str.replace at a time, about 20 passes per
+line. Here they are compiled into one regex alternation, so the built-in rules
+take one pass over the line. The same exercise names repeat thousands of times
+across imports, so results are also memoized per line.
+
+Users can add their own rules in usr/replacements.txt, one per line:
+    # comment
+    dumbell -> db
+    pull down -> pulldown
+User rules are applied in a second pass, to the result of the built-in ones.
+"""
+from functools import lru_cache
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# Filepath for the user's replacement rules file. The file is optional.
+USER_RULES_FILE = os.path.join("usr", "replacements.txt")
+
+# Characters that can be safely removed or replaced without obscuring the
+# exercise's meaning. These are applied before the rules.
+CHARACTER_REPLACEMENTS = str.maketrans({'-': None, '’': None, '.': None, ';': ','})
+
+# Replacement rules, in order. A rule's result can be matched by a later rule
+# ('hex bar' -> 'hexbar' -> 'hb'); compile_rules resolves those chains.
+# Going with singular names instead of plural for now.
+BUILTIN_RULES = [
+    ('barbell', 'bb'),
+    ('dumbbell', 'db'),
+    ('ez bar', 'ezbar'),
+    ('t bar', 'tbar'),
+    ('hex bar', 'hexbar'),
+    ('hexbar', 'hb'),
+    ('triceps', 'tricep'),
+    ('tricep', 'tri'),
+    ('curls', 'curl'),
+    ('rows', 'row'),
+    ('ups', 'up'),
+    ('downs', 'down'),
+    ('extensions', 'extension'),
+    ('kickbacks', 'kickback'),
+    ('raises', 'raise'),
+    ('hangs', 'hang'),
+    ('deadlifts', 'deadlift'),
+]
+
+
+def load_user_rules(rules_file: str = USER_RULES_FILE) -> list[tuple[str, str]]:
+    """
+    Read replacement rules from the user's rules file.
+    :return: [(text, replacement), ...], or [] if the file doesn't exist
+    """
+    rules = []
+    if not os.path.exists(rules_file):
+        return rules
+    with open(rules_file, 'r') as f:
+        for line_num, line in enumerate(f, start=1):
+            line = line.strip()
+            if line.startswith('#') or line == '':
+                continue
+            if '->' not in line:
+                logger.warning(f"Ignoring line {line_num} of {rules_file}, expected 'text -> replacement': '{line}'")
+                continue
+            text, replacement = line.split('->', maxsplit=1)
+            text = text.strip().lower()
+            if text:
+                rules.append((text, replacement.strip().lower()))
+    return rules
+
+
+def compile_rules(rules: list[tuple[str, str]]) -> tuple[re.Pattern, dict[str, str]]:
+    """
+    Compile replacement rules into one regex and a table of final replacements.
+
+    Applying the rules one after another lets a rule rewrite the result of an
+    earlier rule. To get the same result in one pass, each rule's replacement
+    is run through the rules that come after it. Ex: 'hex bar' -> 'hb'
+
+    :return: (regex matching any rule's text, {text: final replacement})
+    """
+    final = {}
+    for i, (text, replacement) in enumerate(rules):
+        if text in final:
+            continue  # An earlier rule with the same text already wins.
+        for later_text, later_replacement in rules[i + 1:]:
+            replacement = replacement.replace(later_text, later_replacement)
+        final[text] = replacement
+    # Alternatives are tried in order, so when two rules match at the same
+    # position, the earlier rule wins, as it did with one replace per rule.
+    pattern = re.compile("|".join(re.escape(text) for text in final))
+    return pattern, final
+
+
+class ExerciseNormalizer:
+    """Turns the exercise part of a line into a normalized exercise name."""
+
+    def __init__(self, rules: list[tuple[str, str]], user_rules: list[tuple[str, str]] = ()):
+        """
+        :param rules: built-in replacement rules, ex: BUILTIN_RULES
+        :param user_rules: rules applied to the result of the built-in rules
+        """
+        self.passes = [compile_rules(r) for r in (rules, list(user_rules)) if r]
+        self.normalize = lru_cache(maxsize=None)(self._normalize)
+
+    def _normalize(self, ln: str) -> str:
+        """
+        :param ln: part of HTML line containing exercise (part before colon).
+                   Ex: <li>Rear delt rows SS1
+        :return:  exercise name in the line. Ex: 'rear delt row'
+        """
+        # First characters in the line might be "<li>" or "<div>", which can be ignored.
+        # If these aren't the first characters, this works regardless.
+        result = ln[ln.index('>') + 1:]
+
+        # Ignore anything between parenthesis
+        opening_paren = result.find('(')
+        if opening_paren != -1:
+            closing_paren = result.rfind(')')  # use rfind in case the line contains multiple sets of parenthesis
+            if closing_paren == -1:
+                result = result[:opening_paren]
+            else:
+                result = result[:opening_paren] + result[closing_paren + 1:]
+
+        # ' ss[0-9]' indicates the exercise was performed as a superset.
+        # This is irrelevant to the exercise and can be ignored.
+        superset = result.find(' ss')
+        if superset != -1:
+            result = result[:superset]
+
+        result = result.translate(CHARACTER_REPLACEMENTS)
+        for pattern, replacements in self.passes:
+            result = pattern.sub(lambda m: replacements[m.group()], result)
+        return result.strip()
+
+
+# Rules file state the current normalizer was built from, see get_normalizer.
+_normalizer: ExerciseNormalizer | None = None
+_normalizer_key = None
+
+
+def get_normalizer(rules_file: str = USER_RULES_FILE) -> ExerciseNormalizer:
+    """
+    Return a normalizer for the built-in rules and the user's rules file. The
+    same normalizer (and its memoized results) is reused until the file changes.
+    """
+    global _normalizer, _normalizer_key
+    try:
+        stat = os.stat(rules_file)
+        key = (rules_file, stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        key = (rules_file, None, None)
+    if _normalizer is None or key != _normalizer_key:
+        _normalizer = ExerciseNormalizer(BUILTIN_RULES, load_user_rules(rules_file))
+        _normalizer_key = key
+    return _normalizer
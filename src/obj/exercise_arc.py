@@ -1,10 +1,11 @@
-from datetime import datetime
+from datetime import date
+from typing import NamedTuple
 
 class DailySets:
     """Represents a daily_sets item in the database."""
     def __init__(self, daily_sets_tuple: tuple[str, str, str, str]):
         self.exercise = daily_sets_tuple[0]
-        self.date = datetime.strptime(daily_sets_tuple[1], "%Y-%m-%d").date()
+        self.date = date.fromisoformat(daily_sets_tuple[1])
         self.sets_string = daily_sets_tuple[2]
         self.comments = daily_sets_tuple[3]
 
@@ -28,3 +29,12 @@ class ExerciseArc:
     def add_daily_sets_tuple(self, daily_sets_tuple: tuple[str, str, str, str]) -> None:
         daily_sets_obj = DailySets(daily_sets_tuple)
         self.daily_sets_list.append(daily_sets_obj)
+
+
+class ArcSummary(NamedTuple):
+    """The boundaries of an exercise arc, without its items. See get_arc_summaries."""
+    exercise: str
+    arc_num: int        # 1 for the exercise's first arc, counting pruned arcs
+    start_date: date
+    end_date: date
+    item_count: int     # number of daily_sets items
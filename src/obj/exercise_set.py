@@ -8,12 +8,17 @@ One daily_sets record can be converted to 1+ ExerciseSet objects.
 '2x10@135, 8,7@145' -> 10@135, 10@135, 8@145, 7@145
 
 This class is used to plots the sets.
+
+The sets themselves are stored as arrays (see ExerciseSetColumns). ExerciseSet
+objects are created from them on demand, for code that displays sets one by one.
 """
 from datetime import date
 
 
 class ExerciseSet:
     """A set of an exercise."""
+    __slots__ = ('exercise', 'reps', 'weight', 'partial_reps', 'date')
+
     def __init__(self, exercise: str, reps: int, weight: float, partial_reps: bool, date: date):
         self.exercise = exercise
         self.reps = reps
@@ -0,0 +1,119 @@
+"""
+Columnar storage for the individual sets of one exercise.
+
+An exercise with years of history has tens of thousands of sets. Instead of one
+ExerciseSet object per set, the sets are stored as NumPy arrays, one per field,
+sorted by date:
+
+    days     int32    days since 1970-01-01
+    weights  float32  0 for bodyweight sets
+    reps     uint8
+    partial  bool
+
+Filtering is done on the arrays (see between and with_reps), and ExerciseSet
+objects are only created when code iterates over the sets, e.g. to display them.
+
+Ex:
+    sets = esd['bb bench']
+    heavy = sets.between(start_date, end_date).with_reps(max_reps=5)
+    ax.scatter(heavy.dates, heavy.weights, c=heavy.reps)
+"""
+from datetime import date, timedelta
+
+import numpy as np
+
+from src.obj.exercise_set import ExerciseSet
+
+EPOCH = date(1970, 1, 1)
+
+
+def to_epoch_day(d: date) -> int:
+    """Convert a date to days since 1970-01-01."""
+    return (d - EPOCH).days
+
+
+def from_epoch_day(day: int) -> date:
+    """Convert days since 1970-01-01 to a date."""
+    return EPOCH + timedelta(days=int(day))
+
+
+class ExerciseSetColumns:
+    """The sets of one exercise, as date-sorted NumPy arrays."""
+
+    def __init__(self, exercise: str, days: np.ndarray, weights: np.ndarray,
+                 reps: np.ndarray, partial: np.ndarray):
+        """
+        The arrays must have the same length, and be sorted by day.
+        See from_rows to build the arrays from SQLite rows.
+        """
+        self.exercise = exercise
+        self.days = days
+        self.weights = weights
+        self.reps = reps
+        self.partial = partial
+
+    @classmethod
+    def from_rows(cls, exercise: str, rows: list[tuple[int, int, float, int]]) -> 'ExerciseSetColumns':
+        """
+        :param rows: [(epoch day, reps, weight, partial_reps), ...], sorted by day
+        """
+        days, reps, weights, partial = zip(*rows) if rows else ((), (), (), ())
+        # More reps than fit in a uint8 only come from typos, which the sets
+        # parser already rejects.
+        return cls(exercise,
+                   np.array(days, dtype=np.int32),
+                   np.array(weights, dtype=np.float32),
+                   np.clip(np.array(reps, dtype=np.int64), 0, 255).astype(np.uint8),
+                   np.array(partial, dtype=np.bool_))
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def __getitem__(self, key):
+        """
+        An int returns one set as an ExerciseSet. A slice, boolean mask or
+        index array returns the selected sets as another ExerciseSetColumns.
+        """
+        if isinstance(key, (int, np.integer)):
+            return ExerciseSet(exercise=self.exercise,
+                               reps=int(self.reps[key]),
+                               # str() gives the shortest repr of the float32,
+                               # so 17.3 displays as 17.3, not 17.299999237.
+                               weight=float(str(self.weights[key])),
+                               partial_reps=bool(self.partial[key]),
+                               date=from_epoch_day(self.days[key]))
+        return ExerciseSetColumns(self.exercise, self.days[key], self.weights[key],
+                                  self.reps[key], self.partial[key])
+
+    def __iter__(self):
+        """Yield each set as an ExerciseSet, in date order."""
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def dates(self) -> np.ndarray:
+        """The days as a datetime64[D] array, which matplotlib can plot."""
+        return self.days.astype('datetime64[D]')
+
+    @property
+    def first_date(self) -> date | None:
+        return from_epoch_day(self.days[0]) if len(self) else None
+
+    @property
+    def last_date(self) -> date | None:
+        return from_epoch_day(self.days[-1]) if len(self) else None
+
+    def between(self, start_date: date = None, end_date: date = None) -> 'ExerciseSetColumns':
+        """Return the sets from start_date to end_date, inclusive. None means no limit."""
+        start = 0 if start_date is None else np.searchsorted(self.days, to_epoch_day(start_date), side='left')
+        end = len(self) if end_date is None else np.searchsorted(self.days, to_epoch_day(end_date), side='right')
+        return self[start:end]
+
+    def with_reps(self, min_reps: int = None, max_reps: int = None) -> 'ExerciseSetColumns':
+        """Return the sets with min_reps to max_reps reps, inclusive. None means no limit."""
+        mask = np.ones(len(self), dtype=np.bool_)
+        if min_reps is not None:
+            mask &= self.reps >= min_reps
+        if max_reps is not None:
+            mask &= self.reps <= max_reps
+        return self[mask]
@@ -0,0 +1,173 @@
+"""
+Renders scatter plots to PNG files, off the Tk main thread.
+
+Drawing a matplotlib figure takes a noticeable fraction of a second, and the
+Training Arcs tab draws two per arc. Drawing them on the Tk thread freezes the
+window until every plot is done. Instead, plots are described by a PlotSpec,
+drawn with the Agg backend in worker processes, and shown as images once they
+are ready:
+
+    future = renderer.render(spec)
+    after_future(widget, future, lambda f: show(PhotoImage(file=f.result())))
+
+The PNG files are cached in usr/plot_cache. The file name is a hash of
+everything that affects the image (exercise, date range, rep range, the
+plotted data, and the sizes), so a cached image is never stale, and showing a
+plot again is only a file read.
+"""
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import date, timedelta
+import hashlib
+import logging
+import multiprocessing
+import os
+from typing import NamedTuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Directory for cached plot images
+PLOT_CACHE_DIR = os.path.join("usr", "plot_cache")
+
+# The oldest images are deleted when the cache has more than this many.
+MAX_CACHED_PLOTS = 1000
+
+
+class PlotSpec(NamedTuple):
+    """Everything needed to draw a 'load over time' scatter plot."""
+    exercise: str
+    start_date: date
+    end_date: date
+    min_reps: int
+    max_reps: int
+    days: np.ndarray        # see ExerciseSetColumns
+    weights: np.ndarray
+    reps: np.ndarray
+    figsize: tuple[float, float]
+    title_size: float
+    tick_size: float
+
+    def cache_key(self) -> str:
+        """Hash of everything that affects the image."""
+        sha = hashlib.sha256(repr((self.exercise, self.start_date, self.end_date,
+                                   self.min_reps, self.max_reps, self.figsize,
+                                   self.title_size, self.tick_size)).encode('utf-8'))
+        for array in (self.days, self.weights, self.reps):
+            sha.update(np.ascontiguousarray(array).tobytes())
+        return sha.hexdigest()
+
+
+def render_png(spec: PlotSpec, png_file: str) -> str:
+    """
+    Draw the plot described by spec, and save it to png_file.
+    This runs in a worker process, so it only uses the Agg backend.
+    :return: png_file
+    """
+    # Imported here so the Tk process doesn't pay for the Agg canvas import.
+    import matplotlib
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import matplotlib.dates as mdates
+    from matplotlib.figure import Figure
+
+    fig = Figure(spec.figsize)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)  # figure has a subplot with 1 row, 1 col, and pos 1
+    fig.suptitle(f"Load Over Time for Sets of {spec.min_reps}-{spec.max_reps} Reps", fontsize=spec.title_size)
+
+    # Matplotlib attempts to "automatically expand" the axis limits if they
+    # are the same. This isn't the behavior we want, so there is a check
+    # for identical axis limits.
+    start_date, end_date = spec.start_date, spec.end_date
+    if start_date == end_date:
+        start_date = start_date - timedelta(days=1)
+        end_date = end_date + timedelta(days=1)
+    # We want 10 ticks on the x-axis. Calculate the interval needed for 10 ticks
+    interval = int((end_date - start_date).days / 10) + 1
+    ax.set_xlim(left=start_date, right=end_date)
+    ax.xaxis.set_major_locator(mdates.DayLocator(interval=interval))
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%y-%m-%d'))
+
+    # Rotates and right-aligns the x labels so they don't crowd each other.
+    for label in ax.get_xticklabels(which='major'):
+        label.set(rotation=20, horizontalalignment='right')
+    ax.tick_params(axis='x', labelsize=spec.tick_size)
+    ax.tick_params(axis='y', labelsize=spec.tick_size)
+
+    scatter = ax.scatter(spec.days.astype('datetime64[D]'), spec.weights, c=spec.reps,
+                         cmap=matplotlib.colormaps['viridis'], vmin=spec.min_reps, vmax=spec.max_reps,
+                         marker='o')
+    fig.colorbar(scatter, format="%d", ticks=list(range(spec.min_reps, spec.max_reps + 1)))
+
+    # Write to a temporary file first, so a half-written image is never
+    # picked up from the cache.
+    tmp_file = f"{png_file}.{os.getpid()}.tmp"
+    fig.savefig(tmp_file, format='png')
+    os.replace(tmp_file, png_file)
+    return png_file
+
+
+class PlotRenderer:
+    """Renders PlotSpecs to cached PNG files in a pool of worker processes."""
+
+    def __init__(self, cache_dir: str = PLOT_CACHE_DIR, max_workers: int = 2):
+        """
+        :param cache_dir: directory for the PNG files
+        :param max_workers: number of worker processes. The pool is started on
+               the first render that isn't cached.
+        """
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self._pool = None
+        self._pruned = False
+
+    def cached_file(self, spec: PlotSpec) -> str:
+        """Return the path of the spec's PNG file, whether or not it exists yet."""
+        return os.path.join(self.cache_dir, f"{spec.cache_key()}.png")
+
+    def render(self, spec: PlotSpec) -> Future:
+        """
+        Render the plot, or find it in the cache.
+        :return: a future that resolves to the path of the PNG file. It is
+                 already done if the image was cached.
+        """
+        png_file = self.cached_file(spec)
+        if os.path.exists(png_file):
+            future = Future()
+            future.set_result(png_file)
+            return future
+
+        if self._pool is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            if not self._pruned:
+                self.prune()
+            # Spawn instead of fork: forking a process with Tk and threads
+            # running isn't safe.
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        return self._pool.submit(render_png, spec, png_file)
+
+    def prune(self, max_files: int = MAX_CACHED_PLOTS) -> None:
+        """Delete the least recently written images, keeping max_files."""
+        self._pruned = True
+        if not os.path.isdir(self.cache_dir):
+            return
+        files = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith('.png')]
+        if len(files) <= max_files:
+            return
+        files.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in files[:len(files) - max_files]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                logger.warning(f"Failed to delete cached plot {entry.path}")
+
+    def shutdown(self) -> None:
+        """Stop the worker processes, without waiting for queued renders."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+
+# The app's renderer. Every tab shares its worker processes.
+renderer = PlotRenderer()
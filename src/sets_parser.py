@@ -0,0 +1,170 @@
+"""
+Parser for sets strings, the sanitized part of a line that lists the sets.
+
+Grammar (whitespace is ignored):
+    sets_string := item (',' item)*
+    item        := [count 'x'] ['~'] reps ['@' weight]
+    reps        := number ('+' ['~'] number)*
+
+Ex: '2x8@135, 6,5@145'
+- '2x8' is 2 sets of 8 reps. A weight applies to every item since the
+  previous weight, so 6 and 5 reps are both at 145.
+- '~' marks partial reps. '5+1' is 6 reps (a rest-pause), '5+~1' is 6 reps
+  with partials, and half reps ('4.5') are rounded down.
+- A sets string without any '@' is bodyweight sets, ex: '3x10, 8'. Once a
+  sets string has a weight, every item needs one.
+
+The string is scanned once, and the result is memoized, since strings like
+'3x10@135' recur constantly.
+"""
+from functools import lru_cache
+import math
+import re
+from typing import NamedTuple
+
+# More reps than this in one set is most likely a typo, ex: '6145@155'.
+MAX_REPS = 100
+
+_TOKEN = re.compile(r"\s*(?:(?P<number>\d+(?:\.\d*)?|\.\d+)|(?P<symbol>[x~+@,])|(?P<other>\S))")
+
+
+class SetGroup(NamedTuple):
+    """Sets with the same reps and weight. Ex: '2x8@135' -> SetGroup(2, 8, 135.0, False)"""
+    sets: int
+    reps: int
+    weight: float
+    partial: bool
+
+
+class SetsError(NamedTuple):
+    """A problem in a sets string, at the given index of the string."""
+    position: int
+    message: str
+
+
+class ParsedSets(NamedTuple):
+    """
+    groups: the sets that could be parsed, in order
+    segments: the items at each weight, as written (without whitespace).
+              Ex: '2x8@135, 6,5@145' -> (('2x8', '135'), ('6,5', '145'))
+              The weight is '' for bodyweight sets.
+    errors: empty if the sets string is valid
+    """
+    groups: tuple[SetGroup, ...]
+    segments: tuple[tuple[str, str], ...]
+    errors: tuple[SetsError, ...]
+
+
+def _tokenize(sets_str: str) -> list[tuple[str, str, int]]:
+    """Split a sets string into (kind, text, position) tokens."""
+    tokens = [(m.lastgroup, m.group(m.lastgroup), m.start(m.lastgroup)) for m in _TOKEN.finditer(sets_str)]
+    tokens.append(('end', '', len(sets_str)))
+    return tokens
+
+
+@lru_cache(maxsize=4096)
+def parse_sets_string(sets_str: str) -> ParsedSets:
+    """
+    Parse a sets string. The result is memoized, so treat it as read-only.
+    Ex: '2x8@135, ~6@145' -> groups (SetGroup(2, 8, 135.0, False), SetGroup(1, 6, 145.0, True))
+    """
+    tokens = _tokenize(sets_str)
+    weighted = any(text == '@' for _, text, _ in tokens)
+    groups = []
+    segments = []
+    errors = []
+    pending = []        # (count, reps, partial) of the items waiting for a weight
+    pending_text = []   # those items as written
+    i = 0
+
+    def error(position: int, message: str):
+        errors.append(SetsError(position, message))
+
+    while True:
+        # item := [count 'x'] ['~'] reps ['@' weight]
+        item_start = i
+        count = 1
+        if tokens[i][0] == 'number' and tokens[i + 1][1] == 'x':
+            kind, text, position = tokens[i]
+            if '.' in text:
+                error(position, f"Number of sets must be a whole number: '{text}'")
+            else:
+                count = int(text)
+            i += 2
+        partial = tokens[i][1] == '~'
+        if partial:
+            i += 1
+
+        reps = 0
+        while True:
+            kind, text, position = tokens[i]
+            if kind != 'number':
+                error(position, f"Expected reps, found '{text}'" if text else "Expected reps")
+                reps = None
+                break
+            reps += math.trunc(float(text))
+            i += 1
+            if tokens[i][1] != '+':
+                break
+            i += 1
+            if tokens[i][1] == '~':
+                partial = True
+                i += 1
+
+        if reps is not None:
+            if reps > MAX_REPS:
+                error(tokens[item_start][2], f"Suspiciously high number of reps: {reps}")
+            else:
+                pending.append((count, reps, partial))
+        # Skip to the end of the item, so one bad item doesn't hide the rest.
+        while tokens[i][0] != 'end' and tokens[i][1] not in ',@':
+            if reps is not None:
+                error(tokens[i][2], f"Unexpected '{tokens[i][1]}'")
+                reps = None
+            i += 1
+        pending_text.append("".join(text for _, text, _ in tokens[item_start:i]))
+
+        if tokens[i][1] == '@':
+            kind, text, position = tokens[i + 1]
+            i += 2
+            if kind != 'number':
+                error(position, f"Expected a weight, found '{text}'" if text else "Expected a weight")
+                weight = None
+                i -= 1
+            else:
+                weight = float(text)
+            if weight is not None:
+                groups.extend(SetGroup(c, r, weight, p) for c, r, p in pending)
+                segments.append((",".join(pending_text), text))
+            pending = []
+            pending_text = []
+
+        kind, text, position = tokens[i]
+        if kind == 'end':
+            break
+        if text != ',':
+            error(position, f"Expected ',' after a weight, found '{text}'")
+            while tokens[i][0] != 'end' and tokens[i][1] != ',':
+                i += 1
+            if tokens[i][0] == 'end':
+                break
+        i += 1
+
+    if pending_text:
+        if weighted:
+            error(len(sets_str), f"No weight for '{','.join(pending_text)}'")
+        else:
+            groups.extend(SetGroup(c, r, 0.0, p) for c, r, p in pending)
+            segments.append((",".join(pending_text), ''))
+
+    return ParsedSets(tuple(groups), tuple(segments), tuple(errors))
+
+
+def is_sets_string_valid(sets_str: str) -> bool:
+    """Return True if the sets string parses without errors."""
+    return not parse_sets_string(sets_str).errors
+
+
+def format_errors(sets_str: str) -> str:
+    """Describe the errors in a sets string, one per line. Ex: "col 5: Expected reps" """
+    return "\n".join(f"col {e.position + 1}: {e.message}" for e in parse_sets_string(sets_str).errors)
@@ -0,0 +1,96 @@
+"""
+Cache for the exercise-sets dictionary.
+
+Building the dictionary reads every exercise_set item, and the Progress Plots
+and Training Arcs tabs ask for it every time they are selected. Usually
+nothing has changed in between, so the dictionary is cached, and only the
+parts that are out of date are rebuilt:
+
+1. If neither SQLite's `PRAGMA data_version` nor the connection manager's write
+   count has changed, nothing has been committed since the last check, and the
+   cached dictionary is returned as is. This costs one pragma.
+2. Otherwise, the version column of the exercise table says which exercises
+   have had sets inserted, updated or deleted. Only those exercises are rebuilt.
+
+The sets of each exercise are stored as NumPy arrays, see ExerciseSetColumns.
+"""
+import logging
+
+from src.obj.exercise_set_columns import ExerciseSetColumns
+from src.sql_connection import ConnectionManager
+
+logger = logging.getLogger(__name__)
+
+
+class ExerciseSetsCache:
+    """
+    Keeps the exercise-sets dictionary up to date with SQLite.
+
+    The same dictionary object is returned every time and updated in place,
+    so every tab that holds on to it shares one copy.
+    """
+
+    def __init__(self, db: ConnectionManager):
+        self.db = db
+        self.exercise_sets_dict: dict[str, ExerciseSetColumns] = {}
+        self._versions: dict[str, int] = {}  # exercise -> exercise.version when last built
+        # data_version and write_count when the cache was last checked.
+        # None means the cache has never been built.
+        self._data_version = None
+        self._write_count = None
+        self._generation = db.generation
+
+    def get(self) -> dict[str, ExerciseSetColumns]:
+        """Return the exercise-sets dictionary, rebuilding any stale exercises."""
+        if self.db.generation != self._generation:
+            # The manager was pointed at another file.
+            self.clear()
+            self._generation = self.db.generation
+        write_count = self.db.write_count
+        with self.db.cursor() as cur:
+            # data_version changes when another connection commits. Commits on
+            # this thread's own connection are caught by write_count.
+            data_version = cur.execute("PRAGMA data_version").fetchone()[0]
+            if (data_version, write_count) == (self._data_version, self._write_count):
+                return self.exercise_sets_dict
+
+            rows = cur.execute("SELECT id, name, version FROM exercise").fetchall()
+            versions = {name: version for _, name, version in rows}
+            stale = [(exercise_id, name) for exercise_id, name, version in rows
+                     if self._versions.get(name) != version]
+            logger.info(f"Rebuilding exercise-sets dictionary for {len(stale)} exercise(s)")
+            for exercise_id, exercise in stale:
+                exercise_sets = self._load(cur, exercise_id, exercise)
+                if len(exercise_sets) > 0:
+                    self.exercise_sets_dict[exercise] = exercise_sets
+                else:
+                    self.exercise_sets_dict.pop(exercise, None)
+
+            # Exercises that are no longer in the table (only possible if the
+            # file was changed outside the app).
+            for exercise in self.exercise_sets_dict.keys() - versions.keys():
+                del self.exercise_sets_dict[exercise]
+
+        self._versions = versions
+        self._data_version = data_version
+        self._write_count = write_count
+        return self.exercise_sets_dict
+
+    def clear(self) -> None:
+        """Forget everything, so the next get() rebuilds the whole dictionary."""
+        self.exercise_sets_dict.clear()
+        self._versions = {}
+        self._data_version = None
+        self._write_count = None
+
+    @staticmethod
+    def _load(cur, exercise_id: int, exercise: str) -> ExerciseSetColumns:
+        """Read the individual sets of one exercise from SQLite."""
+        # 2440587.5 is the Julian day of 1970-01-01, so this is the number of
+        # days since then.
+        result = cur.execute("""
+            SELECT CAST(julianday(date) - 2440587.5 AS INTEGER), reps, weight, partial_reps FROM exercise_set
+            WHERE exercise_id = ? AND date IS NOT NULL
+            ORDER BY date, id
+        """, (exercise_id,))
+        return ExerciseSetColumns.from_rows(exercise, result.fetchall())
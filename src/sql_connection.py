@@ -0,0 +1,150 @@
+"""
+Manages the connections to the user's SQLite file.
+
+Opening a connection is not free: SQLite has to open the file, apply pragmas,
+and parse the schema before the first statement can run. Instead of connecting
+on every call, each thread gets one long-lived connection that is reused for
+the lifetime of the app. In practice this is a small pool: the Tk main thread
+owns one connection, and any worker thread that touches the database gets its
+own (sqlite3 connections should not be shared between threads).
+"""
+from contextlib import contextmanager
+import logging
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Pragmas applied to every new connection.
+# - journal_mode: WAL lets readers run at the same time as the writer thread
+#   (see sql_writer). This is stored in the file, so it only changes once.
+# - synchronous: NORMAL is safe in WAL mode, and avoids an fsync per commit
+# - foreign_keys: SQLite doesn't enforce foreign keys unless asked to, per connection
+# - cache_size: negative values are in KiB, so this is an 8 MB page cache
+# - temp_store: keep temporary tables/indexes (ORDER BY, DISTINCT) in memory
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA cache_size = -8000",
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+class ConnectionManager:
+    """
+    Owns one SQLite connection per thread.
+
+    Usage:
+        with db.cursor() as cur:         # read
+            cur.execute("SELECT ...")
+        with db.transaction() as cur:    # write, committed on exit
+            cur.execute("INSERT ...")
+            db.after_commit(notify)      # called once the commit succeeds
+    """
+
+    def __init__(self, db_file: str):
+        """
+        :param db_file: path to the SQLite file. Nothing is opened until a
+               connection is first needed.
+        """
+        self.db_file = db_file
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: list[sqlite3.Connection] = []
+        # Bumped whenever the manager is re-pointed at another file, so that
+        # threads drop connections to the old file.
+        self.generation = 0
+        # Number of transactions committed through this manager, by any thread.
+        # Caches compare it to find out whether anything may have changed.
+        self.write_count = 0
+
+    def open(self, db_file: str) -> None:
+        """Close all connections and point the manager at a different file."""
+        self.close_all()
+        self.db_file = db_file
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, creating it on first use."""
+        con = getattr(self._local, 'con', None)
+        if con is None or self._local.generation != self.generation:
+            con = self._connect()
+            self._local.con = con
+            self._local.generation = self.generation
+        return con
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open and configure a new connection."""
+        logger.debug(f"Opening SQLite connection to {self.db_file} ({threading.current_thread().name})")
+        # isolation_level=None disables the sqlite3 module's implicit
+        # transactions. Transactions are opened explicitly by transaction().
+        # check_same_thread=False only so close_all() can close every
+        # connection from the main thread; each connection is still only
+        # used by the thread that created it.
+        con = sqlite3.connect(self.db_file, isolation_level=None, check_same_thread=False)
+        for pragma in PRAGMAS:
+            con.execute(pragma)
+        with self._lock:
+            self._connections.append(con)
+        return con
+
+    @contextmanager
+    def cursor(self):
+        """Yield a cursor on this thread's connection. Use this for reads."""
+        cur = self.get_connection().cursor()
+        try:
+            yield cur
+        finally:
+            cur.close()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Yield a cursor inside a transaction. The transaction is committed when
+        the block exits normally, and rolled back if an exception is raised.
+
+        Nested calls join the outermost transaction, so helpers that write can
+        be composed into one larger atomic operation.
+        """
+        con = self.get_connection()
+        if con.in_transaction:
+            with self.cursor() as cur:
+                yield cur
+            return
+
+        cur = con.cursor()
+        cur.execute("BEGIN")
+        self._local.after_commit = []
+        try:
+            yield cur
+        except BaseException:
+            if con.in_transaction:
+                cur.execute("ROLLBACK")
+            raise
+        else:
+            cur.execute("COMMIT")
+            with self._lock:
+                self.write_count += 1
+            for fn, args in self._local.after_commit:
+                fn(*args)
+        finally:
+            self._local.after_commit = []
+            cur.close()
+
+    def after_commit(self, fn, *args) -> None:
+        """
+        Call fn(*args) once this thread's transaction is committed, or right
+        away if there is no transaction. Nothing is called if it's rolled back.
+        """
+        if self.get_connection().in_transaction:
+            self._local.after_commit.append((fn, args))
+        else:
+            fn(*args)
+
+    def close_all(self) -> None:
+        """Close every connection opened by this manager."""
+        with self._lock:
+            for con in self._connections:
+                con.close()
+            self._connections.clear()
+            self.generation += 1
@@ -0,0 +1,767 @@
+"""
+Schema versioning for the user's SQLite file.
+
+The schema version is stored in SQLite's built-in `PRAGMA user_version`. It is
+0 for a brand-new file, and also for files created before migrations existed
+(those files already have the version 1 tables, which is why migration 1 only
+creates tables that don't exist yet).
+
+Each migration upgrades the schema by exactly one version. Pending migrations
+are applied in order when the app starts, in a single transaction, so an
+existing usr/personal.db is upgraded in place (or not at all).
+
+To change the schema, append a new function to MIGRATIONS. Never edit a
+migration that has already shipped: users' files have already run it.
+"""
+import datetime
+import hashlib
+import logging
+import math
+
+from src.common import decompress_html, DEFAULT_ZDICT
+from src.sql_connection import ConnectionManager
+
+logger = logging.getLogger(__name__)
+
+
+def _migration_1_create_tables(cur):
+    """Create the original tables if they don't already exist."""
+    # import
+    # When the user imports exercise sets, the instance is recorded in this table.
+    #
+    # Fields
+    # - date_time of the import, stored in SQLite as TEXT (YYYY-MM-DD HH:MM:SS).
+    # - file_hash is the content of the HTML file hashed. It's used for quick
+    #   comparisons to avoid duplicate imports.
+    # - compressed_file_content is the content of the HTML compressed. It can be
+    #   easily decompressed when the user wants to view the file content.
+    # - name, ex: "some_file.html, YYYY-MM-DD to YYYY-MM-DD",
+    #             "apple notes, YYYY-MM-DD to YYYY-MM-DD"
+    cur.execute("""
+            CREATE TABLE IF NOT EXISTS import(
+                date_time TEXT,
+                file_hash TEXT,
+                compressed_file_content BLOB,
+                name TEXT
+            )
+        """)
+
+    # daily_sets
+    # This represents all the sets a user has logged for a particular exercise on a particular date.
+    # Ex: all bench press sets logged on 21 June 2025.
+    #     -> ('bb bench', '2025-06-21', '2x8@135, 2x6@145', 1)
+    #
+    # fields
+    # - exercise
+    # - date: stored in SQLite as TEXT (YYYY-MM-DD).
+    # - sets_string: parsed and sanitized from the raw line
+    # - comments: optional
+    # - is_valid: boolean (0/1), but SQLite stores booleans as INTEGER
+    # - line: the raw line in the file where this daily_sets item was detected
+    # - import_id: daily_sets items are added through importing, so they store a
+    #   reference to an import item
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS daily_sets(
+            exercise TEXT,
+            date TEXT,
+            sets_string TEXT,
+            comments TEXT,
+            is_valid INTEGER,
+            line TEXT,
+            import_id INTEGER,
+            FOREIGN KEY(import_id) REFERENCES import(ROWID)
+        )
+    """)
+
+
+def _migration_2_keys_and_indexes(cur):
+    """
+    Give both tables an explicit primary key, make daily_sets.import_id a real
+    foreign key that cascades on delete, and add indexes on daily_sets.
+
+    SQLite can't enforce a foreign key that points at an implicit ROWID, and
+    it can't add constraints to an existing table, so both tables are rebuilt.
+    'id INTEGER PRIMARY KEY' is an alias for ROWID, and the existing rowids are
+    copied over, so every 'rowid' used in queries keeps working.
+    """
+    cur.execute("""
+        CREATE TABLE import_new(
+            id INTEGER PRIMARY KEY,
+            date_time TEXT,
+            file_hash TEXT,
+            compressed_file_content BLOB,
+            name TEXT
+        )
+    """)
+    cur.execute("""
+        INSERT INTO import_new(id, date_time, file_hash, compressed_file_content, name)
+        SELECT rowid, date_time, file_hash, compressed_file_content, name FROM import
+    """)
+    cur.execute("DROP TABLE import")
+    cur.execute("ALTER TABLE import_new RENAME TO import")
+
+    cur.execute("""
+        CREATE TABLE daily_sets_new(
+            id INTEGER PRIMARY KEY,
+            exercise TEXT,
+            date TEXT,
+            sets_string TEXT,
+            comments TEXT,
+            is_valid INTEGER,
+            line TEXT,
+            import_id INTEGER REFERENCES import(id) ON DELETE CASCADE
+        )
+    """)
+    # Sets that point to an import that no longer exists would violate the new
+    # foreign key. Keep the sets, but drop the dangling reference.
+    cur.execute("""
+        INSERT INTO daily_sets_new(id, exercise, date, sets_string, comments, is_valid, line, import_id)
+        SELECT rowid, exercise, date, sets_string, comments, is_valid, line,
+               CASE WHEN import_id IN (SELECT id FROM import) THEN import_id END
+        FROM daily_sets
+    """)
+    cur.execute("DROP TABLE daily_sets")
+    cur.execute("ALTER TABLE daily_sets_new RENAME TO daily_sets")
+
+    # (exercise, date): get_daily_sets, get_first_date(exercise), exercise filter
+    # (date): get_first_date(), exercise_sets_already_exist, date filters
+    # (import_id): deleting an import cascades to its daily_sets
+    cur.execute("CREATE INDEX idx_daily_sets_exercise_date ON daily_sets(exercise, date)")
+    cur.execute("CREATE INDEX idx_daily_sets_date ON daily_sets(date)")
+    cur.execute("CREATE INDEX idx_daily_sets_import_id ON daily_sets(import_id)")
+
+
+def _migration_3_sets(sets_str: str) -> list[tuple[int, float, bool]]:
+    """
+    Return (reps, weight, partial_reps) for each set in a sets string, the way
+    sql_utility expanded sets strings when migration 3 shipped. This is a
+    frozen copy: changes to sets_parser must not change what the migration
+    stores.
+    Ex: '2x8@135,~6@145' -> [(8, 135.0, False), (8, 135.0, False), (6, 145.0, True)]
+    """
+    def expand(the_sets, weight):
+        sets = []
+        for the_set in the_sets.split(','):
+            if 'x' in the_set:  # ex: '2x10'
+                num_sets, reps = the_set.split('x')[:2]
+                num_sets = int(num_sets)
+            else:  # ex: '9'
+                num_sets, reps = 1, the_set
+            partial_reps = '~' in reps
+            # '5+1' is 6 reps, and half reps are dropped: '4.5' is 4 reps.
+            try:
+                num_reps = sum(math.trunc(float(r)) for r in reps.replace('~', '').split('+'))
+            except ValueError:
+                continue
+            if num_reps > 100:
+                break
+            sets += [(num_reps, weight, partial_reps)] * num_sets
+        return sets
+
+    sets_str = sets_str.replace(' ', '')
+    if '@' not in sets_str:
+        # bodyweight sets
+        return expand(sets_str, 0)
+
+    # '10@65,4,5@80,2x2@90' -> ['10', '65', '4,5', '80', '2x2', '90']
+    first_split = sets_str.split('@')
+    parts = [first_split[0]]
+    for part in first_split[1:]:
+        parts += [subpart.strip() for subpart in part.split(',', maxsplit=1)]
+
+    sets = []
+    for i in range(0, len(parts), 2):
+        try:
+            sets += expand(parts[i], float(parts[i + 1]))
+        except ValueError:
+            # sets at a weight that can't be parsed are skipped
+            continue
+    return sets
+
+
+def _migration_3_exercise_set(cur):
+    """
+    Add the exercise_set table, and fill it from the existing daily_sets.
+
+    exercise_set
+    One row per individual set, materialized from the sets_string of a valid
+    daily_sets item when that item is written. Readers get typed rows straight
+    from SQL instead of re-parsing sets strings.
+    Ex: ('bb bench', '2025-06-21', '2x8@135') -> two rows of 8 reps @ 135
+
+    fields
+    - daily_sets_id: the daily_sets item the set was parsed from. Deleting the
+      item deletes its sets.
+    - exercise, date: copied from the daily_sets item
+    - reps: INTEGER
+    - weight: REAL, 0 for bodyweight sets
+    - partial_reps: boolean (0/1)
+    """
+    cur.execute("""
+        CREATE TABLE exercise_set(
+            id INTEGER PRIMARY KEY,
+            daily_sets_id INTEGER NOT NULL REFERENCES daily_sets(id) ON DELETE CASCADE,
+            exercise TEXT,
+            date TEXT,
+            reps INTEGER,
+            weight REAL,
+            partial_reps INTEGER
+        )
+    """)
+    cur.execute("CREATE INDEX idx_exercise_set_exercise_date ON exercise_set(exercise, date)")
+    cur.execute("CREATE INDEX idx_exercise_set_daily_sets_id ON exercise_set(daily_sets_id)")
+
+    rows = []
+    # Items without a date (lines before a file's first <h2>) have no sets to place in time.
+    items = cur.execute("""
+        SELECT id, exercise, date, sets_string FROM daily_sets
+        WHERE is_valid = 1 AND date IS NOT NULL
+    """).fetchall()
+    for rowid, exercise, date_str, sets_str in items:
+        try:
+            sets = _migration_3_sets(sets_str)
+        except ValueError:
+            logger.warning(f"Failed to parse sets. {date_str}, {exercise}: {sets_str}")
+            continue
+        for reps, weight, partial_reps in sets:
+            rows.append((rowid, exercise, date_str, reps, weight, partial_reps))
+    cur.executemany("""
+        INSERT INTO exercise_set(daily_sets_id, exercise, date, reps, weight, partial_reps)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, rows)
+
+
+def _migration_4_exercise_version(cur):
+    """
+    Add the exercise_version table, kept up to date by triggers.
+
+    exercise_version
+    A counter per exercise that goes up whenever one of the exercise's
+    exercise_set items is inserted, updated or deleted. The exercise-sets cache
+    (see sql_cache) compares these counters to find out which exercises it
+    needs to rebuild.
+    """
+    cur.execute("""
+        CREATE TABLE exercise_version(
+            exercise TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    """)
+    cur.execute("""
+        INSERT INTO exercise_version(exercise, version)
+        SELECT DISTINCT exercise, 1 FROM exercise_set
+    """)
+    bump = """
+        INSERT INTO exercise_version(exercise, version) VALUES ({row}.exercise, 1)
+        ON CONFLICT(exercise) DO UPDATE SET version = version + 1;
+    """
+    cur.execute(f"""
+        CREATE TRIGGER exercise_set_ai AFTER INSERT ON exercise_set BEGIN
+            {bump.format(row='NEW')}
+        END
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER exercise_set_ad AFTER DELETE ON exercise_set BEGIN
+            {bump.format(row='OLD')}
+        END
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER exercise_set_au AFTER UPDATE ON exercise_set BEGIN
+            {bump.format(row='OLD')}
+            {bump.format(row='NEW')}
+        END
+    """)
+
+
+def _migration_5_daily_sets_fts(cur):
+    """
+    Add a full-text index over the exercise, comments and raw line of every
+    daily_sets item, kept in sync by triggers.
+
+    daily_sets_fts
+    An FTS5 table whose rowid is the daily_sets id. It keeps its own copy of
+    the text, so it doesn't depend on the columns of daily_sets. The prefix
+    indexes make searches for partial words ("shoul*") fast.
+    """
+    cur.execute("""
+        CREATE VIRTUAL TABLE daily_sets_fts USING fts5(
+            exercise, comments, line,
+            prefix = '2 3'
+        )
+    """)
+    cur.execute("""
+        INSERT INTO daily_sets_fts(rowid, exercise, comments, line)
+        SELECT id, exercise, comments, line FROM daily_sets
+    """)
+    cur.execute("""
+        CREATE TRIGGER daily_sets_fts_ai AFTER INSERT ON daily_sets BEGIN
+            INSERT INTO daily_sets_fts(rowid, exercise, comments, line)
+            VALUES (NEW.id, NEW.exercise, NEW.comments, NEW.line);
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER daily_sets_fts_ad AFTER DELETE ON daily_sets BEGIN
+            DELETE FROM daily_sets_fts WHERE rowid = OLD.id;
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER daily_sets_fts_au AFTER UPDATE OF exercise, comments, line ON daily_sets BEGIN
+            UPDATE daily_sets_fts SET exercise = NEW.exercise, comments = NEW.comments, line = NEW.line
+            WHERE rowid = NEW.id;
+        END
+    """)
+
+
+def _migration_6_exercise(cur):
+    """
+    Add the exercise table. daily_sets and exercise_set reference it by id
+    instead of repeating the exercise name in every row.
+
+    exercise
+    One row per exercise name, with statistics kept up to date by triggers, so
+    listing the exercises or finding the first date of one is a lookup instead
+    of a scan over daily_sets.
+
+    fields
+    - name: UNIQUE, ex: 'bb bench'
+    - first_date, last_date: earliest and latest date of the exercise's
+      daily_sets items (valid or not). NULL when it has no daily_sets items.
+    - set_count: number of the exercise's exercise_set items
+    - version: goes up whenever one of the exercise's exercise_set items is
+      inserted, updated or deleted. Replaces the exercise_version table.
+
+    Exercise rows are never deleted, so a version never goes back to a value
+    that the exercise-sets cache has already seen.
+    """
+    cur.execute("""
+        CREATE TABLE exercise(
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            first_date TEXT,
+            last_date TEXT,
+            set_count INTEGER NOT NULL DEFAULT 0,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cur.execute("""
+        INSERT INTO exercise(name)
+        SELECT DISTINCT exercise FROM daily_sets WHERE exercise IS NOT NULL ORDER BY exercise
+    """)
+
+    # Rebuild both tables with exercise_id in place of the exercise name.
+    # Dropping daily_sets also drops its FTS triggers; they are recreated below.
+    cur.execute("""
+        CREATE TABLE daily_sets_new(
+            id INTEGER PRIMARY KEY,
+            exercise_id INTEGER REFERENCES exercise(id),
+            date TEXT,
+            sets_string TEXT,
+            comments TEXT,
+            is_valid INTEGER,
+            line TEXT,
+            import_id INTEGER REFERENCES import(id) ON DELETE CASCADE
+        )
+    """)
+    cur.execute("""
+        INSERT INTO daily_sets_new(id, exercise_id, date, sets_string, comments, is_valid, line, import_id)
+        SELECT daily_sets.id, exercise.id, date, sets_string, comments, is_valid, line, import_id
+        FROM daily_sets LEFT JOIN exercise ON exercise.name = daily_sets.exercise
+    """)
+    cur.execute("""
+        CREATE TABLE exercise_set_new(
+            id INTEGER PRIMARY KEY,
+            daily_sets_id INTEGER NOT NULL REFERENCES daily_sets(id) ON DELETE CASCADE,
+            exercise_id INTEGER NOT NULL REFERENCES exercise(id),
+            date TEXT,
+            reps INTEGER,
+            weight REAL,
+            partial_reps INTEGER
+        )
+    """)
+    cur.execute("""
+        INSERT INTO exercise_set_new(id, daily_sets_id, exercise_id, date, reps, weight, partial_reps)
+        SELECT exercise_set.id, daily_sets_id, exercise.id, date, reps, weight, partial_reps
+        FROM exercise_set JOIN exercise ON exercise.name = exercise_set.exercise
+    """)
+    cur.execute("DROP TABLE exercise_set")
+    cur.execute("DROP TABLE exercise_version")
+    cur.execute("DROP TABLE daily_sets")
+    cur.execute("ALTER TABLE daily_sets_new RENAME TO daily_sets")
+    cur.execute("ALTER TABLE exercise_set_new RENAME TO exercise_set")
+
+    cur.execute("CREATE INDEX idx_daily_sets_exercise_date ON daily_sets(exercise_id, date)")
+    cur.execute("CREATE INDEX idx_daily_sets_date ON daily_sets(date)")
+    cur.execute("CREATE INDEX idx_daily_sets_import_id ON daily_sets(import_id)")
+    cur.execute("CREATE INDEX idx_exercise_set_exercise_date ON exercise_set(exercise_id, date)")
+    cur.execute("CREATE INDEX idx_exercise_set_daily_sets_id ON exercise_set(daily_sets_id)")
+
+    cur.execute("""
+        UPDATE exercise SET
+            first_date = (SELECT min(date) FROM daily_sets WHERE exercise_id = exercise.id),
+            last_date = (SELECT max(date) FROM daily_sets WHERE exercise_id = exercise.id),
+            set_count = (SELECT count(*) FROM exercise_set WHERE exercise_id = exercise.id)
+    """)
+
+    # daily_sets -> exercise.first_date, exercise.last_date
+    # An insert can only widen the date range. A delete or update may shrink
+    # it, so the range is looked up again with idx_daily_sets_exercise_date.
+    widen = """
+        UPDATE exercise SET
+            first_date = CASE WHEN first_date IS NULL OR NEW.date < first_date THEN NEW.date ELSE first_date END,
+            last_date = CASE WHEN last_date IS NULL OR NEW.date > last_date THEN NEW.date ELSE last_date END
+        WHERE id = NEW.exercise_id;
+    """
+    recompute = """
+        UPDATE exercise SET
+            first_date = (SELECT min(date) FROM daily_sets WHERE exercise_id = OLD.exercise_id),
+            last_date = (SELECT max(date) FROM daily_sets WHERE exercise_id = OLD.exercise_id)
+        WHERE id = OLD.exercise_id;
+    """
+    cur.execute(f"CREATE TRIGGER daily_sets_ai AFTER INSERT ON daily_sets BEGIN {widen} END")
+    cur.execute(f"CREATE TRIGGER daily_sets_ad AFTER DELETE ON daily_sets BEGIN {recompute} END")
+    cur.execute(f"""
+        CREATE TRIGGER daily_sets_au AFTER UPDATE OF exercise_id, date ON daily_sets BEGIN
+            {recompute}
+            {widen}
+        END
+    """)
+
+    # exercise_set -> exercise.set_count, exercise.version
+    add = "UPDATE exercise SET set_count = set_count + 1, version = version + 1 WHERE id = NEW.exercise_id;"
+    remove = "UPDATE exercise SET set_count = set_count - 1, version = version + 1 WHERE id = OLD.exercise_id;"
+    cur.execute(f"CREATE TRIGGER exercise_set_ai AFTER INSERT ON exercise_set BEGIN {add} END")
+    cur.execute(f"CREATE TRIGGER exercise_set_ad AFTER DELETE ON exercise_set BEGIN {remove} END")
+    cur.execute(f"CREATE TRIGGER exercise_set_au AFTER UPDATE ON exercise_set BEGIN {remove} {add} END")
+
+    # The FTS index keeps its copy of the exercise name.
+    name = "(SELECT name FROM exercise WHERE id = NEW.exercise_id)"
+    cur.execute(f"""
+        CREATE TRIGGER daily_sets_fts_ai AFTER INSERT ON daily_sets BEGIN
+            INSERT INTO daily_sets_fts(rowid, exercise, comments, line)
+            VALUES (NEW.id, {name}, NEW.comments, NEW.line);
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER daily_sets_fts_ad AFTER DELETE ON daily_sets BEGIN
+            DELETE FROM daily_sets_fts WHERE rowid = OLD.id;
+        END
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER daily_sets_fts_au AFTER UPDATE OF exercise_id, comments, line ON daily_sets BEGIN
+            UPDATE daily_sets_fts SET exercise = {name}, comments = NEW.comments, line = NEW.line
+            WHERE rowid = NEW.id;
+        END
+    """)
+
+
+def _migration_7_import_file(cur):
+    """
+    Move the content of imported files out of the import table, into the
+    import_file table.
+
+    import_file
+    One row per distinct imported file, keyed by its hash. The compressed
+    content can be hundreds of KB. Kept inline, it made every scan of the
+    import table (listing the imports, checking hashes) read those pages too.
+    Importing the same file twice stores its content once.
+
+    fields
+    - file_hash: hash of the HTML content, see import.file_hash
+    - compressed_file_content: the HTML content compressed
+
+    An import_file row is deleted with the last import that refers to it.
+    """
+    cur.execute("""
+        CREATE TABLE import_file(
+            file_hash TEXT PRIMARY KEY,
+            compressed_file_content BLOB NOT NULL
+        )
+    """)
+    # Imports without a hash can't be looked up by hash, so their content is
+    # dropped. Imports always store both, so this shouldn't happen.
+    cur.execute("""
+        INSERT INTO import_file(file_hash, compressed_file_content)
+        SELECT file_hash, compressed_file_content FROM import
+        WHERE file_hash IS NOT NULL AND compressed_file_content IS NOT NULL
+        ORDER BY id
+        ON CONFLICT(file_hash) DO NOTHING
+    """)
+    # DROP COLUMN rewrites the import table, leaving it with only small rows.
+    cur.execute("ALTER TABLE import DROP COLUMN compressed_file_content")
+    cur.execute("CREATE INDEX idx_import_file_hash ON import(file_hash)")
+    cur.execute("""
+        CREATE TRIGGER import_ad AFTER DELETE ON import BEGIN
+            DELETE FROM import_file
+            WHERE file_hash = OLD.file_hash
+              AND NOT EXISTS (SELECT 1 FROM import WHERE file_hash = OLD.file_hash);
+        END
+    """)
+
+
+def _migration_8_compression_dictionary(cur):
+    """
+    Add the compression_dictionary table, and record which dictionary each
+    import_file item was compressed with.
+
+    compression_dictionary
+    zlib preset dictionaries (see common.train_zdict). Imported files share
+    most of their text (HTML boilerplate, exercise names), so compressing
+    against a dictionary of that text makes the blobs smaller. It starts with
+    the dictionary shipped with the app, and later ones are trained from the
+    user's imports.
+
+    fields
+    - date_time the dictionary was added, stored in SQLite as TEXT
+    - zdict: the dictionary
+    - sample_count: number of files it was trained from, 0 for the shipped one
+
+    import_file.dictionary_id is NULL for files compressed without a
+    dictionary, which includes every file stored before this migration.
+    """
+    cur.execute("""
+        CREATE TABLE compression_dictionary(
+            id INTEGER PRIMARY KEY,
+            date_time TEXT,
+            zdict BLOB NOT NULL,
+            sample_count INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cur.execute("INSERT INTO compression_dictionary(date_time, zdict) VALUES (DATETIME(), ?)", (DEFAULT_ZDICT,))
+    cur.execute("ALTER TABLE import_file ADD COLUMN dictionary_id INTEGER REFERENCES compression_dictionary(id)")
+
+
+def _migration_9_raw_exercise(cur):
+    """
+    Record the exercise name of each daily_sets item as it was before aliases
+    were applied, so a change to the alias file can be applied with UPDATEs
+    instead of re-importing every file.
+
+    fields
+    - daily_sets.raw_exercise_id: exercise item with the name parsed from the
+      line, before the alias dictionary resolved it to a common name. For
+      items edited by the user, the name the user entered. NULL for items
+      imported before this migration; the next alias update re-imports those.
+
+    exercise_set.exercise_id follows daily_sets.exercise_id through a trigger,
+    so renaming a daily_sets item doesn't require re-parsing its sets.
+    """
+    cur.execute("ALTER TABLE daily_sets ADD COLUMN raw_exercise_id INTEGER REFERENCES exercise(id)")
+    # (raw_exercise_id, exercise_id): the alias update reads the distinct
+    # pairs, and updates the items of one raw name at a time.
+    cur.execute("CREATE INDEX idx_daily_sets_raw_exercise ON daily_sets(raw_exercise_id, exercise_id)")
+    cur.execute("""
+        CREATE TRIGGER daily_sets_exercise_au AFTER UPDATE OF exercise_id ON daily_sets BEGIN
+            UPDATE exercise_set SET exercise_id = NEW.exercise_id
+            WHERE daily_sets_id = NEW.id AND exercise_id IS NOT NEW.exercise_id;
+        END
+    """)
+
+
+
+def _migration_10_html_sections(html_content: str) -> list[tuple[str, str | None]]:
+    """
+    Return (fingerprint, date) for each <h2> section of an HTML file, the way
+    sql_utility split and fingerprinted sections when migration 10 shipped.
+    This is a frozen copy: changes to the parser must not change what the
+    migration stores.
+    """
+    def fingerprint(section):
+        return hashlib.sha256("\n".join(section).encode('utf-8')).hexdigest()
+
+    # Split the body into sections, one per <h2>. Lines in the body before
+    # the first <h2> are a section of their own.
+    sections = []
+    parsing_exercises = False
+    section = []
+    for line in html_content.split('\n'):
+        line = line.lower().strip()
+        if "<body>" in line:
+            parsing_exercises = True
+        elif "</body>" in line:
+            parsing_exercises = False
+
+        if parsing_exercises:
+            if "<h2>" in line and section:
+                sections.append(section)
+                section = []
+            section.append(line)
+        elif section:
+            sections.append(section)
+            section = []
+    if section:
+        sections.append(section)
+
+    # A section without a valid date gets the last valid date before it.
+    result = []
+    curr_date = None
+    for section in sections:
+        line = section[0]
+        if "<h2>" in line:
+            date_part = line[len("<h2>"): len(line) - len("</h2>")].split(" ")[0]
+            try:
+                month, day, year = [int(item) for item in date_part.split("/", 3)]
+                if year < 2000:
+                    year += 2000
+                curr_date = datetime.date(year, month, day)
+            except ValueError:
+                pass
+        result.append((fingerprint(section), curr_date.isoformat() if curr_date else None))
+    return result
+
+
+def _migration_10_import_section(cur):
+    """
+    Add the import_section table, for incremental imports.
+
+    import_section
+    One row per <h2> date section of an imported file. Exports from Apple
+    Notes are cumulative, so an incremental import only parses the sections
+    whose fingerprint isn't already stored.
+
+    fields
+    - import_id: the import the section was imported by
+    - fingerprint: sha256 of the section's lines, see _migration_10_html_sections
+    - date: date of the section's <h2>, YYYY-MM-DD
+    - daily_sets.section_id: the section a daily_sets item was parsed from.
+      Deleting a section (when a changed copy of it is imported) deletes its
+      items.
+
+    Sections are backfilled from the stored files of existing imports. Their
+    items are matched to a section by date.
+    """
+    cur.execute("""
+        CREATE TABLE import_section(
+            id INTEGER PRIMARY KEY,
+            import_id INTEGER NOT NULL REFERENCES import(id) ON DELETE CASCADE,
+            fingerprint TEXT NOT NULL,
+            date TEXT
+        )
+    """)
+    cur.execute("CREATE INDEX idx_import_section_import_id ON import_section(import_id)")
+    cur.execute("CREATE INDEX idx_import_section_date ON import_section(date)")
+    cur.execute("ALTER TABLE daily_sets ADD COLUMN section_id INTEGER REFERENCES import_section(id) ON DELETE CASCADE")
+    cur.execute("CREATE INDEX idx_daily_sets_section_id ON daily_sets(section_id)")
+
+    imports = cur.execute("""
+        SELECT import.id, import_file.compressed_file_content, compression_dictionary.zdict
+        FROM import
+        JOIN import_file ON import_file.file_hash = import.file_hash
+        LEFT JOIN compression_dictionary ON compression_dictionary.id = import_file.dictionary_id
+    """).fetchall()
+    for import_id, compressed_content, zdict in imports:
+        html_content = decompress_html(compressed_content, zdict)
+        for fingerprint, date in _migration_10_html_sections(html_content):
+            cur.execute("INSERT INTO import_section(import_id, fingerprint, date) VALUES (?, ?, ?)",
+                        (import_id, fingerprint, date))
+            cur.execute("UPDATE daily_sets SET section_id = ? WHERE import_id = ? AND date = ? AND section_id IS NULL",
+                        (cur.lastrowid, import_id, date))
+
+
+def _migration_11_daily_sets_sort_date(cur):
+    """
+    Index the Date sort key of the View & Edit Sets table.
+
+    Pages are sorted by (COALESCE(date, ''), id), so undated items have a key
+    that can be compared. idx_daily_sets_date can't be used for that order,
+    so SQLite sorted every item in a temp B-tree to show one page. The rowid
+    at the end of the index entries breaks ties.
+    """
+    cur.execute("CREATE INDEX idx_daily_sets_sort_date ON daily_sets(COALESCE(date, ''))")
+
+
+def _migration_12_import_incremental_method(cur):
+    """
+    Record which imports are incremental, so an incremental import only
+    replaces the changed days of its own earlier imports, not of unrelated
+    files that happen to have a workout on the same day.
+
+    fields
+    - import.incremental_method: the method of an incremental import, ex:
+      'Apple Notes'. NULL for imports of whole files.
+
+    Apple Notes exports are cumulative, so the earlier Apple Notes imports,
+    incremental or not, are all marked as such.
+    """
+    cur.execute("ALTER TABLE import ADD COLUMN incremental_method TEXT")
+    cur.execute("UPDATE import SET incremental_method = 'Apple Notes' WHERE name LIKE 'Apple Notes,%'")
+
+
+def _migration_13_exercise_item_count(cur):
+    """
+    Count the daily_sets items of each exercise, so the exercises that still
+    have items can be listed. last_date can't tell: it is NULL for an
+    exercise whose items all have no date.
+
+    fields
+    - exercise.item_count: number of daily_sets items (valid or not) with the
+      exercise's id. Kept up to date by triggers, like first_date and last_date.
+    """
+    cur.execute("ALTER TABLE exercise ADD COLUMN item_count INTEGER NOT NULL DEFAULT 0")
+    cur.execute("""
+        UPDATE exercise SET item_count = (SELECT count(*) FROM daily_sets WHERE exercise_id = exercise.id)
+    """)
+
+    add = "UPDATE exercise SET item_count = item_count + 1 WHERE id = NEW.exercise_id;"
+    remove = "UPDATE exercise SET item_count = item_count - 1 WHERE id = OLD.exercise_id;"
+    cur.execute(f"CREATE TRIGGER daily_sets_count_ai AFTER INSERT ON daily_sets BEGIN {add} END")
+    cur.execute(f"CREATE TRIGGER daily_sets_count_ad AFTER DELETE ON daily_sets BEGIN {remove} END")
+    cur.execute(f"""
+        CREATE TRIGGER daily_sets_count_au AFTER UPDATE OF exercise_id ON daily_sets
+        WHEN OLD.exercise_id IS NOT NEW.exercise_id BEGIN
+            {remove}
+            {add}
+        END
+    """)
+
+# MIGRATIONS[i] upgrades the schema from version i to version i + 1.
+MIGRATIONS = [
+    _migration_1_create_tables,
+    _migration_2_keys_and_indexes,
+    _migration_3_exercise_set,
+    _migration_4_exercise_version,
+    _migration_5_daily_sets_fts,
+    _migration_6_exercise,
+    _migration_7_import_file,
+    _migration_8_compression_dictionary,
+    _migration_9_raw_exercise,
+    _migration_10_import_section,
+    _migration_11_daily_sets_sort_date,
+    _migration_12_import_incremental_method,
+    _migration_13_exercise_item_count,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(db: ConnectionManager) -> int:
+    """Return the schema version of the SQLite file."""
+    with db.cursor() as cur:
+        return cur.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(db: ConnectionManager) -> None:
+    """Apply every pending migration to the SQLite file."""
+    version = get_schema_version(db)
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"{db.db_file} has schema version {version}, but this "
+                           f"version of Lift Log only supports up to {SCHEMA_VERSION}.")
+
+    con = db.get_connection()
+    # Tables are rebuilt during some migrations. Foreign keys must be off while
+    # that happens, and this pragma can't be changed inside a transaction.
+    con.execute("PRAGMA foreign_keys = OFF")
+    try:
+        # All pending migrations run in one transaction: if any of them fails,
+        # the file is left exactly as it was.
+        with db.transaction() as cur:
+            for i in range(version, SCHEMA_VERSION):
+                logger.info(f"Migrating {db.db_file} from schema version {i} to {i + 1}")
+                MIGRATIONS[i](cur)
+            if version < SCHEMA_VERSION:
+                violations = cur.execute("PRAGMA foreign_key_check").fetchall()
+                if violations:
+                    raise RuntimeError(f"Migrations left foreign key violations: {violations}")
+                # PRAGMA doesn't accept bound parameters.
+                cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    finally:
+        con.execute("PRAGMA foreign_keys = ON")
@@ -1,28 +1,112 @@
 """
 Contains utility functions for interacting with the SQLite database.
 """
+from concurrent.futures import ProcessPoolExecutor
 import datetime
+import functools
+import glob
+import hashlib
 import logging
-import math
+import multiprocessing
 import os.path
-import sqlite3
 from pathlib import Path
+import re
 from tkinter import END, Text
-from typing import Dict
+from typing import Dict, Iterable, Iterator, NamedTuple, Set
 
-from src.common import (hash_html, compress_html, decompress_html,
+from src.common import (compress_html, decompress_html, train_zdict, hash_html_file, HtmlFileReader,
                     print_to_text_widget, ALL, ANY, VALID, HAS_COMMENTS,
                     NO_COMMENTS, INVALID, HTML)
+from src.events import AliasesChanged, bus, ImportDeleted, SetsDeleted, SetsEdited, SetsImported
+from src.exercise_normalizer import get_normalizer
+from src.obj.exercise_arc import ArcSummary
 from src.obj.exercise_set import ExerciseSet
+from src.sets_parser import format_errors, is_sets_string_valid, parse_sets_string
+from src.sql_cache import ExerciseSetsCache
+from src.sql_connection import ConnectionManager
+from src.sql_migrations import migrate
+from src.sql_writer import DatabaseWriter
 
 logger = logging.getLogger(__name__)
 
 # Filepath for the user's SQLite file
 SQLITE_FILE = os.path.join("usr", "personal.db")
 
+# All functions in this file go through this manager instead of opening their
+# own connections.
+db = ConnectionManager(SQLITE_FILE)
+
+# The GUI runs the functions that write (import_sets_via_html, delete_import,
+# update_daily_sets_to_alias, update_user_edited_daily_sets, delete_daily_sets)
+# on this writer thread, so writes never block the Tk main thread. Each of
+# them publishes an event on src.events.bus once its changes are committed.
+writer = DatabaseWriter()
+
+# Read by the Tk main thread through get_exercise_sets_dict.
+exercise_sets_cache = ExerciseSetsCache(db)
+
 # Filepath for the user's exercise aliases file
 ALIASES_FILE = os.path.join("usr", "aliases.txt")
 
+# Number of rows in one page of the View & Edit Sets sheet.
+PAGE_SIZE = 200
+
+# Columns of the View & Edit Sets sheet that can be sorted in SQL, mapped to
+# the SQL expression they are sorted by. NULLs are coalesced because keyset
+# pagination can't compare them.
+DATE = 'Date'
+RELEVANCE = 'Relevance'
+SORT_COLUMNS = {
+    DATE: "COALESCE(daily_sets.date, '')",
+    'Exercise': "COALESCE(exercise.name, '')",
+    'Sets': "COALESCE(daily_sets.sets_string, '')",
+    'Comments': "COALESCE(daily_sets.comments, '')",
+    'Valid': "COALESCE(daily_sets.is_valid, 0)",
+    'Line': "COALESCE(daily_sets.line, '')",
+    'Import': "COALESCE(import.name, '')",
+    'Import Time': "COALESCE(import.date_time, '')",
+    # Only available while searching. bm25 scores are negative, and lower is a
+    # better match, so negate it to make descending order show the best first.
+    RELEVANCE: "-matches.score",
+}
+
+# Largest number of ? parameters in one statement. SQLite versions before
+# 3.32 allow at most 999.
+MAX_SQL_PARAMS = 500
+
+# Training arcs with this many daily_sets items or fewer are dropped, except
+# the most recent arc of each exercise.
+MIN_ARC_LEN = 4
+
+# Numbers the valid daily_sets items of each exercise by training arc. An item
+# that comes :separator days or more after the previous item of the same
+# exercise starts a new arc: LAG finds the gaps, and a running SUM of the gap
+# flags is the arc number. {where} restricts the items, see _arcs_query.
+_ARCS_CTE = """
+    WITH item AS (
+        SELECT id, exercise_id, date,
+               -- LAG is NULL for the first item, which starts the first arc.
+               COALESCE(julianday(date) - julianday(LAG(date) OVER by_date) >= :separator, 1) AS starts_arc
+        FROM daily_sets
+        WHERE is_valid = 1 AND date IS NOT NULL {where}
+        WINDOW by_date AS (PARTITION BY exercise_id ORDER BY date, id)
+    ),
+    item_arc AS (
+        SELECT id, exercise_id, date,
+               SUM(starts_arc) OVER (PARTITION BY exercise_id ORDER BY date, id) AS arc_num
+        FROM item
+    ),
+    arc AS (
+        SELECT exercise_id, arc_num, MIN(date) AS start_date, MAX(date) AS end_date, COUNT(*) AS item_count,
+               arc_num = MAX(arc_num) OVER (PARTITION BY exercise_id) AS is_last
+        FROM item_arc
+        GROUP BY exercise_id, arc_num
+    ),
+    kept_arc AS (
+        SELECT * FROM arc WHERE item_count > :min_len OR is_last
+    )
+"""
+
 # These are the tag names used by the Import Status Msg Area.
 # They mirror the built-in logging level names.
 # The constants built into Python logging are actually integers.
@@ -36,129 +120,125 @@ CRITICAL = 'CRITICAL'
 
 def create_tables():
     """
-    Create tables in SQLite if they don't already exist. There are no primary
-    keys because SQLite automatically creates the ROWID field for every item.
+    Create tables in SQLite if they don't already exist, and upgrade the schema
+    of an existing SQLite file to the latest version.
+    See sql_migrations for the tables and their fields.
     """
-    con = sqlite3.connect(SQLITE_FILE)
-    cur = con.cursor()
-
-    # import
-    # When the user imports exercise sets, the instance is recorded in this table.
-    #
-    # Fields
-    # - date_time of the import, stored in SQLite as TEXT (YYYY-MM-DD HH:MM:SS).
-    # - file_hash is the content of the HTML file hashed. It's used for quick
-    #   comparisons to avoid duplicate imports.
-    # - compressed_file_content is the content of the HTML compressed. It can be
-    #   easily decompressed when the user wants to view the file content.
-    # - name, ex: "some_file.html, YYYY-MM-DD to YYYY-MM-DD",
-    #             "apple notes, YYYY-MM-DD to YYYY-MM-DD"
-    cur.execute("""
-            CREATE TABLE IF NOT EXISTS import(
-                date_time TEXT,
-                file_hash TEXT,
-                compressed_file_content BLOB,
-                name TEXT
-            )
-        """)
-
-    # daily_sets
-    # This represents all the sets a user has logged for a particular exercise on a particular date.
-    # Ex: all bench press sets logged on 21 June 2025.
-    #     -> ('bb bench', '2025-06-21', '2x8@135, 2x6@145', 1)
-    #
-    # fields
-    # - exercise
-    # - date: stored in SQLite as TEXT (YYYY-MM-DD).
-    # - sets_string: parsed and sanitized from the raw line
-    # - comments: optional
-    # - is_valid: boolean (0/1), but SQLite stores booleans as INTEGER
-    # - line: the raw line in the file where this daily_sets item was detected
-    # - import_id: daily_sets items are added through importing, so they store a
-    #   reference to an import item
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS daily_sets(
-            exercise TEXT,
-            date TEXT,
-            sets_string TEXT,
-            comments TEXT,
-            is_valid INTEGER,
-            line TEXT,
-            import_id INTEGER,
-            FOREIGN KEY(import_id) REFERENCES import(ROWID)
-        )
-    """)
-
-    cur.close()
-    con.close()
+    migrate(db)
 
 def get_first_date(exercise=None):
     """
     Return earliest date that the given exercise was logged, or the earliest date
     that any exercise was logged.
+    The dates are kept in the exercise table, so this doesn't read daily_sets.
     :param exercise:
     :return:
     """
-    con = sqlite3.connect(SQLITE_FILE)
-    cur = con.cursor()
-
-    if exercise is None or exercise == ALL:
-        result = cur.execute(f"SELECT min(date) FROM daily_sets")
-    else:
-        result = cur.execute(f"SELECT min(date) FROM daily_sets where exercise = '{exercise}'")
-    date_str = result.fetchone()[0]
+    with db.cursor() as cur:
+        if exercise is None or exercise == ALL:
+            result = cur.execute("SELECT min(first_date) FROM exercise")
+        else:
+            result = cur.execute("SELECT first_date FROM exercise WHERE name = ?", (exercise,))
+        row = result.fetchone()
+    date_str = None if row is None else row[0]
 
     if date_str is None:
         return datetime.date.today()
 
     y, m, d = [int(p) for p in date_str.split('-')]
-    dt = datetime.date(year=y, month=m, day=d)
-
-    cur.close()
-    con.close()
-    return dt
-
+    return datetime.date(year=y, month=m, day=d)
 
-def get_daily_sets(exercise: str) -> list[tuple[str, str, str, str]]:
-    """Get daily_sets items from SQLite associated with given exercise."""
-    con = sqlite3.connect(SQLITE_FILE)
-    cur = con.cursor()
 
-    result = cur.execute(f"""
-        SELECT exercise, date, sets_string, comments FROM daily_sets 
-        WHERE is_valid = 1 AND exercise = '{exercise}'  
-        ORDER BY date
-    """)
-    items = result.fetchall()  # fetch list of tuples
+def _arcs_query(select: str, exercise: str | None) -> str:
+    """Return _ARCS_CTE followed by select, for one exercise or (None) all of them."""
+    where = "" if exercise is None else "AND exercise_id = (SELECT id FROM exercise WHERE name = :exercise)"
+    return _ARCS_CTE.format(where=where) + select
 
-    cur.close()
-    con.close()
 
-    return items
-
-
-def get_daily_sets_with_imports(exercise: str = ALL,
-                                start_date: datetime.date = None,
-                                end_date: datetime.date = None,
-                                comments: str = ANY,
-                                valid: str = ANY
-                                ) -> list[tuple]:
+def get_arc_summaries(exercise: str = None,
+                      separator: int = 30,
+                      min_len: int = MIN_ARC_LEN) -> list[ArcSummary]:
+    """
+    Get the boundaries and item counts of the training arcs of one exercise,
+    or of every exercise, in one query. Nothing but the summaries is loaded.
+
+    :param exercise: the exercise to find arcs for, or None for all exercises
+    :param separator: minimum num days that separates one arc from another
+    :param min_len: arcs with this many items or fewer are dropped, except
+           each exercise's most recent arc
+    :return: arcs ordered by start date
     """
-    Retrieve daily sets items from SQLite, and return them as a list of tuples.
-    This returns the fields needed to build the View & Edit Sets table, so it
-    also includes some extra info from the import table.
-    :return: [(daily_sets item),...]
+    with db.cursor() as cur:
+        result = cur.execute(_arcs_query("""
+            SELECT exercise.name, arc_num, start_date, end_date, kept_arc.item_count
+            FROM kept_arc JOIN exercise ON exercise.id = kept_arc.exercise_id
+            ORDER BY start_date, exercise.name
+        """, exercise), {'exercise': exercise, 'separator': separator, 'min_len': min_len})
+        return [ArcSummary(name, arc_num, datetime.date.fromisoformat(start_date),
+                           datetime.date.fromisoformat(end_date), item_count)
+                for name, arc_num, start_date, end_date, item_count in result.fetchall()]
+
+
+def get_arc_daily_sets(exercise: str,
+                       separator: int = 30,
+                       min_len: int = MIN_ARC_LEN) -> list[tuple[int, str, str, str, str]]:
     """
-    con = sqlite3.connect(SQLITE_FILE)
-    cur = con.cursor()
+    Get the valid daily_sets items of an exercise that are part of a training
+    arc (see get_arc_summaries), with the number of their arc.
 
+    :return: [(arc_num, exercise, date, sets_string, comments), ...], ordered by date
+    """
+    with db.cursor() as cur:
+        result = cur.execute(_arcs_query("""
+            SELECT item_arc.arc_num, exercise.name, daily_sets.date, daily_sets.sets_string, daily_sets.comments
+            FROM item_arc
+            JOIN kept_arc USING (exercise_id, arc_num)
+            JOIN daily_sets ON daily_sets.id = item_arc.id
+            JOIN exercise ON exercise.id = item_arc.exercise_id
+            ORDER BY item_arc.date, item_arc.id
+        """, exercise), {'exercise': exercise, 'separator': separator, 'min_len': min_len})
+        return result.fetchall()
+
+
+def get_daily_sets_page(exercise: str = ALL,
+                        start_date: datetime.date = None,
+                        end_date: datetime.date = None,
+                        comments: str = ANY,
+                        valid: str = ANY,
+                        search: str = '',
+                        sort_column: str = DATE,
+                        descending: bool = True,
+                        after: tuple = None,
+                        limit: int = PAGE_SIZE
+                        ) -> tuple[list[tuple], tuple | None]:
+    """
+    Retrieve one page of daily sets items from SQLite, and return them as a
+    list of tuples. This returns the fields needed to build the View & Edit
+    Sets table, so it also includes some extra info from the import table.
+
+    Pages use keyset pagination: rows are sorted by (sort column, rowid), and
+    the next page starts after the key of the last row on this page. Unlike
+    OFFSET, SQLite doesn't need to walk the rows of the earlier pages again.
+
+    :param search: if given, only return items whose exercise, comments or
+           line match this text (see _fts_query)
+    :param sort_column: one of SORT_COLUMNS. RELEVANCE requires a search.
+    :param descending: sort direction
+    :param after: key returned with the previous page, or None for the first page
+    :param limit: max number of rows in the page
+    :return: ([(daily_sets item),...], key of the next page or None if this is the last page)
+    """
     where_conditions = []
+    params = []
     if exercise != ALL:
-        where_conditions.append(f"daily_sets.exercise = '{exercise}'")
+        where_conditions.append("daily_sets.exercise_id = (SELECT id FROM exercise WHERE name = ?)")
+        params.append(exercise)
     if start_date is not None:
-        where_conditions.append(f"daily_sets.date >= '{start_date.strftime('%Y-%m-%d')}'")
+        where_conditions.append("daily_sets.date >= ?")
+        params.append(start_date.strftime('%Y-%m-%d'))
     if end_date is not None:
-        where_conditions.append(f"daily_sets.date <= '{end_date.strftime('%Y-%m-%d')}'")
+        where_conditions.append("daily_sets.date <= ?")
+        params.append(end_date.strftime('%Y-%m-%d'))
     if comments == HAS_COMMENTS:
         where_conditions.append("daily_sets.comments != ''")
     elif comments == NO_COMMENTS:
@@ -168,23 +248,76 @@ def get_daily_sets_with_imports(exercise: str = ALL,
     elif valid == VALID:
         where_conditions.append("daily_sets.is_valid = 1")
 
+    # Full-text search runs first, against the FTS index. The matches are
+    # then joined to daily_sets like any other filter.
+    fts_query = _fts_query(search)
+    if fts_query:
+        cte_str = """
+            WITH matches AS (
+                SELECT rowid AS id, rank AS score FROM daily_sets_fts WHERE daily_sets_fts MATCH ?
+            )
+        """
+        join_str = "JOIN matches ON matches.id = daily_sets.id"
+        params.insert(0, fts_query)
+    else:
+        cte_str = ''
+        join_str = ''
+        if sort_column == RELEVANCE:
+            sort_column = DATE
+
+    sort_expr = SORT_COLUMNS[sort_column]
+    direction = "DESC" if descending else "ASC"
+    if after is not None:
+        # The first condition follows from the second, but SQLite only seeks
+        # in an index on the sort expression (see idx_daily_sets_sort_date)
+        # for a plain comparison, not for a row value.
+        where_conditions.append(f"{sort_expr} {'<=' if descending else '>='} ?")
+        where_conditions.append(f"({sort_expr}, daily_sets.id) {'<' if descending else '>'} (?, ?)")
+        params.append(after[0])
+        params.extend(after)
+
     if len(where_conditions) == 0:
         where_str = ''
     else:
         where_str = "WHERE " + " AND ".join(where_conditions)
 
-    result = cur.execute(f"""
-        SELECT daily_sets.ROWID, daily_sets.date, daily_sets.exercise, daily_sets.sets_string, 
-               daily_sets.comments, daily_sets.is_valid, daily_sets.line, import.name, import.date_time 
-        FROM daily_sets 
-        FULL OUTER JOIN import ON daily_sets.import_id = import.ROWID
-        {where_str}
-        ORDER BY daily_sets.date DESC
-    """)
-    items = result.fetchall()  # fetch list of tuples
-    cur.close()
-    con.close()
-    return items
+    with db.cursor() as cur:
+        result = cur.execute(f"""
+            {cte_str}
+            SELECT daily_sets.ROWID, daily_sets.date, exercise.name, daily_sets.sets_string, 
+                   daily_sets.comments, daily_sets.is_valid, daily_sets.line, import.name, import.date_time,
+                   {sort_expr}
+            FROM daily_sets 
+            {join_str}
+            LEFT JOIN exercise ON daily_sets.exercise_id = exercise.id
+            LEFT JOIN import ON daily_sets.import_id = import.ROWID
+            {where_str}
+            ORDER BY {sort_expr} {direction}, daily_sets.id {direction}
+            LIMIT ?
+        """, params + [limit])
+        rows = result.fetchall()  # fetch list of tuples
+
+    # The sort value is only selected to build the key of the next page.
+    next_key = (rows[-1][-1], rows[-1][0]) if len(rows) == limit else None
+    return [row[:-1] for row in rows], next_key
+
+
+def _fts_query(search: str) -> str:
+    """
+    Turn text typed by the user into an FTS5 query.
+
+    FTS5 has its own query syntax, where characters like '-', '@' and '"' mean
+    something. Each word is quoted instead, so the query matches items that
+    contain all the words. The last word also matches as a prefix, so results
+    show up while the user is still typing it.
+    Ex: 'shoulder pa' -> '"shoulder" "pa"*'
+
+    :return: FTS5 query, or '' if the search contains no words
+    """
+    words = re.findall(r"\w+", search)
+    if not words:
+        return ''
+    return " ".join(f'"{w}"' for w in words) + "*"
 
 
 def get_imports():
@@ -192,241 +325,231 @@ def get_imports():
     Retrieve import items from SQLite, and return them as a list of tuples.
     This only returns the relevant fields needed to build the imports table.
     """
-    con = sqlite3.connect(SQLITE_FILE)
-    cur = con.cursor()
-    result = cur.execute("SELECT name, date_time, rowid FROM import")
-    imports = result.fetchall()  # fetch list of tuples
-    cur.close()
-    con.close()
-    return imports
+    with db.cursor() as cur:
+        result = cur.execute("SELECT name, date_time, rowid FROM import")
+        return result.fetchall()  # fetch list of tuples
 
 def get_import_file_hashes_only():
     """
     Retrieve only file hashes of all import records in SQLite.
     :return: [('filehash1',), ('filehash2',)]
     """
-    con = sqlite3.connect(SQLITE_FILE)
-    cur = con.cursor()
-    result = cur.execute("SELECT file_hash FROM import")
-    imports = result.fetchall()  # fetch list of tuples
-    cur.close()
-    con.close()
-    return imports
+    with db.cursor() as cur:
+        result = cur.execute("SELECT file_hash FROM import")
+        return result.fetchall()  # fetch list of tuples
+
+
+def is_file_imported(file_hash: str) -> bool:
+    """Return True if an import with the given file hash exists."""
+    with db.cursor() as cur:
+        result = cur.execute("SELECT 1 FROM import WHERE file_hash = ? LIMIT 1", (file_hash,))
+        return result.fetchone() is not None
 
 
 def get_file_hash_and_content(import_row_id):
-    con = sqlite3.connect(SQLITE_FILE)
-    cur = con.cursor()
-    result = cur.execute(f"SELECT file_hash, compressed_file_content FROM import WHERE rowid = {import_row_id}")
-    hash_and_content = result.fetchone()  # fetch 1 tuple
-    cur.close()
-    con.close()
-    return hash_and_content
+    """
+    Return the file hash and compressed file content of the given import, and
+    the preset dictionary needed to decompress it (None if there isn't one).
+    The content lives in the import_file table, and is only read here.
+    """
+    with db.cursor() as cur:
+        result = cur.execute("""
+            SELECT import.file_hash, import_file.compressed_file_content, compression_dictionary.zdict
+            FROM import
+            JOIN import_file ON import_file.file_hash = import.file_hash
+            LEFT JOIN compression_dictionary ON compression_dictionary.id = import_file.dictionary_id
+            WHERE import.rowid = ?
+        """, (import_row_id,))
+        return result.fetchone()  # fetch 1 tuple
+
+
+def get_compression_dictionary() -> tuple[int, bytes]:
+    """Return the id and content of the newest compression dictionary."""
+    with db.cursor() as cur:
+        result = cur.execute("SELECT id, zdict FROM compression_dictionary ORDER BY id DESC LIMIT 1")
+        return result.fetchone()
+
+
+def train_compression_dictionary() -> int | None:
+    """
+    Train a new compression dictionary from every stored import file, and
+    recompress the files with it. Dictionaries that are no longer used are
+    deleted.
+    :return: id of the new dictionary, or None if no files are stored
+    """
+    with db.transaction() as cur:
+        files = cur.execute("""
+            SELECT import_file.file_hash, import_file.compressed_file_content, compression_dictionary.zdict
+            FROM import_file
+            LEFT JOIN compression_dictionary ON compression_dictionary.id = import_file.dictionary_id
+        """).fetchall()
+        if not files:
+            return None
+        samples = [(file_hash, decompress_html(blob, zdict)) for file_hash, blob, zdict in files]
+        zdict = train_zdict([content for _, content in samples])
+
+        cur.execute("""
+            INSERT INTO compression_dictionary(date_time, zdict, sample_count) VALUES (DATETIME(), ?, ?)
+        """, (zdict, len(samples)))
+        dictionary_id = cur.lastrowid
+        cur.executemany("UPDATE import_file SET compressed_file_content = ?, dictionary_id = ? WHERE file_hash = ?",
+                        [(compress_html(content, zdict), dictionary_id, file_hash) for file_hash, content in samples])
+        cur.execute("""
+            DELETE FROM compression_dictionary
+            WHERE id != ? AND id NOT IN (SELECT dictionary_id FROM import_file WHERE dictionary_id IS NOT NULL)
+        """, (dictionary_id,))
+    logger.info(f"Trained compression dictionary {dictionary_id} ({len(zdict)} bytes) from {len(samples)} file(s)")
+    return dictionary_id
+
+
+def _should_train_compression_dictionary(cur) -> bool:
+    """
+    Return True once the number of stored files has doubled since the newest
+    dictionary was trained, so files are recompressed O(log n) times in total.
+    """
+    file_count = cur.execute("SELECT count(*) FROM import_file").fetchone()[0]
+    sample_count = cur.execute("SELECT sample_count FROM compression_dictionary ORDER BY id DESC LIMIT 1").fetchone()[0]
+    return file_count >= 2 * max(sample_count, 1)
 
 
 def delete_import(import_row_id):
     """
     Delete the given import and all daily_sets associated with the import.
+    The daily_sets are removed by the ON DELETE CASCADE foreign key, and the
+    file content by a trigger if no other import has the same file.
     :return:
     """
-    con = sqlite3.connect(SQLITE_FILE)
-    cur = con.cursor()
-    cur.execute(f"DELETE FROM import WHERE rowid = {import_row_id}")
-    cur.execute(f"DELETE FROM daily_sets WHERE import_id = {import_row_id}")
-    con.commit()
-    cur.close()
-    con.close()
+    with db.transaction() as cur:
+        exercises = frozenset(name for (name,) in cur.execute("""
+            SELECT DISTINCT exercise.name FROM daily_sets JOIN exercise ON exercise.id = daily_sets.exercise_id
+            WHERE import_id = ?
+        """, (import_row_id,)))
+        cur.execute("DELETE FROM import WHERE rowid = ?", (import_row_id,))
+        db.after_commit(bus.publish, ImportDeleted(import_row_id, exercises))
 
 
 def exercise_sets_already_exist(start_date:datetime.date, end_date:datetime.date) -> bool:
     """Check if exercise sets already exist within the given start and end dates."""
-    con = sqlite3.connect(SQLITE_FILE)
-    cur = con.cursor()
-
-    result = cur.execute(f"SELECT date FROM daily_sets WHERE date >= '{start_date.strftime('%Y-%m-%d')}' AND date <= '{end_date.strftime('%Y-%m-%d')}'")
-    sets_already_exist = result.fetchone() is not None
-
-    cur.close()
-    con.close()
-
-    return sets_already_exist
+    with db.cursor() as cur:
+        result = cur.execute("SELECT date FROM daily_sets WHERE date >= ? AND date <= ?",
+                             (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
+        return result.fetchone() is not None
 
 def get_exercises(add_all: bool=False) -> list[str]:
     """
     Get exercises stored in SQLite. Also add the string literal 'all' to
     the list is add_all is True.
+    Only exercises that still have daily_sets items are returned.
     """
-    con = sqlite3.connect(SQLITE_FILE)
-    cur = con.cursor()
-    exercises = set()
+    with db.cursor() as cur:
+        result = cur.execute("SELECT name FROM exercise WHERE item_count > 0 ORDER BY name")
+        exercises = [item[0] for item in result.fetchall()]
+
     if add_all:
-        exercises.add("all")
+        exercises.append("all")
+        exercises.sort()
+    return exercises
 
-    result = cur.execute("SELECT exercise FROM daily_sets ORDER BY exercise")
-    for item in result.fetchall():
-        exercises.add(item[0])
 
-    cur.close()
-    con.close()
-    return sorted(list(exercises))
+def _get_exercise_ids(cur, exercises) -> dict[str, int]:
+    """
+    Return a dictionary that maps each of the given exercise names to its id
+    in the exercise table. Names that aren't in the table yet are inserted.
+    :param cur: cursor inside the transaction that will use the ids
+    """
+    cur.executemany("INSERT INTO exercise(name) VALUES (?) ON CONFLICT(name) DO NOTHING",
+                    [(e,) for e in set(exercises)])
+    # The exercise table only has a row per distinct name, so read it whole.
+    return dict(cur.execute("SELECT name, id FROM exercise"))
 
 
 def get_exercise_sets_dict():
     """
-    Retrieve daily_sets items from SQLite, convert them into ExerciseSet
-    objects in Python, and build a dictionary that maps exercises to
+    Return a dictionary that maps exercises to their sets, built from the
+    exercise_set items in SQLite. The sets of an exercise are stored as
+    date-sorted arrays (ExerciseSetColumns). Iterating over them yields
     ExerciseSet objects.
 
-    Example conversion from daily_sets to ExerciseSet objects (simplified):
-    '2x8@135,6,5@145' -> 8@135, 8@135, 6@145, 5@145
+    The exercise_set table already holds the individual sets of every valid
+    daily_sets item (see _materialize_exercise_sets), so nothing needs to be
+    parsed here. The dictionary is cached, and only rebuilt for exercises that
+    changed since the last call (see sql_cache). Every caller gets the same
+    dictionary object, so treat it as read-only.
 
     The exercise-sets dictionary maps
-    exercise name (string) -> [individual sets associated with the exercise (ExerciseSet objects)]
-    """
-    logger.info("Building Exercise-Sets Dictionary")
-    con = sqlite3.connect(SQLITE_FILE)
-    cur = con.cursor()
-    exercise_sets_dict = {}
-
-    result = cur.execute("SELECT exercise, date, sets_string FROM daily_sets WHERE is_valid = 1")
-    all_daily_sets_items = result.fetchall()
-    for item in all_daily_sets_items:
-        logger.debug(f'daily_sets item: {item}')
-        # Convert daily_sets item in SQLite to ExerciseSet objects in Python
-        individual_exercise_sets = get_exercise_sets_from_daily_sets(item)
-
-        # Now add those ExerciseSet objects to the dict.
-        if individual_exercise_sets:
-            if len(individual_exercise_sets) > 6:
-                logger.warning(f"More than 6 sets detected for {item}")
-                logger.warning("  These sets will still be added.")
-            exercise = item[0]
-            if exercise not in exercise_sets_dict.keys():
-                exercise_sets_dict[exercise] = individual_exercise_sets
-            else:
-                exercise_sets_dict[exercise] += individual_exercise_sets
+    exercise name (string) -> individual sets associated with the exercise (ExerciseSetColumns)
+    """
+    return exercise_sets_cache.get()
 
-    cur.close()
-    con.close()
-    logger.info("Done building Exercise-Sets Dictionary")
-    return exercise_sets_dict
+
+def _materialize_exercise_sets(cur, daily_sets_items: list[tuple[int, str, str, str]]):
+    """
+    Convert daily_sets items to individual sets, and insert them into the
+    exercise_set table. Call this whenever a valid daily_sets item is written.
+
+    Example conversion from daily_sets to exercise_set items (simplified):
+    '2x8@135,6,5@145' -> 8@135, 8@135, 6@145, 5@145
+
+    :param cur: cursor inside the transaction that wrote the daily_sets items
+    :param daily_sets_items: [(rowid, exercise_id, exercise, date, sets_string), ...]
+    """
+    exercise_set_rows = []
+    for rowid, exercise_id, exercise, date_str, sets_str in daily_sets_items:
+        logger.debug(f'daily_sets item: {rowid}, {exercise}, {date_str}, {sets_str}')
+        if date_str is None:
+            # Lines before the first <h2> of a file have no date. They are
+            # kept in daily_sets, but their sets can't be placed in time.
+            continue
+        try:
+            individual_exercise_sets = get_exercise_sets_from_daily_sets((exercise, date_str, sets_str))
+        except ValueError:
+            logger.warning(f"Failed to parse sets. {date_str}, {exercise}: {sets_str}")
+            continue
+        if len(individual_exercise_sets) > 6:
+            logger.warning(f"More than 6 sets detected for {(exercise, date_str, sets_str)}")
+            logger.warning("  These sets will still be added.")
+        for s in individual_exercise_sets:
+            exercise_set_rows.append((rowid, exercise_id, date_str, s.reps, s.weight, s.partial_reps))
+
+    cur.executemany("""
+        INSERT INTO exercise_set(daily_sets_id, exercise_id, date, reps, weight, partial_reps)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, exercise_set_rows)
 
 
 def get_exercise_sets_from_daily_sets(daily_sets_item : tuple [str, str, str]):
     """
     Given a daily_sets item from SQLite, return a list of ExerciseSet objects.
+    See sets_parser for the syntax of sets strings.
+
+    Example conversion (simplified):
+    '2x8@135,6,5@145' -> 8@135, 8@135, 6@145, 5@145
+
     :return: all ExerciseSet objects that can be parsed from the daily_set item.
     """
     exercise, date_str, sets_str = daily_sets_item
 
-    sets_str = sets_str.replace(' ', '')  # strip whitespace
-
     # retrieve date
+    if date_str is None:
+        raise ValueError(f"No date for {exercise}: {sets_str}")
     y, m, d = [int(p) for p in date_str.split('-')]
     date_of_sets = datetime.date(year=y, month=m, day=d)
 
-    if sets_str.__contains__('@'):
-        # These are sets for a typical weighted exercise
-        return _get_weight_and_exercise_sets(exercise, sets_str, date_of_sets)
-    else:
-        # These are bodyweight sets
-        return _get_exercise_sets(exercise, 0, sets_str, date_of_sets)
-
-
-def _get_exercise_sets(exercise: str, weight: float, the_sets: str, date_of_sets: datetime.date):
-    """
-    This is the method that actually returns the ExerciseSet objects.
+    parsed = parse_sets_string(sets_str)
+    if parsed.errors:
+        logger.warning(f"Some sets couldn't be parsed and won't be added. {date_of_sets}, {exercise}: {sets_str}")
+        logger.warning(f"  {format_errors(sets_str)}")
 
-    :param exercise:                        example: 'bb bench'
-    :param weight:                          example: 90.0
-    :param the_sets:                        example: '2x10,~9'
-    :param date_of_sets:                    example: 2025/05/27
-    :return: list of ExerciseSet objects.   example: [(bb bench, 2025/05/27, 10@90.0), (bb bench, 2025/05/27, 10@90.0), (bb bench, 2025/05/27, ~9@90.0)]
-    """
     exercise_sets = []
-
-    for the_set in the_sets.split(","):
-        # Check for 'x', which indicates multiple sets with the same reps
-        if the_set.__contains__('x'):  # ex: '2x10'
-            setsxreps = the_set.split('x')
-            num_sets = int(setsxreps[0])
-            reps = setsxreps[1]
-        else:  # ex: '9'
-            num_sets = 1
-            reps = the_set
-
-        # Account for '~' (partial reps)
-        partial_reps = reps.__contains__('~')
-        reps = reps.replace('~', '')
-
-        # Account for '+' (disjoint reps).  ex: 5+1 => 6
-        # Also, account for half reps indicated by decimal point. ex: 4.5 => 4
-        try:
-            num_reps = sum([math.trunc(float(r)) for r in reps.split('+')])  # "5+1" = 6
-        except ValueError:
-            logger.warning(f"Failed to parse num_reps. {date_of_sets}, {exercise}: {the_set}")
-            continue
-
-        if num_reps > 100:
-            logger.warning(f"Suspiciously high number of reps. {date_of_sets}, {exercise}: {num_reps} @ {weight}")
-            logger.warning("  This set won't be added.")
-            break
-
-        for i in range(num_sets):
-            s = ExerciseSet(exercise=exercise, reps=num_reps, weight=weight, partial_reps=partial_reps, date=date_of_sets)
+    for group in parsed.groups:
+        for i in range(group.sets):
+            s = ExerciseSet(exercise=exercise, reps=group.reps, weight=group.weight,
+                            partial_reps=group.partial, date=date_of_sets)
             logger.debug(f"    {s}")
             exercise_sets.append(s)
-
-    return exercise_sets
-
-
-def _get_weight_and_exercise_sets(exercise: str, sets_str: str, date_of_sets: datetime.date):
-    """
-    This function takes all the components of an SQL daily_sets item.
-    It parses the string portion; delimits it by setsxreps + wt pairs; and for
-    each pair, it calls _get_exercise_sets.
-
-    :param exercise:      example: 'bb bench'
-    :param sets_str:      example: '10@65,~8@70,5+1@75,4,5@80,2x3@85,2x2,~1@90'
-    :param date_of_sets:  example: 2025/05/27
-    :return:  all ExerciseSet objects that can be parsed from the inputs.
-    """
-    exercise_sets = []
-    sets_str_split = _split_sets_string(sets_str)
-
-    for i in range(0, len(sets_str_split), 2):
-        the_sets = sets_str_split[i]  # '10' '~8' ... '2x2,~1'
-        try:
-            weight = float(sets_str_split[i + 1])  # 65 70 ... 90
-            logger.debug(f"  {the_sets}@{weight}")
-            exercise_sets += _get_exercise_sets(exercise, weight, the_sets, date_of_sets)
-        except ValueError:
-            logger.warning(f"A weight couldn't be parsed from this set string: {date_of_sets}, {exercise}: {sets_str}")
-            logger.warning("  Sets at the invalid weight won't be added.")
-            continue
     return exercise_sets
 
 
-def _split_sets_string(sets_str: str) -> list[str]:
-    """
-    Split sets_str into a list with format [setsxreps, wt, setsxreps, wt, ... ].
-    TODO it might be nice to use tuples.
-    :param sets_str: sets_str of a daily_sets item
-    :return: list of [setsxreps, wt, setsxreps, wt, ... ]
-    """
-    # input:               '10@65, ~8@70, 5+1@75, 4,5@80, 2x3@85, 2x2,~1@90'
-    # first_split format:  ['10', '65', '~8', '70,5+1', '75,4,5', '80,2x3', '85,2x2,~1', '90']
-    # second_split format: ['10', '65', '~8', '70', '5+1', '75', '4,5', '80', '2x3', '85', '2x2,~1', '90']
-    first_split = sets_str.split("@")
-    second_split = [first_split[0]]
-    # don't split by comma for the first item. The first item always indicates reps (not weight)
-    for part in first_split[1:]:
-        subparts = part.split(',', maxsplit=1)
-        for subpart in subparts:
-            second_split.append(subpart.strip())
-    return second_split
-
-
 def get_alias_dict():
     """
     Return an alias dictionary from the given alias text file.
@@ -467,57 +590,21 @@ def _parse_exercise(ln: str, alias_dict: Dict) -> str:
     :param alias_dict: alias dictionary used to resolve aliases to common names
     :return:  exercise name in the line. Ex: 'rear delt row'
     """
-    # First characters in the line might be "<li>" or "<div>", which can be ignored.
-    # If these aren't the first characters, this works regardless.
-    result = ln[ln.index('>') + 1:]
+    return _resolve_alias(_parse_raw_exercise(ln), alias_dict)
 
-    # Ignore anything between parenthesis
-    if result.__contains__('('):
-        opening_paren = result.index('(')
-        try:
-            closing_paren = result.rindex(')')  # use rindex in case the line contains multiple sets of parenthesis
-            result = result[:opening_paren] + result[closing_paren + 1:]
-        except ValueError:
-            result = result[:opening_paren]
-
-    # ' ss[0-9]' indicates the exercise was performed as a superset.
-    # This is irrelevant to the exercise and can be ignored.
-    if result.__contains__(' ss'):
-        result = result[:result.index(' ss')]
-
-    # Some characters can be safely removed without obscuring the exercise's meaning
-    result = result.replace('-', '')
-    result = result.replace('’', '')
-    result = result.replace('.', '')
-
-    # Some manual replacement.
-    # Going with singular names instead of plural for now.
-    # TODO It would be nice if this were configurable and not hard-coded.
-    result = result.replace(';', ',')
-    result = result.replace('barbell', 'bb')
-    result = result.replace('dumbbell', 'db')
-    result = result.replace('ez bar', 'ezbar')
-    result = result.replace('t bar', 'tbar')
-    result = result.replace('hex bar', 'hexbar')
-    result = result.replace('hexbar', 'hb')
-    result = result.replace('triceps', 'tricep')
-    result = result.replace('tricep', 'tri')
-    result = result.replace('curls', 'curl')
-    result = result.replace('rows', 'row')
-    result = result.replace('ups', 'up')
-    result = result.replace('downs', 'down')
-    result = result.replace('extensions', 'extension')
-    result = result.replace('kickbacks', 'kickback')
-    result = result.replace('raises', 'raise')
-    result = result.replace('hangs', 'hang')
-    result = result.replace('deadlifts', 'deadlift')
-
-    result = result.strip()
-
-    # Check if this exercise is in the alias dict. If so, use the common name
-    if result in alias_dict.keys():
-        result = alias_dict[result]
-    return result
+
+def _resolve_alias(exercise: str, alias_dict: Dict) -> str:
+    """Return the common name of the exercise if it's an alias, or else the exercise."""
+    return alias_dict.get(exercise, exercise)
+
+
+def _parse_raw_exercise(ln: str) -> str:
+    """
+    Parse exercise name from a line in an HTML file, without resolving aliases.
+    The name is normalized by the rules in exercise_normalizer.
+    See _parse_exercise.
+    """
+    return get_normalizer().normalize(ln)
 
 
 def _sanitize_sets(ln: str) -> tuple[str, str]:
@@ -578,17 +665,184 @@ def _sanitize_sets(ln: str) -> tuple[str, str]:
     return result.strip(), comments.strip()
 
 
+class ParsedHtmlFile(NamedTuple):
+    """
+    The result of parsing an HTML file, see parse_html_file.
+    sections: [(fingerprint, date, is_new), ...] for each <h2> section of the
+        file. Sections that aren't new were skipped instead of parsed.
+    daily_sets_list: [(exercise, date, sets_str, is_valid, comments, line, raw_exercise, section_idx), ...]
+        where section_idx is the item's index in sections
+    messages: [(msg, level), ...] to log once the file is imported
+    """
+    html_filepath: str
+    file_hash: str
+    compressed_content: bytes | None
+    sections: list[tuple[str, str | None, bool]]
+    daily_sets_list: list[tuple]
+    messages: list[tuple[str, str]]
+
+
+def _split_html_sections(lines: Iterable[str]) -> Iterator[tuple[str, list[tuple[int, str]]]]:
+    """
+    Split the body of an HTML file into sections, one per <h2> (date) heading.
+    Lines in the body before the first <h2> are a section of their own.
+
+    Each section is fingerprinted with a hash of its lines, so an unchanged
+    workout day has the same fingerprint in every export it appears in.
+
+    :param lines: lines of the HTML file
+    :return: (fingerprint, [(line_num, line), ...]) for each section. The
+        lines are lowercase and stripped.
+    """
+    parsing_exercises = False
+    section = []
+    for line_num, line in enumerate(lines, start=1):
+        line = line.lower().strip()
+        if line.__contains__("<body>"):
+            parsing_exercises = True
+        elif line.__contains__("</body>"):
+            parsing_exercises = False
+
+        if parsing_exercises:
+            if line.__contains__("<h2>") and section:
+                yield _fingerprint_section(section), section
+                section = []
+            section.append((line_num, line))
+        elif section:
+            yield _fingerprint_section(section), section
+            section = []
+    if section:
+        yield _fingerprint_section(section), section
+
+
+def _fingerprint_section(section: list[tuple[int, str]]) -> str:
+    """Hash the lines of a section, ignoring their line numbers."""
+    return hashlib.sha256("\n".join(line for _, line in section).encode('utf-8')).hexdigest()
+
+
+def _parse_h2_date(line: str) -> datetime.date:
+    """
+    Parse the date of an <h2> line. Ex: '<h2>8/6/25 push day</h2>' -> 2025-08-06
+    :raises ValueError: if the line doesn't start with a M/D/Y date
+    """
+    # Remove h2 tags, and split at the first space.
+    # This should leave the date part of the string, which
+    # can be split by / to get M,D,Y
+    date_part = line[len("<h2>"): len(line) - len("</h2>")].split(" ")[0]
+    month, day, year = [int(item) for item in date_part.split("/", 3)]
+    if year < 2000:  # Sometimes year is formatted with only two digits.
+        year += 2000
+    return datetime.date(year, month, day)
+
+
+def parse_html_file(html_filepath: str,
+                    alias_dict: Dict,
+                    compress: bool = True,
+                    zdict: bytes = None,
+                    log_level: int = logging.DEBUG,
+                    known_fingerprints: Set[str] = frozenset()) -> ParsedHtmlFile:
+    """
+    Read and parse an HTML file, without touching SQLite. This only depends on
+    its arguments (and the user's replacement rules), so batch imports run it
+    in worker processes.
+
+    Assumption:
+    the HTML is formatted so that headings, paragraphs, list items, etc. are on their own line.
+    not allowed: '<h1>My Workouts</h1><h2>8/6/2025</h2>'
+
+    :param html_filepath: HTML file to read
+    :param alias_dict: see get_alias_dict
+    :param compress: whether to compress the file content, see HtmlFileReader
+    :param zdict: compression dictionary, see get_compression_dictionary
+    :param log_level: messages below this level are not collected
+    :param known_fingerprints: sections with these fingerprints were already
+        imported, and are skipped. See _split_html_sections.
+    """
+    normalizer = get_normalizer()
+    sections = []
+    daily_sets_list = []
+    messages = []
+    curr_date = None
+
+    def log(msg, level="INFO"):
+        if logging.getLevelName(level) >= log_level:
+            messages.append((msg, level))
+
+    # Read the file once. The lines are parsed as they are read, while the
+    # reader hashes and compresses the content.
+    reader = HtmlFileReader(html_filepath, compress=compress, zdict=zdict)
+
+    # Parse the HTML file, and get a list of exercise sets to insert.
+    for fingerprint, section in _split_html_sections(reader.lines()):
+        section_idx = len(sections)
+        if fingerprint in known_fingerprints:
+            # Only the date is needed, for the sections that follow.
+            line_num, line = section[0]
+            if line.__contains__("<h2>"):
+                try:
+                    curr_date = _parse_h2_date(line)
+                except ValueError:
+                    pass
+            log(f"Skipping already imported section at line {line_num}: '{line}'", DEBUG)
+            sections.append((fingerprint, curr_date.isoformat() if curr_date else None, False))
+            continue
+
+        for line_num, line in section:
+            # h2 always contains the date
+            if line.__contains__("<h2>"):
+                try:
+                    curr_date = _parse_h2_date(line)
+                    log(f"Current date: {curr_date}", DEBUG)
+                except ValueError:
+                    # TODO if we fail to parse a date from the h2 tag, should
+                    #  the sets that follow be imported at all?
+                    #  Right now, we are continuing to import them, with possibly the wrong date.
+                    log(f"Failed to parse date from line {line_num}: '{line}'", WARNING)
+                    log(f"The last valid date will be used ({curr_date})", WARNING)
+
+            # Lines with exercises are structured like this: "exercise : sets"
+            #   more specifically:
+            #     [<li>] exercise: {( {SetsxReps} | {Reps} )@weight}[, comments] [</li>]
+            #     Ex: <li>Rear delt rows SS1 : 3x15 at 12.5<br></li>
+            elif line.__contains__(':'):
+                log(f"(line {line_num}) {line}", DEBUG)
+                exercise_part, sets_str_part = line.split(':', maxsplit=1)
+                raw_exercise = normalizer.normalize(exercise_part)
+                exercise = _resolve_alias(raw_exercise, alias_dict)
+                try:
+                    sets_str, comments = _sanitize_sets(sets_str_part)
+                except ValueError:
+                    log(f"Error parsing this line. {line_num}: '{line}'", ERROR)
+
+                # Don't bother storing empty sets strings in SQLite.
+                # But store invalid sets strings because the user can correct them later.
+                if sets_str == "":
+                    log(f"Skipping. No sets were found on line {line_num}: '{line}'", WARNING)
+                else:
+                    is_valid = is_sets_string_valid(sets_str)
+                    if not is_valid:
+                        log(f"Invalid sets string found on line {line_num}: '{line}'  |  sets_str: {sets_str}", WARNING)
+                        log(f"  {format_errors(sets_str)}", DEBUG)
+
+                    daily_sets_item = (exercise, curr_date, sets_str, is_valid, comments, line)
+                    log(f'  daily_sets found: {daily_sets_item}', DEBUG)
+                    daily_sets_list.append(daily_sets_item + (raw_exercise, section_idx))
+
+        sections.append((fingerprint, curr_date.isoformat() if curr_date else None, True))
+
+    return ParsedHtmlFile(html_filepath, reader.file_hash, reader.compressed_content,
+                          sections, daily_sets_list, messages)
+
+
 def import_sets_via_html(html_filepath:str,
                          existing_import_id: int = None,
                          text_widget: Text = None,
                          clear_text_widget: bool = True,
-                         method: str = HTML):
+                         method: str = HTML,
+                         incremental: bool = False):
     """
     This function reads an HTML file and inserts data into SQLite.
-
-    Assumption:
-    the HTML is formatted so that headings, paragraphs, list items, etc. are on their own line.
-    not allowed: '<h1>My Workouts</h1><h2>8/6/2025</h2>'
+    See parse_html_file for the expected format.
 
     :param html_filepath: HTML file to read, absolute path string
     :param existing_import_id: if not provided, an import record will be generated, and
@@ -601,15 +855,12 @@ def import_sets_via_html(html_filepath:str,
         widget before importing
     :param method: The method for this import (HTML, Apple Notes), which becomes part of the
         name that we store in SQLite and display in the GUI.
+    :param incremental: only import the <h2> sections (workout days) that
+        haven't been imported before, for cumulative exports like Apple Notes.
+        A day that changed since an earlier incremental import with the same
+        method replaces the old copy.
     :return:
     """
-    alias_dict = get_alias_dict()
-
-    con = sqlite3.connect(SQLITE_FILE)
-    cur = con.cursor()
-
-    daily_sets_list = []
-
     if text_widget is not None:
         text_widget.configure(state='normal')
         if clear_text_widget:
@@ -617,132 +868,237 @@ def import_sets_via_html(html_filepath:str,
 
     _log_import_msg(f"Importing {html_filepath}", text_widget)
 
-    # Get hash and compressed content of HTML file.
-    with open(html_filepath, 'r') as f:
-        content = f.read()
-    file_hash = hash_html(content)
-    compressed_content = compress_html(content)
+    known_fingerprints = frozenset()
+    if incremental:
+        with db.cursor() as cur:
+            known_fingerprints = {fp for (fp,) in cur.execute("SELECT DISTINCT fingerprint FROM import_section")}
 
-    # Parse the HTML file, and get a list of exercise sets to insert.
-    with open(html_filepath, 'r') as f:
-        parsing_exercises = False
-
-        for line_num, line in enumerate(f.readlines(), start=1):
-            line = line.lower().strip()
-            if line.__contains__("<body>"):
-                parsing_exercises = True
-            elif line.__contains__("</body>"):
-                parsing_exercises = False
-
-            if parsing_exercises:
-                # h2 always contains the date
-                if line.__contains__("<h2>"):
-                    try:
-                        # Remove h2 tags, and split at the first space.
-                        # This should leave the date part of the string, which
-                        # can be split by / to get M,D,Y
-                        date_part = line[len("<h2>"): len(line) - len("</h2>")].split(" ")[0]
-                        month, day, year = [int(item) for item in date_part.split("/", 3)]
-                        if year < 2000:  # Sometimes year is formatted with only two digits.
-                            year += 2000
-                        curr_date = datetime.date(year, month, day)
-                        _log_import_msg(f"Current date: {curr_date}", text_widget, DEBUG)
-                    except ValueError:
-                        # TODO if we fail to parse a date from the h2 tag, should
-                        #  the sets that follow be imported at all?
-                        #  Right now, we are continuing to import them, with possibly the wrong date.
-                        _log_import_msg(f"Failed to parse date from line {line_num}: '{line}'", text_widget, WARNING)
-                        _log_import_msg(f"^got date_part='{date_part}'", text_widget, DEBUG)
-                        _log_import_msg(f"The last valid date will be used ({curr_date})", text_widget, WARNING)
-
-                # Lines with exercises are structured like this: "exercise : sets"
-                #   more specifically:
-                #     [<li>] exercise: {( {SetsxReps} | {Reps} )@weight}[, comments] [</li>]
-                #     Ex: <li>Rear delt rows SS1 : 3x15 at 12.5<br></li>
-                elif line.__contains__(':'):
-                    _log_import_msg(f"(line {line_num}) {line}", text_widget, DEBUG)
-                    exercise_part, sets_str_part = line.split(':', maxsplit=1)
-                    exercise = _parse_exercise(exercise_part, alias_dict)
-                    try:
-                        sets_str, comments = _sanitize_sets(sets_str_part)
-                    except ValueError:
-                        _log_import_msg(f"Error parsing this line. {line_num}: '{line}'", text_widget, ERROR)
-
-                    # Don't bother storing empty sets strings in SQLite.
-                    # But store invalid sets strings because the user can correct them later.
-                    if sets_str == "":
-                        _log_import_msg(f"Skipping. No sets were found on line {line_num}: '{line}'", text_widget, WARNING)
-                    else:
-                        is_valid = _is_sets_string_valid(sets_str)
-                        if not is_valid:
-                            _log_import_msg(f"Invalid sets string found on line {line_num}: '{line}'  |  sets_str: {sets_str}", text_widget, WARNING)
-
-                        daily_sets_item = (exercise, curr_date, sets_str, is_valid, comments, line)
-                        _log_import_msg(f'  daily_sets found: {daily_sets_item}', text_widget, DEBUG)
-                        daily_sets_list.append(daily_sets_item)
-
-    cur.execute("BEGIN TRANSACTION")
+    # Re-imports of a stored file (existing_import_id) don't need the
+    # compressed content.
+    dictionary_id, zdict = get_compression_dictionary()
+    parsed = parse_html_file(html_filepath, get_alias_dict(), compress=existing_import_id is None,
+                             zdict=zdict, log_level=logger.getEffectiveLevel(),
+                             known_fingerprints=known_fingerprints)
+    for msg, level in parsed.messages:
+        _log_import_msg(msg, text_widget, level)
+
+    new_section_count = sum(is_new for _, _, is_new in parsed.sections)
+    if incremental:
+        _log_import_msg(f"{new_section_count} of {len(parsed.sections)} sections are new.", text_widget)
 
     # INSERT INTO SQLITE
-    if existing_import_id is None:
-        # Insert record into 'import' table
-        cur.execute(f"INSERT INTO import(date_time, file_hash, compressed_file_content) VALUES(DATETIME(), ?, ?)", (file_hash, compressed_content))
+    if existing_import_id is not None:
+        with db.transaction() as cur:
+            # No new record will be inserted into 'import' table.
+            # Insert records into 'daily_sets' table with the provided import_id
+            cur.execute("DELETE FROM import_section WHERE import_id = ?", (existing_import_id,))
+            _insert_daily_sets(cur, [(existing_import_id, parsed)])
+            _materialize_exercise_sets_for_import(cur, existing_import_id)
+            db.after_commit(bus.publish, SetsImported((existing_import_id,), _get_parsed_exercises([parsed])))
+    elif new_section_count > 0 or not incremental:
+        with db.transaction() as cur:
+            if incremental:
+                replaced_count = _delete_replaced_sections(cur, parsed, method)
+                if replaced_count > 0:
+                    _log_import_msg(f"Replacing {replaced_count} changed sections.", text_widget)
+            _insert_parsed_html_files(cur, [parsed], dictionary_id, method, incremental)
+
+    _log_import_msg("Done importing.", text_widget)
+    if text_widget is not None:
+        text_widget.configure(state='disabled')
 
-        # Insert records into 'daily_sets' table
-        import_id = cur.lastrowid  # gets the most recent import id, TODO will this work in all cases?
-        cur.executemany(f"INSERT INTO daily_sets(exercise, date, sets_string, is_valid, comments, line, import_id) VALUES (?, ?, ?, ?, ?, ?, {import_id})", daily_sets_list)
 
-        # Now, update the 'name' field of our new 'import' record.
-        min_date = cur.execute(f"SELECT MIN(date) FROM daily_sets WHERE import_id = {import_id}").fetchone()[0]
-        max_date = cur.execute(f"SELECT MAX(date) FROM daily_sets WHERE import_id = {import_id}").fetchone()[0]
+def import_html_files(html_files: str | list[str],
+                      text_widget: Text = None,
+                      max_workers: int = None) -> list[int]:
+    """
+    Import many HTML files at once. The files are parsed in parallel worker
+    processes, then inserted in one transaction. Each file still gets its own
+    import record.
 
-        if method == HTML:
-            html_filename = html_filepath[html_filepath.rindex('/') + 1:]
-            name = f"{html_filename}, {min_date} to {max_date}"
+    Files that are already imported (same file hash) are skipped, as are
+    repeats of the same file within the batch.
+
+    :param html_files: a directory (every *.html file in it), a glob pattern,
+        or a list of HTML files
+    :param text_widget: log messages can optionally be logged to a tkinter
+        Text widget too.
+    :param max_workers: number of worker processes, defaults to the CPU count
+    :return: ids of the new imports
+    """
+    if isinstance(html_files, str):
+        html_files = _expand_html_files(html_files)
+
+    if text_widget is not None:
+        text_widget.configure(state='normal')
+        text_widget.delete("1.0", END)
+
+    # Skip duplicates before parsing. Hashing is cheap next to parsing.
+    to_parse = []
+    seen_hashes = set()
+    for html_file in html_files:
+        file_hash = hash_html_file(html_file)
+        if file_hash in seen_hashes or is_file_imported(file_hash):
+            _log_import_msg(f"Skipping {html_file}, it has already been imported.", text_widget, WARNING)
         else:
-            name = f"{method}, {min_date} to {max_date}"
-        cur.execute(f"UPDATE import SET name = '{name}' WHERE ROWID = {import_id}")
+            seen_hashes.add(file_hash)
+            to_parse.append(html_file)
+    _log_import_msg(f"Importing {len(to_parse)} of {len(html_files)} files.", text_widget)
+
+    dictionary_id, zdict = get_compression_dictionary()
+    parse = functools.partial(parse_html_file, alias_dict=get_alias_dict(), zdict=zdict,
+                              log_level=logger.getEffectiveLevel())
+    if len(to_parse) > 1 and max_workers != 1:
+        workers = min(len(to_parse), max_workers or os.cpu_count() or 1)
+        # Spawn instead of fork: this runs on the writer thread of a Tk app,
+        # and forking a process with threads running isn't safe.
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            parsed_files = list(pool.map(parse, to_parse))
     else:
-        # No new record will be inserted into 'import' table.
-        # Insert records into 'daily_sets' table with the provided import_id
-        cur.executemany(f"INSERT INTO daily_sets(exercise, date, sets_string, is_valid, comments, line, import_id) VALUES (?, ?, ?, ?, ?, ?, {existing_import_id})", daily_sets_list)
+        parsed_files = [parse(html_file) for html_file in to_parse]
 
-    _log_import_msg("Done importing.", text_widget)
+    for parsed in parsed_files:
+        _log_import_msg(f"Parsed {parsed.html_filepath}", text_widget)
+        for msg, level in parsed.messages:
+            _log_import_msg(msg, text_widget, level)
+
+    with db.transaction() as cur:
+        import_ids = _insert_parsed_html_files(cur, parsed_files, dictionary_id, HTML)
+
+    _log_import_msg(f"Done importing {len(import_ids)} files.", text_widget)
     if text_widget is not None:
         text_widget.configure(state='disabled')
+    return import_ids
 
-    con.commit()
-    cur.close()
-    con.close()
 
-def _is_sets_string_valid(sets_str : str) -> bool:
-    """
-    Return True if the given sets string has valid syntax.
+def _expand_html_files(pattern: str) -> list[str]:
+    """Return the HTML files in a directory, or the files matching a glob pattern."""
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "*.html")
+    return sorted(f for f in glob.glob(pattern) if os.path.isfile(f))
 
-    Current checks:
-    - sets strings without '@' are unweighted sets, which we assume are valid
-    - sets string with '@' are weighted. We check:
-      (1) does the sets string contain an equal amount of setsxreps and weights?
-      (2) can the last weight (i.e., element after last @) be converted to a float?
 
-    This is a very crude check that may falsely label some sets strings as valid.
-    The logic that reads SQLite and converts daily_sets items to
-    ExerciseSets objects performs additional checks for now.
+def _insert_parsed_html_files(cur, parsed_files: list[ParsedHtmlFile], dictionary_id: int, method: str,
+                              incremental: bool = False) -> list[int]:
     """
-    if '@' not in sets_str:
-        return True
+    Insert a new import (and its daily_sets) for each parsed file.
+    :param incremental: record the imports as incremental imports of method
+    :return: the new import ids, in the same order
+    """
+    new_file_count = 0
+    import_ids = []
+    for parsed in parsed_files:
+        # Identical files share one import_file item.
+        cur.execute("""
+            INSERT INTO import_file(file_hash, compressed_file_content, dictionary_id) VALUES (?, ?, ?)
+            ON CONFLICT(file_hash) DO NOTHING
+        """, (parsed.file_hash, parsed.compressed_content, dictionary_id))
+        new_file_count += cur.rowcount
+        cur.execute("INSERT INTO import(date_time, file_hash, incremental_method) VALUES(DATETIME(), ?, ?)",
+                    (parsed.file_hash, method if incremental else None))
+        import_ids.append(cur.lastrowid)
+
+    _insert_daily_sets(cur, list(zip(import_ids, parsed_files)))
+
+    for import_id, parsed in zip(import_ids, parsed_files):
+        _materialize_exercise_sets_for_import(cur, import_id)
 
-    sets_str_split = _split_sets_string(sets_str)
+        # Now, update the 'name' field of our new 'import' record.
+        min_date, max_date = cur.execute("SELECT MIN(date), MAX(date) FROM daily_sets WHERE import_id = ?", (import_id,)).fetchone()
+        if method == HTML:
+            html_filepath = parsed.html_filepath.replace('\\', '/')
+            html_filename = html_filepath[html_filepath.rfind('/') + 1:]
+            name = f"{html_filename}, {min_date} to {max_date}"
+        else:
+            name = f"{method}, {min_date} to {max_date}"
+        cur.execute("UPDATE import SET name = ? WHERE ROWID = ?", (name, import_id))
 
-    if len(sets_str_split) % 2 != 0:  # (1)
-        return False
+    # Retrain the compression dictionary as the user's files pile up.
+    if new_file_count > 0 and _should_train_compression_dictionary(cur):
+        train_compression_dictionary()
+
+    if import_ids:
+        db.after_commit(bus.publish, SetsImported(tuple(import_ids), _get_parsed_exercises(parsed_files)))
+    return import_ids
+
+
+def _get_parsed_exercises(parsed_files: list[ParsedHtmlFile]) -> frozenset[str]:
+    """Return the exercise names of the daily_sets items of parsed files."""
+    return frozenset(item[0] for parsed in parsed_files for item in parsed.daily_sets_list)
+
+
+def _get_daily_sets_exercises(cur, rowids: list[int]) -> frozenset[str]:
+    """Return the exercise names of the given daily_sets items."""
+    rowids = list(rowids)
+    names = set()
+    for i in range(0, len(rowids), MAX_SQL_PARAMS):
+        chunk = rowids[i:i + MAX_SQL_PARAMS]
+        names.update(name for (name,) in cur.execute(f"""
+            SELECT DISTINCT exercise.name FROM daily_sets JOIN exercise ON exercise.id = daily_sets.exercise_id
+            WHERE daily_sets.id IN ({", ".join("?" * len(chunk))})
+        """, chunk))
+    return frozenset(names)
+
+
+def _insert_daily_sets(cur, parsed_by_import: list[tuple[int, ParsedHtmlFile]]):
+    """
+    Insert the new sections and the daily_sets items of parsed files.
+    :param parsed_by_import: [(import_id, parsed file), ...]
+    """
+    rows = []
+    for import_id, parsed in parsed_by_import:
+        section_ids = {}
+        for section_idx, (fingerprint, date, is_new) in enumerate(parsed.sections):
+            if is_new:
+                cur.execute("INSERT INTO import_section(import_id, fingerprint, date) VALUES (?, ?, ?)",
+                            (import_id, fingerprint, date))
+                section_ids[section_idx] = cur.lastrowid
+        rows += [item[:-1] + (import_id, section_ids[item[-1]]) for item in parsed.daily_sets_list]
+
+    # daily_sets stores the id of each exercise instead of its name.
+    # The raw name is kept for alias updates.
+    exercise_ids = _get_exercise_ids(cur, [name for row in rows for name in (row[0], row[6])])
+    cur.executemany("""
+        INSERT INTO daily_sets(exercise_id, date, sets_string, is_valid, comments, line, raw_exercise_id, import_id, section_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, ((exercise_ids[row[0]],) + row[1:6] + (exercise_ids[row[6]],) + row[7:] for row in rows))
+
+
+def _delete_replaced_sections(cur, parsed: ParsedHtmlFile, method: str) -> int:
+    """
+    Delete the sections (and their daily_sets) from earlier incremental imports
+    of the same method that have the same date as a new section of the parsed
+    file, but aren't in the file anymore: the workout day was changed since it
+    was imported. Edits made in the app to those daily_sets are lost. Sections
+    of other imports are left alone, even if they have the same date.
+    :return: number of sections deleted
+    """
+    fingerprints = {fingerprint for fingerprint, _, _ in parsed.sections}
+    new_dates = {date for _, date, is_new in parsed.sections if is_new and date is not None}
+    replaced = [(section_id,) for date in sorted(new_dates)
+                for section_id, fingerprint in cur.execute("""
+                    SELECT import_section.id, import_section.fingerprint
+                    FROM import_section JOIN import ON import.id = import_section.import_id
+                    WHERE import_section.date = ? AND import.incremental_method = ?
+                """, (date, method)).fetchall()
+                if fingerprint not in fingerprints]
+    if replaced:
+        rowids = tuple(rowid for section_id in replaced
+                       for (rowid,) in cur.execute("SELECT id FROM daily_sets WHERE section_id = ?", section_id))
+        db.after_commit(bus.publish, SetsDeleted(rowids, _get_daily_sets_exercises(cur, rowids)))
+    cur.executemany("DELETE FROM import_section WHERE id = ?", replaced)
+    return len(replaced)
+
+
+def _materialize_exercise_sets_for_import(cur, import_id: int):
+    """Fill the exercise_set table from the valid daily_sets of one import."""
+    items = cur.execute("""
+        SELECT daily_sets.id, exercise.id, exercise.name, date, sets_string
+        FROM daily_sets JOIN exercise ON exercise.id = daily_sets.exercise_id
+        WHERE import_id = ? AND is_valid = 1
+    """, (import_id,)).fetchall()
+    _materialize_exercise_sets(cur, items)
 
-    last_wt = sets_str_split[-1]  # (2)
-    try:
-        float(last_wt)
-    except ValueError:
-        return False
-    return True
 
 def _is_date_valid(date_str:str) -> bool:
     """
@@ -760,38 +1116,59 @@ def _is_date_valid(date_str:str) -> bool:
 
 
 def update_daily_sets_to_alias():
-    """Update the exercise of each daily_sets record to match the current alias file."""
-    # We have to open and close a lot of connections because this function calls
-    # a function that opens/closes a connection.
-    con = sqlite3.connect(SQLITE_FILE)
-    cur = con.cursor()
-
-    result = cur.execute("SELECT rowid FROM import")
-    imports = result.fetchall()
-
-    cur.close()
-    con.close()
-
-    # For each import:
-    # - remember the ID
-    # - delete daily_sets with this ID
-    # - Decompress the HTML file associated with the import
-    #    - also need to write the decompressed content to a new file so it can be opened.
-    # - Parse the file and get daily_sets
-    # - INSERT INTO daily_sets while maintaining the ID
-    for imprt in imports:
-        con = sqlite3.connect(SQLITE_FILE)
-        cur = con.cursor()
-
-        imprt_id = imprt[0]
-        cur.execute(f"DELETE FROM daily_sets WHERE import_id = {imprt_id}")
+    """
+    Update the exercise of each daily_sets record to match the current alias file.
 
-        con.commit()
-        cur.close()
-        con.close()
+    Every daily_sets item remembers its raw exercise name (raw_exercise_id),
+    so the items don't need to be re-imported. The current raw name -> exercise
+    pairs are compared with the alias file, and only the raw names whose
+    common name changed are updated, with one indexed UPDATE each.
+    """
+    alias_dict = get_alias_dict()
 
-        file_to_write = decompress_and_write_html(imprt_id)
-        import_sets_via_html(html_filepath=file_to_write, existing_import_id=imprt_id)
+    # Everything happens in one transaction. import_sets_via_html joins it
+    # instead of committing on its own, so a failure part way through leaves
+    # the previous data intact.
+    with db.transaction() as cur:
+        # Items imported before raw names were recorded have to be re-imported
+        # once. For each of their imports:
+        # - delete daily_sets with this ID
+        # - Decompress the HTML file associated with the import
+        #    - also need to write the decompressed content to a new file so it can be opened.
+        # - Parse the file and INSERT INTO daily_sets while maintaining the ID
+        result = cur.execute("""
+            SELECT DISTINCT import_id FROM daily_sets
+            WHERE raw_exercise_id IS NULL AND import_id IS NOT NULL
+        """)
+        for (imprt_id,) in result.fetchall():
+            cur.execute("DELETE FROM daily_sets WHERE import_id = ?", (imprt_id,))
+            file_to_write = decompress_and_write_html(imprt_id)
+            import_sets_via_html(html_filepath=file_to_write, existing_import_id=imprt_id)
+
+        pairs = cur.execute("""
+            SELECT DISTINCT raw.name, daily_sets.exercise_id, exercise.name
+            FROM daily_sets
+            JOIN exercise AS raw ON raw.id = daily_sets.raw_exercise_id
+            JOIN exercise ON exercise.id = daily_sets.exercise_id
+        """).fetchall()
+        renames = {}  # raw name -> new common name
+        renamed_exercises = set()  # old and new common names
+        for raw_exercise, _, exercise in pairs:
+            new_exercise = _resolve_alias(raw_exercise, alias_dict)
+            if new_exercise != exercise:
+                renames[raw_exercise] = new_exercise
+                renamed_exercises.update((exercise, new_exercise))
+        if not renames:
+            return
+
+        logger.info(f"Updating {len(renames)} exercise name(s) to match the alias file")
+        exercise_ids = _get_exercise_ids(cur, list(renames.keys()) + list(renames.values()))
+        # exercise_set items follow through the daily_sets_exercise_au trigger.
+        cur.executemany("""
+            UPDATE daily_sets SET exercise_id = ?
+            WHERE raw_exercise_id = ? AND exercise_id != ?
+        """, [(exercise_ids[new], exercise_ids[raw], exercise_ids[new]) for raw, new in renames.items()])
+        db.after_commit(bus.publish, AliasesChanged(frozenset(renamed_exercises)))
 
 
 def update_user_edited_daily_sets(edited_rows:list[tuple[str, str, str, str, int]]):
@@ -800,43 +1177,62 @@ def update_user_edited_daily_sets(edited_rows:list[tuple[str, str, str, str, int
     edit tuple format:
     (date, exercise, sets_string, comments, rowid)
     """
-    con = sqlite3.connect(SQLITE_FILE)
-    cur = con.cursor()
-
     # Validation: add this as an extra item to every tuple in edited_rows
     # TODO #18 resolve exercise to alias?
     edited_rows_validated = []
     for edit in edited_rows:
         date, exercise, sets_string, comments, rowid = edit
-        is_valid = _is_date_valid(date) and _is_sets_string_valid(sets_string)
+        is_valid = _is_date_valid(date) and is_sets_string_valid(sets_string)
         new_t = (date, exercise, sets_string, comments, is_valid, rowid)
         edited_rows_validated.append(new_t)
 
-    # Update in SQLite
-    cur.executemany(f"""
-        UPDATE daily_sets
-        SET date = ?, exercise = ?, sets_string = ?, comments = ?, is_valid = ?
-        WHERE ROWID = ?
-    """, edited_rows_validated)
-
-    con.commit()
-    cur.close()
-    con.close()
+    # Update in SQLite, and replace the individual sets of each edited item.
+    # The same row can be edited more than once, so dedupe the rowids.
+    rowids = [(rowid,) for rowid in dict.fromkeys(t[-1] for t in edited_rows_validated)]
+    if not rowids:
+        return
+    with db.transaction() as cur:
+        # The old names are touched by the edit too, if an item was renamed.
+        exercises = _get_daily_sets_exercises(cur, [rowid for (rowid,) in rowids])
+        exercise_ids = _get_exercise_ids(cur, [t[1] for t in edited_rows_validated])
+        edited_rows_validated = [(date, exercise_ids[exercise], sets_string, comments, is_valid, rowid)
+                                 for date, exercise, sets_string, comments, is_valid, rowid in edited_rows_validated]
+        # When the user renames an item, the name they entered becomes its raw
+        # name, so later alias updates don't undo the rename.
+        cur.executemany("""
+            UPDATE daily_sets
+            SET date = :date,
+                raw_exercise_id = CASE WHEN exercise_id = :exercise_id THEN raw_exercise_id ELSE :exercise_id END,
+                exercise_id = :exercise_id, sets_string = :sets_string, comments = :comments, is_valid = :is_valid
+            WHERE ROWID = :rowid
+        """, [dict(zip(("date", "exercise_id", "sets_string", "comments", "is_valid", "rowid"), t))
+              for t in edited_rows_validated])
+        cur.executemany("DELETE FROM exercise_set WHERE daily_sets_id = ?", rowids)
+        items = [cur.execute("""
+                     SELECT daily_sets.id, exercise.id, exercise.name, date, sets_string
+                     FROM daily_sets JOIN exercise ON exercise.id = daily_sets.exercise_id
+                     WHERE daily_sets.id = ? AND is_valid = 1
+                 """, rowid).fetchone() for rowid in rowids]
+        _materialize_exercise_sets(cur, [item for item in items if item is not None])
+        db.after_commit(bus.publish, SetsEdited(tuple(rowid for (rowid,) in rowids),
+                                                exercises | {t[1] for t in edited_rows}))
 
 
 def delete_daily_sets(rowids_to_delete:list[tuple[int]]):
-    """Delete the given rowids from daily_sets table."""
-    con = sqlite3.connect(SQLITE_FILE)
-    cur = con.cursor()
-
-    cur.executemany(f"""
-            DELETE FROM daily_sets
-            WHERE rowid = ?
-        """, rowids_to_delete)
-
-    con.commit()
-    cur.close()
-    con.close()
+    """
+    Delete the given rowids from daily_sets table. Their exercise_set items
+    are removed by the ON DELETE CASCADE foreign key.
+    """
+    if not rowids_to_delete:
+        return
+    with db.transaction() as cur:
+        rowids = tuple(rowid for (rowid,) in rowids_to_delete)
+        exercises = _get_daily_sets_exercises(cur, rowids)
+        cur.executemany("""
+                DELETE FROM daily_sets
+                WHERE rowid = ?
+            """, rowids_to_delete)
+        db.after_commit(bus.publish, SetsDeleted(rowids, exercises))
 
 def decompress_and_write_html(import_id: int) -> str:
     """
@@ -846,8 +1242,8 @@ def decompress_and_write_html(import_id: int) -> str:
     :param import_id: rowid of an 'import' record
     :return: path to decompressed HTML file
     """
-    file_hash, file_compressed_content = get_file_hash_and_content(import_id)
-    html_content = decompress_html(file_compressed_content)
+    file_hash, file_compressed_content, zdict = get_file_hash_and_content(import_id)
+    html_content = decompress_html(file_compressed_content, zdict)
     file_to_write = os.path.join("usr",  f"usr_{file_hash}.html")
     with open(file_to_write, 'w') as f:
         f.write(html_content)
@@ -902,10 +1298,12 @@ def write_daily_sets_to_html(html_file_to_write:Path):
     """Retrieve all daily sets items in SQLite, and write them to an HTML file."""
     # TODO this function (or the AppleScript file) needs some work if we want to
     #  import the file that's being produced.
-    con = sqlite3.connect(SQLITE_FILE)
-    cur = con.cursor()
-
-    daily_sets = cur.execute("SELECT date, exercise, sets_string, comments FROM daily_sets ORDER BY date")
+    with db.cursor() as cur:
+        daily_sets = cur.execute("""
+            SELECT date, exercise.name, sets_string, comments
+            FROM daily_sets LEFT JOIN exercise ON exercise.id = daily_sets.exercise_id
+            ORDER BY date
+        """).fetchall()
     lines = [
         '<!DOCTYPE html>\n', '<html lang="en">\n', '<head>\n'
         '    <meta charset="UTF-8">\n', '    <title>Title</title>\n',
@@ -913,7 +1311,7 @@ def write_daily_sets_to_html(html_file_to_write:Path):
     ]
     curr_date = None
 
-    for item in daily_sets.fetchall():
+    for item in daily_sets:
         dt_string, exercise, sets_string, comments = item
 
         y, m, d = [int(p) for p in dt_string.split('-')]
@@ -934,6 +1332,3 @@ def write_daily_sets_to_html(html_file_to_write:Path):
 
     with open(html_file_to_write, 'w') as f:
         f.writelines(lines)
-
-    cur.close()
-    con.close()
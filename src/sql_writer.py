@@ -0,0 +1,50 @@
+"""
+A single background thread that performs the writes to SQLite.
+
+SQLite only allows one writer at a time. Funnelling every mutation (imports,
+alias updates, edits, deletions) through one thread with a queue keeps long
+writes off the Tk main thread, so the window doesn't freeze. Because the
+database is in WAL mode, the main thread can keep reading while a write runs;
+it sees the data as of the last commit.
+
+The write functions in sql_utility are plain synchronous functions. The GUI
+submits them here instead of calling them directly:
+
+    future = writer.submit(delete_import, import_id)
+    after_future(self, future, self.on_import_deleted)
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseWriter:
+    """Runs submitted functions one at a time, in order, on a writer thread."""
+
+    def __init__(self):
+        # One worker means one writer thread; the executor's work queue is the
+        # write queue. The thread is started on the first submit.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sql-writer")
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """
+        Queue fn(*args, **kwargs) to run on the writer thread.
+        :return: a future that resolves to fn's return value (or exception)
+        """
+        logger.debug(f"Queueing write: {fn.__name__}")
+        return self._executor.submit(self._run, fn, *args, **kwargs)
+
+    @staticmethod
+    def _run(fn, *args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            # The exception is also stored on the future, but log it here in
+            # case nobody ever looks at the future.
+            logger.exception(f"Write failed: {fn.__name__}")
+            raise
+
+    def shutdown(self) -> None:
+        """Wait for queued writes to finish, then stop the writer thread."""
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,108 @@
+"""
+A notebook tab whose content is built the first time it is selected.
+
+Building a tab can be expensive: the plotting tabs import matplotlib and load
+every exercise set. With lazy tabs, the window appears as soon as the empty
+notebook is ready, and each tab pays its cost only if the user opens it.
+
+A built tab receives a <<TabShown>> event whenever it is selected again.
+RefreshWhenShown uses it to hold a tab's refresh for data events until the tab
+is visible.
+"""
+import logging
+import time
+from tkinter import ttk
+from typing import Callable
+
+from src.events import bus, SETS_CHANGED
+
+logger = logging.getLogger(__name__)
+
+
+class LazyTab(ttk.Frame):
+    """
+    Placeholder frame that is added to the notebook in place of a tab.
+
+    Usage:
+        lazy_tab = LazyTab(notebook, "Progress Plots", lambda parent: TabProgressPlots(parent, scale))
+        notebook.add(lazy_tab, text=lazy_tab.name)
+        ...
+        lazy_tab.build()           # on <<NotebookTabChanged>>
+    """
+
+    def __init__(self, parent, name: str, build_tab: Callable[[ttk.Frame], ttk.Frame]):
+        """
+        :param parent: the notebook that stores this tab
+        :param name: text of the tab, also used in the startup timing log
+        :param build_tab: called with this frame as the parent to build the
+               tab. Import the tab's module inside it, so that its imports are
+               deferred too.
+        """
+        super().__init__(parent)
+        self.name = name
+        self.build_tab = build_tab
+        self.tab: ttk.Frame | None = None
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+        # The notebook maps the frame of the selected tab.
+        self.bind('<Map>', self.on_map)
+
+    def on_map(self, event):
+        if self.tab is not None:
+            self.tab.event_generate('<<TabShown>>')
+
+    def build(self) -> bool:
+        """
+        Build the tab, if it hasn't been built yet.
+        :return: True if the tab was built by this call
+        """
+        if self.tab is not None:
+            return False
+        start = time.perf_counter()
+        self.tab = self.build_tab(self)
+        self.tab.grid(row=0, column=0, sticky='NSEW')
+        logger.info(f"Built the '{self.name}' tab in {time.perf_counter() - start:.3f} s")
+        return True
+
+
+class RefreshWhenShown:
+    """
+    Calls a tab's refresh function for data events (see src.events), but only
+    while the tab is visible. Events that arrive while the tab is hidden are
+    combined into one refresh, done when the tab is shown again.
+
+    Usage, in the tab's constructor:
+        RefreshWhenShown(self, self.on_sets_changed)
+        ...
+        def on_sets_changed(self, exercises: frozenset[str]):
+            # redraw whatever shows one of these exercises
+    """
+
+    def __init__(self, tab: ttk.Frame, refresh: Callable[[frozenset[str]], None],
+                 event_types: tuple[type, ...] = SETS_CHANGED):
+        """
+        :param tab: the tab's frame
+        :param refresh: called with the exercises touched by the events
+        :param event_types: events that make the tab stale
+        """
+        self.tab = tab
+        self.refresh = refresh
+        self.stale = False
+        self.exercises = set()
+        self.unsubscribe = bus.subscribe(event_types, self.on_event)
+        tab.bind('<<TabShown>>', self.flush, add='+')
+
+    def on_event(self, event):
+        self.stale = True
+        self.exercises.update(getattr(event, 'exercises', ()))
+        if self.tab.winfo_viewable():
+            self.flush()
+
+    def flush(self, event=None):
+        """Refresh the tab, if an event arrived since the last refresh."""
+        if not self.stale:
+            return
+        exercises = frozenset(self.exercises)
+        self.stale = False
+        self.exercises.clear()
+        self.refresh(exercises)
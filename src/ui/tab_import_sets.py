@@ -19,11 +19,14 @@ import webbrowser
 from tkcalendar import DateEntry
 from tksheet import Sheet
 
-from src.common import hash_html, pad_frame, APPLE_NOTES
+from src.common import (after_future, hash_html_file, pad_frame, QueuedTextWidget,
+                        APPLE_NOTES)
 from src.sql_utility import (decompress_and_write_html, delete_import,
-     get_import_file_hashes_only, get_imports, import_sets_via_html,
-    _log_import_msg, exercise_sets_already_exist)
+     get_imports, import_html_files, import_sets_via_html, is_file_imported,
+    _log_import_msg, exercise_sets_already_exist, writer)
 from src.sql_utility import logger as sql_logger
+from src.events import ImportDeleted, SetsImported
+from src.ui.lazy_tab import RefreshWhenShown
 from src.ui.vertical_scrolled_frame import VerticalScrolledFrame
 from src.ui.window_alias_editor import WindowAliasEditor
 
@@ -78,6 +81,9 @@ class TabImportSets(ttk.Frame):
                                       text="Import Status",
                                       font=header_font)
         self.status_msg_area = ScrolledText(self.content_frame, height=20, width=170)
+        # Imports run on the SQL writer thread, which logs to the status msg
+        # area through this queue.
+        self.status_msg_queue = QueuedTextWidget(self.status_msg_area)
         lbl_manage_imports_title = ttk.Label(self.content_frame,
                                              text="Manage Imports",
                                              font=header_font)
@@ -152,6 +158,9 @@ class TabImportSets(ttk.Frame):
         import_method_notebook.add(tab_import_via_html, text="HTML")
         import_method_notebook.add(tab_import_via_apple_notes, text="Apple Notes")
 
+        # The imports sheet only changes with imports, not with edits.
+        RefreshWhenShown(self, lambda exercises: self.update_sheet(), (SetsImported, ImportDeleted))
+
     def config_status_msg_area(self):
         """Configure import status msg area."""
         self.status_msg_area.configure(state='disabled')
@@ -255,9 +264,40 @@ class TabImportSets(ttk.Frame):
                                    overwrite=True)
 
     def delete_import_from_sheet(self, import_id, sheet_row):
-        delete_import(import_id)
         self.sheet.delete_row(sheet_row)
-        self.update_sheet()
+        future = writer.submit(delete_import, import_id)
+        after_future(self, future, self.on_write_done)
+
+    def import_html_file(self, html_filepath: str, **kwargs):
+        """
+        Import an HTML file on the SQL writer thread. Status messages are
+        logged to the status msg area while the import runs.
+        :param html_filepath: HTML file to import
+        :param kwargs: passed to import_sets_via_html
+        :return: future for the import
+        """
+        future = writer.submit(import_sets_via_html, html_filepath,
+                               text_widget=self.status_msg_queue, **kwargs)
+        after_future(self, future, self.on_write_done, on_poll=self.status_msg_queue.flush)
+        return future
+
+    def import_html_files(self, html_files: str):
+        """
+        Import a directory or glob pattern of HTML files on the SQL writer
+        thread. The files are parsed in parallel, see import_html_files.
+        :param html_files: directory or glob pattern
+        :return: future for the import
+        """
+        future = writer.submit(import_html_files, html_files, text_widget=self.status_msg_queue)
+        after_future(self, future, self.on_write_done, on_poll=self.status_msg_queue.flush)
+        return future
+
+    def on_write_done(self, future):
+        """
+        Called on the main thread when an import or deletion is done. The
+        sheet is reloaded by the SetsImported and ImportDeleted events.
+        """
+        future.result()  # re-raise any exception from the writer thread
 
     def open_alias_editor(self):
         if not self.alias_editor_is_open:
@@ -288,24 +328,31 @@ class SubTabImportSetsViaHTML(ttk.Frame):
         self.tab_import_sets = tab_import_sets
 
         # Define widgets, bindings, etc.
-        lbl_import_via_html = ttk.Label(self, text="Import sets with an HTML file.")
+        lbl_import_via_html = ttk.Label(self, text="Import sets with an HTML file, or a folder (or glob pattern) of HTML files.")
         frm_html_filepath = ttk.Frame(self)
         btn_import_html = ttk.Button(self, text="Import", command=self.import_html_file)
+        # Incremental imports only add the workout days (<h2> sections) that
+        # weren't imported before, for exports that keep every old day.
+        self.incremental = BooleanVar(value=False)
+        chk_incremental = ttk.Checkbutton(self, text="Only import new workout days", variable=self.incremental)
 
         lbl_html_filepath = ttk.Label(frm_html_filepath, text="HTML Filepath")
         self.entry_html_filepath = ttk.Entry(frm_html_filepath, width=50)
         self.entry_html_filepath.bind("<Control-a>", self.select_all_text)
         btn_browse_html = ttk.Button(frm_html_filepath, text="Browse", command=self.browse_html_file)
+        btn_browse_folder = ttk.Button(frm_html_filepath, text="Browse Folder", command=self.browse_html_folder)
 
         # Grid widgets onto their parents.
         # TODO make this more responsive. the entry could resize as the window resizes.
         lbl_import_via_html.grid(row=0, column=0, sticky='NSEW')
         frm_html_filepath.grid(row=1, column=0, sticky='NSEW')
-        btn_import_html.grid(row=2, column=0, sticky='W')
+        chk_incremental.grid(row=2, column=0, sticky='W')
+        btn_import_html.grid(row=3, column=0, sticky='W')
 
         lbl_html_filepath.grid(row=0, column=0, sticky='W')
         self.entry_html_filepath.grid(row=0, column=1, sticky='W')
         btn_browse_html.grid(row=0, column=2, sticky='W')
+        btn_browse_folder.grid(row=0, column=3, sticky='W')
 
         # Add padding around each widget
         pad_frame(self)
@@ -318,6 +365,14 @@ class SubTabImportSetsViaHTML(ttk.Frame):
         self.entry_html_filepath.delete(0, END)
         self.entry_html_filepath.insert(END, filename)
 
+    def browse_html_folder(self):
+        """Open window to browse for a folder of HTML files."""
+        dirname = filedialog.askdirectory()
+        if len(dirname) == 0:
+            return
+        self.entry_html_filepath.delete(0, END)
+        self.entry_html_filepath.insert(END, dirname)
+
     def select_all_text(self, event : Event):
         """Select all text in the given Entry widget."""
         event.widget.select_range(0, END)
@@ -328,6 +383,13 @@ class SubTabImportSetsViaHTML(ttk.Frame):
         """Import the HTML file that the user has selected."""
         html_file = self.entry_html_filepath.get()
 
+        # A folder or glob pattern is a batch import. Files that were already
+        # imported are skipped instead of asking about each one.
+        if os.path.isdir(html_file) or any(c in html_file for c in "*?["):
+            html_file = html_file.replace('\\', '/')
+            self.tab_import_sets.import_html_files(html_file)
+            return
+
         # First, validate the HTML file. The user cannot proceed without a valid HTML file.
         if not os.path.exists(html_file):
             messagebox.showerror("Error", f"HTML file '{html_file}' does not exist.")
@@ -337,7 +399,7 @@ class SubTabImportSetsViaHTML(ttk.Frame):
             # Next, check for non-critical warnings that the user can choose to ignore:
             # - duplicate HTML imports
             warning_msgs = []
-            if self.file_already_imported(html_file):
+            if not self.incremental.get() and self.file_already_imported(html_file):
                 warning_msgs.append("This HTML file has already been imported. If you import this, you will have duplicate exercise sets.")
 
             if len(warning_msgs) > 0:
@@ -352,8 +414,7 @@ class SubTabImportSetsViaHTML(ttk.Frame):
             if proceed:
                 # Replace backslash with slash. Windows should be able to handle this 99.99% of the time.
                 html_file = html_file.replace('\\', '/')
-                import_sets_via_html(html_file, text_widget=self.tab_import_sets.status_msg_area)
-                self.tab_import_sets.update_sheet()
+                self.tab_import_sets.import_html_file(html_file, incremental=self.incremental.get())
 
     def file_already_imported(self, html_filepath) -> bool:
         """
@@ -362,13 +423,7 @@ class SubTabImportSetsViaHTML(ttk.Frame):
         :param html_filepath:
         :return: True/False
         """
-        with open(html_filepath, 'r') as f:
-            file_content = f.read()
-        file_hash = hash_html(file_content)
-
-        # Extract list of strings from list of tuples.
-        file_hashes = [item[0] for item in get_import_file_hashes_only()]
-        return file_hash in file_hashes
+        return is_file_imported(hash_html_file(html_filepath))
 
 class SubTabImportSetsViaAppleNotes(ttk.Frame):
     """
@@ -458,11 +513,19 @@ class SubTabImportSetsViaAppleNotes(ttk.Frame):
             self.after(1000, lambda: self.monitor(thread))
         else:
             # Now import the HTML file that was generated.
-            import_sets_via_html(f"{self.script_directory}/../usr/my_apple_workouts.html",
-                                 text_widget=self.tab_import_sets.status_msg_area,
-                                 clear_text_widget=False,
-                                 method=APPLE_NOTES)
-            self.tab_import_sets.update_sheet()
-
-            _log_import_msg("Done retrieving Apple Notes!", self.tab_import_sets.status_msg_area)
-            self.btn_import.config(state=NORMAL)
\ No newline at end of file
+            future = self.tab_import_sets.import_html_file(f"{self.script_directory}/../usr/my_apple_workouts.html",
+                                                           clear_text_widget=False,
+                                                           method=APPLE_NOTES,
+                                                           incremental=True)
+            after_future(self, future, self.on_import_done)
+
+    def on_import_done(self, future):
+        """Called on the main thread when the Apple Notes import is done."""
+        # Apply the import's own messages first. The import disables the
+        # status msg area when it's done, so re-enable it for this message.
+        status_msg_area = self.tab_import_sets.status_msg_area
+        self.tab_import_sets.status_msg_queue.flush()
+        status_msg_area.configure(state='normal')
+        _log_import_msg("Done retrieving Apple Notes!", status_msg_area)
+        status_msg_area.configure(state='disabled')
+        self.btn_import.config(state=NORMAL)
\ No newline at end of file
@@ -6,59 +6,76 @@ import logging
 from tkinter import *
 from tkinter import ttk
 from tkinter.scrolledtext import ScrolledText
-from typing import Dict
+from functools import lru_cache
+from itertools import groupby
+from typing import Iterable
 
 import matplotlib
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import matplotlib.dates as mdates
 import mplcursors
-from matplotlib.colors import Colormap
+from matplotlib.collections import PathCollection
 from matplotlib.figure import Figure
+import numpy as np
 from tkcalendar import DateEntry
 
-from src.obj.exercise_set import ExerciseSet
+from src.obj.exercise_set_columns import ExerciseSetColumns, from_epoch_day
 from src.sql_utility import get_exercise_sets_dict
+from src.ui.lazy_tab import RefreshWhenShown
 
 logger = logging.getLogger(__name__)
 matplotlib.set_loglevel('warning')  # reduces log file clutter.
 
-def build_date_sets_string(date_obj: date, list_of_sets: list[ExerciseSet]) -> str:
+# Rep ranges of the four plots, in (row, column) order: (min_reps, max_reps).
+# None means no upper limit. The colorbar of that plot goes up to OPEN_RANGE_MAX_REPS.
+REP_RANGES = [(1, 5), (6, 8), (9, 11), (12, None)]
+OPEN_RANGE_MAX_REPS = 20
+
+def build_sets_string(exercise_sets: Iterable[tuple[float, int, bool]]) -> str:
     """
-    Given a date and a list of ExerciseSets performed on that date, create a string
-    representing this info. This 'reverse engineers' the sets into a string that
-    closely resembles how they are logged.
-    :param date_obj:   date object
-    :param list_of_sets:  list of ExerciseSet objects
-    :return:  date: [8@200, 8@200, 6@210] -> "date\n 2x8@200, 6@210"
+    Given the (weight, reps, partial) of the sets performed on one date, in
+    order, create the compact string they would be logged as. Runs of identical
+    sets are counted, and a weight is only written once for consecutive sets.
+    :return: [8@200, 8@200, 7@200, 6@210] -> "2x8,7@200, 6@210"
     """
-    date_sets_str = f"{date_obj}\n"
-    for i in range(len(list_of_sets)):
-        curr_set = list_of_sets[i]
-        # first set. The " 1x" will get removed later, but it's necessary to include for processing the next set
-        if i == 0:
-            date_sets_str += f" 1x{curr_set.simple_str()}"
+    parts = []
+    for weight, weight_sets in groupby(exercise_sets, key=lambda s: s[0]):
+        reps_parts = []
+        for (_, reps, partial), same_sets in groupby(weight_sets):
+            count = sum(1 for _ in same_sets)
+            reps_str = f"~{reps}" if partial else f"{reps}"
+            reps_parts.append(f"{count}x{reps_str}" if count > 1 else reps_str)
+        reps_str = ",".join(reps_parts)
+        if weight == 0:
+            parts.append(reps_str)
         else:
-            prev_set = list_of_sets[i - 1]
-            # Increment number in front of 'x'
-            if prev_set.simple_str() == curr_set.simple_str():
-                last_part = date_sets_str.rsplit(" ", 1)[1]
-                pre_x, post_x = last_part.rsplit("x", 1)
-                num_sets = int(
-                    pre_x[len(pre_x) - 1])  # take digit in front of 'x' (this won't work for multiple digits)
-                new_part = f"{pre_x[:len(pre_x) - 1]}{num_sets + 1}x{post_x}"
-                date_sets_str = date_sets_str.replace(last_part, new_part)
-            # Keep weight from the last set, but add new number of reps
-            elif prev_set.weight == curr_set.weight:
-                last_part = date_sets_str.rsplit(" ", 1)[1]
-                # TODO this appears to fail for sets that don't have an @, like pull ups
-                pre_at, post_at = last_part.split("@")
-                new_part = f"{pre_at},1x{curr_set.reps}@{post_at}"
-                date_sets_str = date_sets_str.replace(last_part, new_part)
-            # Completely new weight, append the set to the end
-            else:
-                date_sets_str += f", 1x{curr_set.simple_str()}"
-    date_sets_str = date_sets_str.replace("1x", "")
-    return date_sets_str
+            weight_str = int(weight) if weight == int(weight) else weight
+            parts.append(f"{reps_str}@{weight_str}")
+    return ", ".join(parts)
+
+
+@lru_cache(maxsize=64)
+def render_sets_text(exercise_sets: ExerciseSetColumns, start_date: date = None, end_date: date = None) -> str:
+    """
+    Render the sets from start_date to end_date, one date per paragraph:
+        2024-10-10
+         2x8@200, 6@210
+
+    The sets are sorted by date, so each date is one run, and the whole text
+    is built in one pass. The result is cached per exercise and date range.
+    The cache holds on to the ExerciseSetColumns object, and the exercise-sets
+    dictionary replaces that object when the exercise changes, so a cached
+    text is never stale.
+    """
+    exercise_sets = exercise_sets.between(start_date, end_date)
+    # Python floats and ints are faster to group than NumPy scalars. str() of
+    # the float32 weights gives their shortest repr (17.3, not 17.2999992).
+    weights = [float(str(w)) for w in exercise_sets.weights]
+    rows = zip(exercise_sets.days.tolist(), weights, exercise_sets.reps.tolist(), exercise_sets.partial.tolist())
+    paragraphs = []
+    for day, day_sets in groupby(rows, key=lambda row: row[0]):
+        paragraphs.append(f"{from_epoch_day(day)}\n {build_sets_string(row[1:] for row in day_sets)}\n\n")
+    return "".join(paragraphs)
 
 
 
@@ -133,10 +150,6 @@ class TabProgressPlots(ttk.Frame):
         self.frm_display.rowconfigure(0, weight=1)
         self.frm_display.rowconfigure(1, weight=1)
 
-        # --- Define data structures and fields ---
-        self.esd = {}  # ESD = Exercises-Sets Dictionary. Maps 'exercise' -> [ExerciseSet]
-        self.update_exercises()
-
         # Base MatPlotLib dimensions (ideal for 1080p res)
         base_figsize = (6.4, 4.8)
         base_title_size = 16
@@ -147,6 +160,48 @@ class TabProgressPlots(ttk.Frame):
         self.title_size = base_title_size * mpl_scale
         self.tick_size = base_tick_size * mpl_scale
 
+        self.create_plots()
+
+        # --- Define data structures and fields ---
+        self.esd = {}  # ESD = Exercises-Sets Dictionary. Maps 'exercise' -> ExerciseSetColumns
+        self.update_exercises()
+        RefreshWhenShown(self, self.on_sets_changed)
+
+    def on_sets_changed(self, exercises: frozenset[str]):
+        """
+        Update the combobox after the sets changed. The text area and plots
+        are only redrawn if the selected exercise was touched.
+        """
+        self.esd = get_exercise_sets_dict()
+        self.combobox['values'] = sorted(self.esd.keys())
+        if self.combobox.get() in exercises:
+            self.filter_sets()
+
+    def create_plots(self):
+        """
+        Create the figure with the four plots, once. Selecting another exercise
+        or date range only updates the data and limits of the plots (see
+        update_plot), instead of creating new figures and canvases.
+        """
+        self.figure = Figure((self.figsize[0] * 2, self.figsize[1] * 2))
+        self.scatters = []
+        cmap = matplotlib.colormaps['viridis']
+        for ax, (min_reps, max_reps) in zip(self.figure.subplots(2, 2).flat, REP_RANGES):
+            max_reps = max_reps or OPEN_RANGE_MAX_REPS
+            ax.set_title(f"Load Over Time for Sets of {min_reps}-{max_reps} Reps", fontsize=self.title_size)
+            ax.xaxis.set_major_formatter(mdates.DateFormatter('%y-%m-%d'))
+            # Rotates the x labels so they don't crowd each other.
+            ax.tick_params(axis='x', labelrotation=20, labelsize=self.tick_size)
+            ax.tick_params(axis='y', labelsize=self.tick_size)
+            # vmin and vmax fix the colors to the rep range, whatever the data.
+            scatter = ax.scatter([], [], c=[], cmap=cmap, vmin=min_reps, vmax=max_reps, marker='o')
+            self.figure.colorbar(scatter, ax=ax, format="%d", ticks=list(range(min_reps, max_reps + 1)))
+            self.scatters.append(scatter)
+        self.figure.tight_layout()
+        mplcursors.cursor(self.scatters)
+
+        self.canvas = FigureCanvasTkAgg(self.figure, self.frm_display)
+        self.canvas.get_tk_widget().grid(row=0, column=1, rowspan=2, columnspan=2, sticky='NSEW')
 
     def update_exercises(self):
         """
@@ -164,7 +219,7 @@ class TabProgressPlots(ttk.Frame):
         self.combobox.set(self.combobox.get())
         self.combobox.event_generate("<<ComboboxSelected>>")
 
-    def filter_sets(self, event: Event):
+    def filter_sets(self, event: Event = None):
         """
         When a new exercise is selected in the combobox, filter the sets being
         displayed in the text area and show new plots.
@@ -179,43 +234,27 @@ class TabProgressPlots(ttk.Frame):
             self.text_area.delete("1.0", END)
             self.text_area.configure(state="disabled")
             self.combobox.selection_clear()
-            for widget in self.frm_display.winfo_children():
-                # Since the exercise doesn't exist anymore, destroy the canvases
-                # for this exercise.
-                if isinstance(widget, Canvas):
-                    widget.destroy()
+            # Since the exercise doesn't exist anymore, clear the plots.
+            for scatter in self.scatters:
+                scatter.set_offsets(np.empty((0, 2)))
+                scatter.set_array(np.empty(0))
+            self.canvas.draw_idle()
             return
 
         self.update_text_area()
-        self.show_plots(event)
+        self._show_plots()
 
-    def update_text_area(self):
-        """Update the text area with dates and sets for the selected exercise."""
+    def update_text_area(self, start_date: date = None, end_date: date = None):
+        """
+        Update the text area with dates and sets for the selected exercise,
+        from start_date to end_date. None means no limit.
+        """
         selected_exercise = self.combobox.get()
         self.text_area.configure(state="normal")
         self.text_area.delete("1.0", END)  # Clear existing text
 
-        to_insert = ""  # Everything to insert in the text area
-        list_sets = sorted(self.esd[selected_exercise], key=lambda eset: eset.date)
-        date_sets_list_dict: Dict[date, list[ExerciseSet]] = {}  # {2024-10-10: [set1, set2]}
-
-        # Build dict from list of sets
         logger.info(f"Filtering sets for {selected_exercise}")
-        for the_set in list_sets:
-            the_date = the_set.date
-            logger.debug(the_set)
-
-            if the_date not in date_sets_list_dict.keys():
-                # Filter list of sets to this date. Add this list to the dict.
-                sets_by_date = [s for s in list_sets if s.date == the_date]
-                date_sets_list_dict[the_date] = sets_by_date
-            else:
-                continue  # This date has already been processed.
-
-        # Go through each date in the dict, and build the string to insert.
-        for d, l in date_sets_list_dict.items():
-            to_insert += f"{build_date_sets_string(d, l)}\n\n"
-
+        to_insert = render_sets_text(self.esd[selected_exercise], start_date, end_date)
         self.text_area.insert(END, to_insert)  # Update with new text
         self.text_area.configure(state="disabled")
         logger.info(f"Done filtering sets for {selected_exercise}")
@@ -228,7 +267,10 @@ class TabProgressPlots(ttk.Frame):
         if event.widget == self.combobox:
             self._show_plots()
         if event.widget == self.date_entry_start or event.widget == self.date_entry_end:
-            self._show_plots(start_date=self.date_entry_start.get_date(), end_date=self.date_entry_end.get_date())
+            start_date = self.date_entry_start.get_date()
+            end_date = self.date_entry_end.get_date()
+            self.update_text_area(start_date, end_date)
+            self._show_plots(start_date=start_date, end_date=end_date)
 
     def _show_plots(self, start_date : date = None, end_date : date = None):
         """
@@ -245,60 +287,40 @@ class TabProgressPlots(ttk.Frame):
         if selected_exercise == '':
             return
 
-        # Find default start and end dates if none were provided.
+        # The sets are sorted by date, so the default start and end dates are
+        # the first and last sets, and the date filter is a binary search.
+        exercise_sets = self.esd[selected_exercise]
         if start_date is None:
-            start_date = min([s.date for s in self.esd[selected_exercise]])
+            start_date = exercise_sets.first_date
         if end_date is None:
-            end_date = max([s.date for s in self.esd[selected_exercise]])
+            end_date = exercise_sets.last_date
         logger.info(f"start_date: {start_date}  | end_date: {end_date}")
-        date_filtered_sets = [s for s in self.esd[selected_exercise] if
-                              start_date <= s.date <= end_date]
-
-        # Get sets of 1-5, 6-8, 9-11, and 12+ reps
-        sets_1_5 =   [s for s in date_filtered_sets if s.reps <= 5]
-        sets_6_8 =   [s for s in date_filtered_sets if 6 <= s.reps <= 8]
-        sets_9_11 =  [s for s in date_filtered_sets if 9 <= s.reps <= 11]
-        sets_12_up = [s for s in date_filtered_sets if s.reps >= 12]
+        date_filtered_sets = exercise_sets.between(start_date, end_date)
 
         # Update date entry widgets (this is necessary for when this function is
         # called with no start or end date)
         self.date_entry_start.set_date(start_date)
         self.date_entry_end.set_date(end_date)
 
-        # Show plots
-        self.show_plot(list_sets=sets_1_5, min_reps=1, max_reps=5, start_date=start_date, end_date=end_date,
-                       cmap=matplotlib.colormaps['viridis'], plot_grid_row=0, plot_grid_col=1)
-        self.show_plot(list_sets=sets_6_8, min_reps=6, max_reps=8, start_date=start_date, end_date=end_date,
-                       cmap=matplotlib.colormaps['viridis'], plot_grid_row=0, plot_grid_col=2)
-        self.show_plot(list_sets=sets_9_11, min_reps=9, max_reps=11, start_date=start_date, end_date=end_date,
-                       cmap=matplotlib.colormaps['viridis'], plot_grid_row=1, plot_grid_col=1)
-        self.show_plot(list_sets=sets_12_up, min_reps=12, max_reps=20, start_date=start_date, end_date=end_date,
-                       cmap=matplotlib.colormaps['viridis'], plot_grid_row=1, plot_grid_col=2)
-
-    def show_plot(self, list_sets : list[ExerciseSet], min_reps : int, max_reps : int, start_date : date, end_date : date, cmap : Colormap, plot_grid_row : int, plot_grid_col : int):
+        # Update the plots of 1-5, 6-8, 9-11, and 12+ reps
+        for scatter, (min_reps, max_reps) in zip(self.scatters, REP_RANGES):
+            self.update_plot(scatter, date_filtered_sets.with_reps(min_reps, max_reps), start_date, end_date)
+        self.canvas.draw_idle()
+
+    def update_plot(self, scatter: PathCollection, list_sets: ExerciseSetColumns, start_date: date, end_date: date):
         """
-        Plot load over time for a particular exercise and rep range.
-        :param list_sets:     list of ExerciseSet objects
-        :param min_reps:      minimum reps per set
-        :param max_reps:      maximum reps per set
+        Plot load over time for a particular exercise and rep range, by
+        replacing the data of the plot's scatter.
+        :param scatter:       scatter of the plot to update
+        :param list_sets:     sets to plot
         :param start_date:    the start date for this plot
         :param end_date:      the end date for this plot
-        :param cmap:          colormap to use
-        :param plot_grid_row: row to place this plot within frm_display
-        :param plot_grid_col: column to place this plot within frm_display
-        :return:
         """
-        fig = Figure(self.figsize)
-        ax = fig.add_subplot(111)  # figure has a subplot with 1 row, 1 col, and pos 1
-        fig.suptitle(f"Load Over Time for Sets of {min_reps}-{max_reps} Reps", fontsize=self.title_size)
-
-        if len(list_sets) == 0:
-            # Currently displays empty graph with weird axis ticks, probably not the behavior we want
-            x, y, colors = [], [], []
-        else:
-            x = [s.date for s in list_sets]
-            y = [s.weight for s in list_sets]
-            colors = [s.reps for s in list_sets]
+        ax = scatter.axes
+        # Currently displays empty graph when there are no sets, probably not
+        # the behavior we want
+        scatter.set_offsets(np.column_stack([mdates.date2num(list_sets.dates), list_sets.weights]))
+        scatter.set_array(list_sets.reps)
 
         # Matplotlib attempts to "automatically expand" the axis limits if they
         # are the same. This isn't the behavior we want, so there is a check
@@ -311,20 +333,11 @@ class TabProgressPlots(ttk.Frame):
         ax.set_xlim(left=start_date, right=end_date)
         ax.xaxis.set_major_locator(mdates.DayLocator(interval=interval))
 
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%y-%m-%d'))
-
-        # Rotates and right-aligns the x labels so they don't crowd each other.
-        for label in ax.get_xticklabels(which='major'):
-            label.set(rotation=20, horizontalalignment='right')
-            label.set_fontsize(self.tick_size)
-        for label in ax.get_yticklabels(which='major'):
-            label.set_fontsize(self.tick_size)
-        fig.subplots_adjust()
-
-        # Create scatter, and attach it to the canvas
-        scatter = ax.scatter(x, y, c=colors, cmap=cmap, marker='o')
-        mplcursors.cursor(scatter)
-        fig.colorbar(scatter, format="%d", ticks=list(range(min_reps, max_reps+1)))
-        canvas = FigureCanvasTkAgg(fig, self.frm_display)
-        canvas.draw()
-        canvas.get_tk_widget().grid(row=plot_grid_row, column=plot_grid_col, sticky='NSEW')
+        # Autoscaling ignores data set after the scatter was created, so the
+        # y-axis limits are set here, with a 5% margin.
+        if len(list_sets) > 0:
+            low, high = float(list_sets.weights.min()), float(list_sets.weights.max())
+            margin = (high - low) * 0.05 or 1
+            ax.set_ylim(low - margin, high + margin)
+        else:
+            ax.set_ylim(0, 1)
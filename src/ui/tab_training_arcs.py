@@ -2,27 +2,28 @@
 All functions and classes related to the 'Training Arcs' tab.
 """
 from datetime import datetime, date, timedelta
+from itertools import groupby
 import logging
+from operator import itemgetter
 import webbrowser
 from pathlib import Path
 from tkinter import *
 from tkinter import ttk, filedialog, messagebox
 import tkinter.font as tkfont
 
-import matplotlib
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.dates as mdates
-import mplcursors
-from matplotlib.colors import Colormap
-from matplotlib.figure import Figure
 from tkcalendar import DateEntry
 import tksheet
 from tksheet import Sheet
 
-from src.common import pad_frame
-from src.obj.exercise_arc import DailySets, ExerciseArc
-from src.sql_utility import get_daily_sets, get_exercise_sets_dict, get_exercises, _split_sets_string
+from src.common import after_future, pad_frame
+from src.obj.exercise_arc import ArcSummary, DailySets, ExerciseArc
+from src.obj.exercise_set_columns import ExerciseSetColumns
+from src.plot_renderer import PlotSpec, renderer
+from src.sets_parser import parse_sets_string
+from src.sql_utility import get_arc_daily_sets, get_arc_summaries, get_exercise_sets_dict, get_exercises
+from src.ui.lazy_tab import RefreshWhenShown
 from src.ui.vertical_scrolled_frame import VerticalScrolledFrame
+from src.ui.virtual_list import VirtualList
 
 logger = logging.getLogger(__name__)
 
@@ -41,69 +42,44 @@ def get_arcs(exercise: str,
      ('bb bench', '2023-09-10', '3x7 @ 175', ''),
     ]
 
+    The arcs are found, and short arcs pruned, in SQL (see get_arc_summaries).
+
     :param exercise: the exercise to fetch arcs for
     :param separator: minimum num days that separates one arc from another
     :return: arcs
     """
-    daily_sets: list[DailySets] = [DailySets(t) for t in get_daily_sets(exercise)]
-    arcs: list[ExerciseArc] = []
-    curr_arc: ExerciseArc = ExerciseArc([daily_sets[0]])
-
-    for i in range(1, len(daily_sets)):
-        # Find timedelta between current item and previous item
-        curr = daily_sets[i]
-        prev = daily_sets[i - 1]
-        diff = curr.date - prev.date
-
-        if diff.days < separator:
-            # current item is part of current arc.
-            curr_arc.add_daily_sets_obj(curr)
-        else:
-            # current item is the start of a new arc.
-            arcs.append(curr_arc)
-            curr_arc = ExerciseArc([curr])
-
-    arcs.append(curr_arc)
-
-    arcs = prune_arcs(arcs)
+    return [ExerciseArc([DailySets(item[1:]) for item in items])
+            for _, items in groupby(get_arc_daily_sets(exercise, separator), key=itemgetter(0))]
 
-    return arcs
 
-
-def prune_arcs(arcs: list[ExerciseArc],
-               min_len: int = 4,
-               ) -> list[ExerciseArc]:
-    """
-    Remove arcs that are too short. Except the most recent arc. That can stay.
-
-    :param arcs: list of arcs to prune
-    :param min_len: minimum length an arc must be
-    :return: pruned arcs
-    """
-    filtered_arcs = []
-    last_idx = len(arcs) - 1
-    for idx, arc in enumerate(arcs):
-        if len(arc) > min_len or idx == last_idx:
-            filtered_arcs.append(arc)
-    return filtered_arcs
+def create_timeline_sheet(parent_frame: ttk.Frame, arcs: list[ArcSummary]) -> tksheet.Sheet:
+    """Create a Tksheet that lists the training arcs of every exercise, most recent first."""
+    new_sheet = Sheet(parent_frame,
+                      theme="light green",
+                      width=1680,
+                      height=800,
+                      headers=["Start", "End", "Exercise", "Arc", "Workouts", "Weeks"])
+    new_sheet.set_data(data=[[arc.start_date, arc.end_date, arc.exercise, arc.arc_num, arc.item_count,
+                               (arc.end_date - arc.start_date).days // 7 + 1]
+                              for arc in reversed(arcs)])
+    new_sheet.readonly()
+    new_sheet.enable_bindings(
+        "single_select", "drag_select", "select_all", "column_select",
+        "row_select", "column_width_resize", "double_click_column_resize",
+        "arrowkeys", "right_click_popup_menu", "copy", "find"
+    )
+    new_sheet.set_all_cell_sizes_to_text()
+    return new_sheet
 
 
 def format_sets_string_for_cell(sets_str: str) -> str:
     """Format a single sets string instance to display in a cell."""
-    if sets_str.count("@") < 2:
-        # Unweighted sets or all sets are at the same weight.
-        # Render on one line, but adjust spacing.
+    parsed = parse_sets_string(sets_str)
+    if parsed.errors or not parsed.segments:
+        # Render as written, but adjust spacing.
         return sets_str.replace(" ", "").replace("@", " @ ")
-    else:
-        # Render each weight on a new line.
-        lines = []
-        split_by_wt = _split_sets_string(sets_str)
-        for i in range(0, len(split_by_wt), 2):
-            setsxreps = split_by_wt[i].replace(" ", "")
-            wt = split_by_wt[i+1].strip()
-            line = f"{setsxreps} @ {wt}"
-            lines.append(line)
-        return "\n".join(lines)
+    # Render each weight on a new line.
+    return "\n".join(f"{setsxreps} @ {wt}" if wt else setsxreps for setsxreps, wt in parsed.segments)
 
 
 def format_sets_string_list(sets_strings: list[str]) -> tuple[list[str], int]:
@@ -130,18 +106,13 @@ def format_sets_string_list(sets_strings: list[str]) -> tuple[list[str], int]:
     return formatted_strings, max_lines
 
 
-def create_arc_sheet(parent_frame: ttk.Frame, arc: ExerciseArc) -> tksheet.Sheet:
-    """Create a Tksheet for the given training arc."""
+def create_arc_sheet(parent_frame: ttk.Frame) -> tksheet.Sheet:
+    """Create an empty Tksheet for training arcs. See fill_arc_sheet."""
     new_sheet = Sheet(parent_frame,
                       theme="light green",
                       # height=200,
                       width=1680,
-                      show_y_scrollbar=False,
-                      headers=[ds.date for ds in arc.daily_sets_list])
-
-    formatted_sets_strings, max_lines = format_sets_string_list([ds.sets_string for ds in arc.daily_sets_list])
-    new_sheet.set_data(data=formatted_sets_strings)
-
+                      show_y_scrollbar=False)
     new_sheet.readonly()
     new_sheet.enable_bindings(
         "single_select", "drag_select", "select_all", "column_select",
@@ -149,18 +120,50 @@ def create_arc_sheet(parent_frame: ttk.Frame, arc: ExerciseArc) -> tksheet.Sheet
         "arrowkeys", "right_click_popup_menu", "copy",
         "find", "ctrl_click_select"
     )
-    new_sheet.set_all_cell_sizes_to_text()
+    return new_sheet
 
-    # Resize sheet based on number of lines.
-    # 1 weight = 1 line of text
-    # Each line is 25px. Add 100px on top of that to account for header (35px),
-    # x-scrollbar (25 px), and extra space (40px).
-    # Even though it looks unaesthetic, the extra space provides better
-    # UX. When the tksheet is too short, you can vertically scroll it, which
-    # we want to prevent.
-    new_sheet.config(height=25 * max_lines + 100)
 
-    return new_sheet
+def fill_arc_sheet(sheet: tksheet.Sheet, arc: ExerciseArc) -> None:
+    """Show the given training arc in a sheet, replacing its previous content."""
+    formatted_sets_strings, max_lines = format_sets_string_list([ds.sets_string for ds in arc.daily_sets_list])
+    sheet.set_sheet_data([formatted_sets_strings], redraw=False)
+    sheet.headers([ds.date for ds in arc.daily_sets_list], reset_col_positions=True, redraw=False)
+    sheet.set_all_cell_sizes_to_text()
+    sheet.config(height=get_arc_sheet_height(max_lines))
+
+
+def get_arc_sheet_height(max_lines: int) -> int:
+    """
+    Resize sheet based on number of lines.
+    1 weight = 1 line of text
+    Each line is 25px. Add 100px on top of that to account for header (35px),
+    x-scrollbar (25 px), and extra space (40px).
+    Even though it looks unaesthetic, the extra space provides better
+    UX. When the tksheet is too short, you can vertically scroll it, which
+    we want to prevent.
+    """
+    return 25 * max_lines + 100
+
+
+class ArcView(ttk.Frame):
+    """
+    The widgets that show one training arc: a label, a Tksheet, and two plots.
+    The arcs list recycles them from arc to arc, see VirtualList.
+    """
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.lbl = ttk.Label(self)
+        self.sheet = create_arc_sheet(self)
+        self.frm_plots = ttk.Frame(self)
+        self.plot_labels = [ttk.Label(self.frm_plots), ttk.Label(self.frm_plots)]
+
+        self.lbl.grid(row=0, column=0)
+        self.sheet.grid(row=1, column=0)
+        self.frm_plots.grid(row=2, column=0)
+        for col, lbl in enumerate(self.plot_labels):
+            lbl.grid(row=0, column=col, sticky='NSEW')
+        pad_frame(self)
+        pad_frame(self.frm_plots)
 
 
 class TabTrainingArcs(ttk.Frame):
@@ -185,6 +188,10 @@ class TabTrainingArcs(ttk.Frame):
 
         self.frm_controls = ttk.Frame(self.content_frame)  # statically sized frame at top of tab
         self.frm_results = ttk.Frame(self.content_frame)  # dynamically sized frame where results will appear
+        # The arcs of a search. ArcViews are only drawn for the arcs on screen.
+        self.arcs_list = VirtualList(main_frame, self.frm_results, ArcView, self.show_arc_view,
+                                     self.estimate_arc_height)
+        self.timeline_sheet = None  # the timeline of all exercises, once it is shown
 
         self.lbl_exercise = ttk.Label(self.frm_controls, text="Exercise: ")
         self.combobox = ttk.Combobox(self.frm_controls, width=20)
@@ -193,6 +200,8 @@ class TabTrainingArcs(ttk.Frame):
         self.entry_separator.insert(0, "30")  # default value
         self.lbl_days = ttk.Label(self.frm_controls, text="days")
         self.btn_search = ttk.Button(self.frm_controls, text="Search", command=self.update_arcs_results)
+        self.btn_timeline = ttk.Button(self.frm_controls, text="Timeline of All Exercises",
+                                       command=self.update_timeline_results)
         self.lbl_found_arcs = ttk.Label(self.frm_controls)  # blank until a search is run
 
         # --- Manage layout of widgets ---
@@ -200,6 +209,7 @@ class TabTrainingArcs(ttk.Frame):
 
         self.frm_controls.grid(row=0, column=0, sticky="NSEW")
         self.frm_results.grid(row=1, column=0, sticky="NSEW")
+        self.arcs_list.frame.grid(row=0, column=0)
 
         self.lbl_exercise.grid(row=0, column=0, columnspan=3, sticky="NSEW")
         self.combobox.grid(row=0, column=1, columnspan=3, sticky="NSEW")
@@ -207,6 +217,7 @@ class TabTrainingArcs(ttk.Frame):
         self.entry_separator.grid(row=1, column=1, sticky="NSEW")
         self.lbl_days.grid(row=1, column=2, sticky="NSEW")
         self.btn_search.grid(row=2, column=0, sticky="NSEW")
+        self.btn_timeline.grid(row=2, column=1, sticky="NSEW")
         self.lbl_found_arcs.grid(row=3, column=0, columnspan=3, sticky="NSEW")
 
         # Configure rows/cols of each frame to resize.
@@ -226,121 +237,144 @@ class TabTrainingArcs(ttk.Frame):
         self.title_size = 16
         self.tick_size = 9.6
 
-        # TODO it would be nice if this were shared with the progress_plots variable,
-        #  since they are intended to always be identical... but I'm having a hard
-        #  time creating a variable that is updated in one file (sql_utility)
-        #  and accessed in others (the frames).
-        self.esd = {}  # ESD = Exercises-Sets Dictionary. Maps 'exercise' -> [ExerciseSet]
+        # This is the same dictionary object as the Progress Plots tab's: both
+        # come from the cache behind get_exercise_sets_dict.
+        self.esd = {}  # ESD = Exercises-Sets Dictionary. Maps 'exercise' -> ExerciseSetColumns
+        self.shown_results = None  # update_arcs_results or update_timeline_results, once a search is run
+        self.arcs_exercise = None  # the exercise of the arcs being shown
         self.update_exercises()
+        RefreshWhenShown(self, self.on_sets_changed)
 
     def update_exercises(self) -> None:
         """Update the exercises-sets dictionary and the combobox."""
         self.esd = get_exercise_sets_dict()
         self.combobox["values"] = get_exercises()
 
-    def update_arcs_results(self) -> None:
+    def on_sets_changed(self, exercises: frozenset[str]) -> None:
         """
-        Search for training arcs with the selected exercise and separator.
-        Update the results frame.
+        Update the combobox after the sets changed. The timeline is rebuilt,
+        and the arcs are searched again if they are shown for an exercise that
+        was touched.
         """
-        # Get training arcs from current selection
-        exercise = self.combobox.get()
+        self.update_exercises()
+        if self.shown_results == self.update_timeline_results:
+            self.update_timeline_results()
+        elif self.shown_results == self.update_arcs_results and self.arcs_exercise in exercises:
+            self.update_arcs_results(self.arcs_exercise)
+
+    def get_separator(self) -> int | None:
+        """Return the separator entered by the user, or None (with a message) if it's invalid."""
         try:
             separator = int(self.entry_separator.get())
             if separator < 1:
                 raise ValueError
         except ValueError:
             self.lbl_found_arcs.config(text="Separator must be a positive integer.")
+            return None
+        return separator
+
+    def clear_results(self) -> None:
+        self.arcs_list.set_items([])
+        if self.timeline_sheet is not None:
+            self.timeline_sheet.destroy()
+            self.timeline_sheet = None
+
+    def update_timeline_results(self) -> None:
+        """Show the training arcs of every exercise, with the selected separator."""
+        separator = self.get_separator()
+        if separator is None:
             return
-        arcs = get_arcs(exercise, separator)
-        self.lbl_found_arcs.config(text=f"Found {len(arcs)} arcs.")
-
-        # Clear current results
-        for w in self.frm_results.winfo_children():
-            w.destroy()
-
-        # Display new results
-        for idx, arc in enumerate(arcs):
-            logger.info(f"\nARC {idx}")
-
-            # Create a frame to store a label, a subframe (with two plots), and a Tksheet.
-            new_frm = ttk.Frame(self.frm_results)
-            new_lbl = ttk.Label(new_frm, text=f"ARC {idx}")
-            new_sub_frm = self.create_frame_for_plots(new_frm, arc)
-            new_sheet = create_arc_sheet(new_frm, arc)
+        arcs = get_arc_summaries(separator=separator)
+        self.lbl_found_arcs.config(text=f"Found {len(arcs)} arcs across all exercises.")
+        self.shown_results = self.update_timeline_results
 
-            new_frm.grid(row=len(arcs)-idx, column=0)
-            new_lbl.grid(row=0, column=0)
-            new_sheet.grid(row=1, column=0)
-            new_sub_frm.grid(row=2, column=0)
+        self.clear_results()
+        self.timeline_sheet = create_timeline_sheet(self.frm_results, arcs)
+        self.timeline_sheet.grid(row=1, column=0, padx=5, pady=5)
 
-        pad_frame(self.frm_results)
-
-    def create_frame_for_plots(self, parent_frame: ttk.Frame, arc: ExerciseArc):
-        """Create frame that displays plots for given training arc."""
-        frm = ttk.Frame(parent_frame)
-
-        selected_exercise = self.combobox.get()
-        if selected_exercise == '':
-            return frm
+    def update_arcs_results(self, exercise: str = None) -> None:
+        """
+        Search for training arcs with the selected exercise and separator.
+        Update the results frame. Only the arcs near the visible part of the
+        results are drawn, see VirtualList.
+        :param exercise: the exercise to search, instead of the selected one
+        """
+        # Get training arcs from current selection
+        if exercise is None:
+            exercise = self.combobox.get()
+        separator = self.get_separator()
+        if separator is None:
+            return
+        arcs = get_arcs(exercise, separator)
+        self.lbl_found_arcs.config(text=f"Found {len(arcs)} arcs.")
+        self.shown_results = self.update_arcs_results
+        # The arcs are drawn as they scroll into view, possibly after the
+        # combobox changed, so remember what was searched.
+        self.arcs_exercise = exercise
+
+        # Clear current results, and list the new ones, most recent first.
+        self.clear_results()
+        self.arcs_list.set_items(reversed(list(enumerate(arcs))))
+
+    def estimate_arc_height(self, item: tuple[int, ExerciseArc]) -> int:
+        """Height in pixels of an ArcView showing the arc, before it is drawn."""
+        _, arc = item
+        _, max_lines = format_sets_string_list([ds.sets_string for ds in arc.daily_sets_list])
+        # label + sheet + plots (100 dpi), with the padding around each
+        return 20 + get_arc_sheet_height(max_lines) + int(self.figsize[1] * 100) + 3 * 10
+
+    def show_arc_view(self, view: ArcView, item: tuple[int, ExerciseArc]) -> None:
+        """Fill a (possibly recycled) ArcView with an arc."""
+        idx, arc = item
+        view.lbl.configure(text=f"ARC {idx}")
+        fill_arc_sheet(view.sheet, arc)
+        self.show_arc_plots(view.plot_labels, arc)
+
+    def show_arc_plots(self, plot_labels: list[ttk.Label], arc: ExerciseArc) -> None:
+        """Show the plots of a training arc in the two labels."""
+        exercise = arc.daily_sets_list[0].exercise
+        if exercise not in self.esd:
+            for lbl in plot_labels:
+                lbl.configure(image="", text="")
+            return
 
         # daily_sets items within the arc are ordered by date.
         start_date = arc.daily_sets_list[0].date
         end_date = arc.daily_sets_list[-1].date
-        date_filtered_sets = [s for s in self.esd[selected_exercise] if
-                              start_date <= s.date <= end_date]
+        date_filtered_sets = self.esd[exercise].between(start_date, end_date)
 
         # Get sets of 1-9 and 10+ reps.
         # TODO it would be cool if we got the rep ranges more dynamically/intelligently
-        sets_1_9 = [s for s in date_filtered_sets if s.reps <= 9]
-        sets_10_up = [s for s in date_filtered_sets if s.reps >= 10]
-
-        self.add_plot(frm, sets_1_9, min_reps=1, max_reps=9, start_date=start_date, end_date=end_date, cmap=matplotlib.colormaps['viridis'], row=0, col=0)
-        self.add_plot(frm, sets_10_up, min_reps=10, max_reps=20, start_date=start_date, end_date=end_date, cmap=matplotlib.colormaps['viridis'], row=0, col=1)
+        sets_1_9 = date_filtered_sets.with_reps(max_reps=9)
+        sets_10_up = date_filtered_sets.with_reps(min_reps=10)
 
-        return frm
+        self.show_plot(plot_labels[0], sets_1_9, min_reps=1, max_reps=9, start_date=start_date, end_date=end_date)
+        self.show_plot(plot_labels[1], sets_10_up, min_reps=10, max_reps=20, start_date=start_date, end_date=end_date)
 
-    def add_plot(self, parent_frame: ttk.Frame, list_sets, min_reps : int, max_reps : int, start_date : date, end_date : date, cmap : Colormap, row : int, col : int):
-        """Add plot to a frame"""
-        fig = Figure(self.figsize)
-        ax = fig.add_subplot(111)  # figure has a subplot with 1 row, 1 col, and pos 1
-        if max_reps is None:
-            max_reps = ""
-        fig.suptitle(f"Load Over Time for Sets of {min_reps}-{max_reps} Reps", fontsize=self.title_size)
-
-        if len(list_sets) == 0:
-            # Currently displays empty graph with weird axis ticks, probably not the behavior we want
-            x, y, colors = [], [], []
+    def show_plot(self, lbl: ttk.Label, list_sets: ExerciseSetColumns, min_reps : int, max_reps : int, start_date : date, end_date : date):
+        """
+        Show a plot in a label. The plot is rendered by the plot renderer, off
+        the Tk thread. A placeholder is shown until the image is ready.
+        """
+        spec = PlotSpec(exercise=list_sets.exercise, start_date=start_date, end_date=end_date,
+                        min_reps=min_reps, max_reps=max_reps,
+                        days=list_sets.days, weights=list_sets.weights, reps=list_sets.reps,
+                        figsize=self.figsize, title_size=self.title_size, tick_size=self.tick_size)
+        # The label can be recycled for another plot before this one is rendered.
+        lbl.plot_spec = spec
+        lbl.configure(image="", text="Rendering plot...")
+        lbl.image = None
+        future = renderer.render(spec)
+        if future.done():
+            self.show_plot_image(lbl, spec, future)
         else:
-            x = [s.date for s in list_sets]
-            y = [s.weight for s in list_sets]
-            colors = [s.reps for s in list_sets]
-
-        # Matplotlib attempts to "automatically expand" the axis limits if they
-        # are the same. This isn't the behavior we want, so there is a check
-        # for identical axis limits.
-        if start_date == end_date:
-            start_date = start_date - timedelta(days=1)
-            end_date = end_date + timedelta(days=1)
-        # We want 10 ticks on the x-axis. Calculate the interval needed for 10 ticks
-        interval = int((end_date - start_date).days / 10) + 1
-        ax.set_xlim(left=start_date, right=end_date)
-        ax.xaxis.set_major_locator(mdates.DayLocator(interval=interval))
-
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%y-%m-%d'))
-
-        # Rotates and right-aligns the x labels so they don't crowd each other.
-        for label in ax.get_xticklabels(which='major'):
-            label.set(rotation=20, horizontalalignment='right')
-            label.set_fontsize(self.tick_size)
-        for label in ax.get_yticklabels(which='major'):
-            label.set_fontsize(self.tick_size)
-        fig.subplots_adjust()
-
-        # Create scatter, and attach it to the canvas
-        scatter = ax.scatter(x, y, c=colors, cmap=cmap, marker='o')
-        mplcursors.cursor(scatter)
-        fig.colorbar(scatter, format="%d", ticks=list(range(min_reps, max_reps + 1)))
-        canvas = FigureCanvasTkAgg(fig, parent_frame)
-        canvas.draw()
-        canvas.get_tk_widget().grid(row=row, column=col, sticky='NSEW')
+            after_future(lbl, future, lambda f: self.show_plot_image(lbl, spec, f))
+
+    @staticmethod
+    def show_plot_image(lbl: ttk.Label, spec: PlotSpec, future) -> None:
+        """Show a rendered plot in its placeholder label, if the label still shows that plot."""
+        if not lbl.winfo_exists() or lbl.plot_spec is not spec:
+            return  # The label was destroyed or recycled while the plot was rendering.
+        img = PhotoImage(file=future.result())
+        lbl.configure(image=img, text="")
+        lbl.image = img  # Tk doesn't keep a reference to the image.
@@ -9,9 +9,11 @@ from tkinter import ttk
 from tkcalendar import DateEntry
 from tksheet import Sheet
 
-from src.sql_utility import (get_daily_sets_with_imports, get_first_date,
-                             update_user_edited_daily_sets, delete_daily_sets, get_exercises)
-from src.common import pad_frame, ANY, HAS_COMMENTS, NO_COMMENTS, VALID, INVALID
+from src.sql_utility import (get_daily_sets_page, get_first_date,
+                             update_user_edited_daily_sets, delete_daily_sets,
+                             get_exercises, writer, DATE, RELEVANCE, SORT_COLUMNS)
+from src.common import after_future, pad_frame, ANY, HAS_COMMENTS, NO_COMMENTS, VALID, INVALID
+from src.ui.lazy_tab import RefreshWhenShown
 
 logger = logging.getLogger(__name__)
 
@@ -51,6 +53,10 @@ class TabViewEditSets(ttk.Frame):
         # and add them to this list. When the user clicks SAVE, delete
         # everything we tracked from SQLite.
         self.deleted_daily_sets = []
+        # The sheet is filled one page at a time as the user scrolls down.
+        # This is the key of the next page to fetch, or None if every row
+        # matching the current filters is already in the sheet.
+        self.next_page_key = None
 
         # --- Define widgets ---
         # self-level
@@ -87,6 +93,13 @@ class TabViewEditSets(ttk.Frame):
                                         borderwidth=2)
         self.date_entry_end.bind("<<DateEntrySelected>>", self._update_sheet)
 
+        # Full-text search over exercise, comments and line.
+        self.lbl_search = ttk.Label(self.frm_entries, text="Search")
+        self.entry_search = ttk.Entry(self.frm_entries, width=30)
+        self.entry_search.bind("<Return>", self._update_sheet_from_search)
+        self.btn_search = ttk.Button(self.frm_entries, text="Search", command=self.update_sheet_from_search)
+        self.btn_clear_search = ttk.Button(self.frm_entries, text="Clear", command=self.clear_search)
+
         self.lbl_comments = ttk.Label(self.frm_radiobuttons, text="Comments")
         self.selected_comments = StringVar(value=ANY)
         self.rb_any_comments = ttk.Radiobutton(self.frm_radiobuttons,
@@ -123,6 +136,20 @@ class TabViewEditSets(ttk.Frame):
                                         variable=self.selected_valid,
                                         command=self.update_sheet)
 
+        # Sorting happens in SQL, so only the loaded pages need to be in the sheet.
+        self.lbl_sort = ttk.Label(self.frm_radiobuttons, text="Sort by")
+        self.combobox_sort = ttk.Combobox(self.frm_radiobuttons,
+                                          width=12,
+                                          state='readonly',
+                                          values=list(SORT_COLUMNS.keys()))
+        self.combobox_sort.set(DATE)
+        self.combobox_sort.bind("<<ComboboxSelected>>", self._update_sheet)
+        self.sort_descending = BooleanVar(value=True)
+        self.cb_descending = ttk.Checkbutton(self.frm_radiobuttons,
+                                             text="Descending",
+                                             variable=self.sort_descending,
+                                             command=self.update_sheet)
+
         self.btn_save = ttk.Button(self.frm_btns, text="SAVE CHANGES", state=DISABLED, command=self.save_changes)
         self.btn_restore = ttk.Button(self.frm_btns, text="RESTORE CHANGES", state=DISABLED, command=self.restore_changes)
 
@@ -140,6 +167,10 @@ class TabViewEditSets(ttk.Frame):
         self.date_entry_start.grid(row=0, column=3, sticky='W')
         self.lbl_end_date.grid(row=0, column=4, sticky='W')
         self.date_entry_end.grid(row=0, column=5, sticky='W')
+        self.lbl_search.grid(row=0, column=6, sticky='W')
+        self.entry_search.grid(row=0, column=7, sticky='W')
+        self.btn_search.grid(row=0, column=8, sticky='W')
+        self.btn_clear_search.grid(row=0, column=9, sticky='W')
 
         self.lbl_comments.grid(row=0, column=0, sticky='W')
         self.rb_any_comments.grid(row=0, column=1, sticky='W')
@@ -149,6 +180,9 @@ class TabViewEditSets(ttk.Frame):
         self.rb_any_valid.grid(row=1, column=1, sticky='W')
         self.rb_invalid.grid(row=1, column=2, sticky='W')
         self.rb_valid.grid(row=1, column=3, sticky='W')
+        self.lbl_sort.grid(row=2, column=0, sticky='W')
+        self.combobox_sort.grid(row=2, column=1, sticky='W')
+        self.cb_descending.grid(row=2, column=2, sticky='W')
 
         self.btn_save.grid(row=0, column=0, sticky='W')
         self.btn_restore.grid(row=0, column=1, sticky='W')
@@ -159,6 +193,7 @@ class TabViewEditSets(ttk.Frame):
 
         # --- Important set up ---
         self.config_sheet()
+        RefreshWhenShown(self, self.on_sets_changed)
         pad_frame(self.frm_radiobuttons)
         self.selected_comments.set(ANY)
         self.selected_valid.set(ANY)
@@ -174,7 +209,7 @@ class TabViewEditSets(ttk.Frame):
         self.sheet.enable_bindings(
             ("single_select", "drag_select", "select_all", "column_select",
              "row_select", "column_width_resize", "double_click_column_resize",
-             "arrowkeys", "right_click_popup_menu", "sort_rows", "copy", "cut",
+             "arrowkeys", "right_click_popup_menu", "copy", "cut",
              "paste", "delete", "undo",
              "edit_cell", # only certain columns are editable b/c of readonly_columns
              "find", "replace", "ctrl_click_select"
@@ -185,6 +220,8 @@ class TabViewEditSets(ttk.Frame):
         self.sheet.extra_bindings("end_ctrl_v", self.track_edit)
         self.sheet.extra_bindings("end_edit_cell", self.track_edit)
         self.sheet.extra_bindings("cell_select", self.on_cell_select)
+        # Scrolling redraws the sheet. Use that to fetch the next page.
+        self.sheet.bind("<<SheetRedrawn>>", self.on_sheet_redrawn)
         # Update sheet by spoofing combobox select event
         self.combobox.set(self.combobox.get())
         self.combobox.event_generate("<<ComboboxSelected>>")
@@ -206,40 +243,103 @@ class TabViewEditSets(ttk.Frame):
         self.date_entry_end.set_date(datetime.date.today())
         self.update_sheet()
 
+    def _update_sheet_from_search(self, event:Event):
+        """
+        Call update_sheet_from_search. A separate method is needed to store the event parameter.
+        """
+        self.update_sheet_from_search()
+
+    def update_sheet_from_search(self):
+        """
+        Update the sheet to the items that match the search. Searching sorts
+        the best matches first, and clearing the search goes back to sorting
+        by date.
+        """
+        if self.entry_search.get().strip():
+            self.combobox_sort.set(RELEVANCE)
+            self.sort_descending.set(True)
+        elif self.combobox_sort.get() == RELEVANCE:
+            self.combobox_sort.set(DATE)
+        self.update_sheet()
+
+    def clear_search(self):
+        """Clear the search entry, and show every item again."""
+        self.entry_search.delete(0, END)
+        self.update_sheet_from_search()
+
     def update_sheet(self):
         """Update sheet to match the current filters."""
         # In addition to updating the sheet, also update list of exercises in combobox.
         self.combobox['values'] = get_exercises(add_all=True)
 
-        exercise = self.combobox.get()
-        start_date = self.date_entry_start.get_date()
-        end_date = self.date_entry_end.get_date()
-        comments = self.selected_comments.get()
-        valid = self.selected_valid.get()
-
-        # Update data in the sheet.
+        # Update data in the sheet. Only the first page is fetched here.
         total_rows = self.sheet.get_total_rows()
         self.sheet.delete_rows(iter(range(total_rows)))
-        self.sheet.set_data(data=self._get_sheet_data(exercise, start_date, end_date, comments, valid))
+        sheet_data, rowids = self._get_sheet_data()
+        self.sheet.set_data(data=sheet_data)
+        self._set_rowid_notes(0, rowids)
 
         # Restyle the sheet.
         self._style_sheet()
 
-    def _get_sheet_data(self, exercise=ALL, start_date=None, end_date=None, comments=ANY, valid=ANY):
+    def on_sets_changed(self, exercises: frozenset[str]):
+        """
+        Update the combobox after the sets changed. The sheet is only
+        reloaded if it shows all exercises, or one that was touched.
         """
-        Return list that is used to populate the sheet.
+        selected = self.combobox.get()
+        if selected == "all" or selected in exercises:
+            self.update_sheet()
+        else:
+            self.combobox['values'] = get_exercises(add_all=True)
+
+    def on_sheet_redrawn(self, event):
+        """Fetch the next page when the user scrolls near the bottom of the sheet."""
+        if self.next_page_key is None:
+            return
+        _, bottom = self.sheet.get_yview()
+        if bottom > 0.9:
+            self.load_next_page()
+
+    def load_next_page(self):
+        """Append the next page of rows to the sheet."""
+        first_row = self.sheet.get_total_rows()
+        sheet_data, rowids = self._get_sheet_data(after=self.next_page_key)
+        if sheet_data:
+            self.sheet.insert_rows(sheet_data, idx=first_row, undo=False)
+            self._set_rowid_notes(first_row, rowids)
+            self._style_sheet()
+
+    def _get_sheet_data(self, after: tuple = None):
+        """
+        Return one page of rows that match the current filters and sort order,
+        and the rowid of each row.
 
-        This function ALSO double dips, and updates the notes for each cell!!
-        :return: [[daily_sets1], [daily_sets2], ...]
+        This function ALSO double dips, and updates the key of the next page!!
+        :param after: key of the page to fetch, or None for the first page
+        :return: [[daily_sets1], [daily_sets2], ...], [rowid1, rowid2, ...]
         """
         sheet_data = []
-        items = get_daily_sets_with_imports(exercise=exercise, start_date=start_date, end_date=end_date, comments=comments, valid=valid)
-        for i in range(len(items)):
-            sets_rowid, sets_date, sets_exercise, sets_string, comments, is_valid, line, imprt_name, imprt_date_time = items[i]
+        rowids = []
+        items, self.next_page_key = get_daily_sets_page(exercise=self.combobox.get(),
+                                                        start_date=self.date_entry_start.get_date(),
+                                                        end_date=self.date_entry_end.get_date(),
+                                                        comments=self.selected_comments.get(),
+                                                        valid=self.selected_valid.get(),
+                                                        search=self.entry_search.get(),
+                                                        sort_column=self.combobox_sort.get(),
+                                                        descending=self.sort_descending.get(),
+                                                        after=after)
+        for item in items:
+            sets_rowid, sets_date, sets_exercise, sets_string, comments, is_valid, line, imprt_name, imprt_date_time = item
             sheet_data.append([sets_date, sets_exercise, sets_string, comments, is_valid, line, imprt_name, imprt_date_time, 'Delete'])
-            # Update notes: store rowid in the date column
-            self.sheet.note(i, DATE_COL, note=sets_rowid)
-        return sheet_data
+            rowids.append(sets_rowid)
+        return sheet_data, rowids
+
+    def _set_rowid_notes(self, first_row: int, rowids: list[int]):
+        """Store each rowid as a note in the date column, starting at first_row."""
+        for i, rowid in enumerate(rowids):
+            self.sheet.note(first_row + i, DATE_COL, note=rowid)
 
     def _style_sheet(self):
         self.sheet.set_all_cell_sizes_to_text()  # Resize cells
@@ -293,19 +393,33 @@ class TabViewEditSets(ttk.Frame):
 
     def save_changes(self):
         """Update edited and deleted rows in SQLite."""
-        # Update all items that have a tracked edit
-        update_user_edited_daily_sets(self.edited_daily_sets)
-
-        # Delete all items that have been staged for deletion
-        delete_daily_sets(self.deleted_daily_sets)
+        # The writer thread runs these in order: update all items that have a
+        # tracked edit, then delete all items that have been staged for deletion.
+        # Pass copies, since the lists are cleared below.
+        edit_future = writer.submit(update_user_edited_daily_sets, list(self.edited_daily_sets))
+        delete_future = writer.submit(delete_daily_sets, list(self.deleted_daily_sets))
 
         # Clear the lists that are tracking changes
         self.edited_daily_sets.clear()
         self.deleted_daily_sets.clear()
 
-        # Update this tab
-        self.update_sheet()
+        # Update this tab once the writes are committed.
+        self.btn_save.configure(state=DISABLED)
+        self.btn_restore.configure(state=DISABLED)
+        # The deletion is queued last, so it's done when both writes are done.
+        after_future(self, delete_future, lambda f: self.on_save_done(edit_future, delete_future))
+
+    def on_save_done(self, edit_future, delete_future):
+        """
+        Called on the main thread when the saved changes are committed. The
+        sheet is reloaded by the SetsEdited and SetsDeleted events.
+        """
         self.update_btns()
+        if edit_future.exception() or delete_future.exception():
+            self.update_sheet()  # show what is actually stored
+        # re-raise any exception from the writer thread
+        edit_future.result()
+        delete_future.result()
 
     def restore_changes(self):
         """Restore changes that have been staged."""
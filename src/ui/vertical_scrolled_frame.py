@@ -16,6 +16,10 @@ class VerticalScrolledFrame(ttk.Frame):
     any rows or columns you add to the interior frame to keep the layout
     responsive.
 
+    The frame generates a <<Scrolled>> event whenever the visible part of the
+    interior changes (scrolling, resizing, or the interior changing size). See
+    visible_range, and VirtualList for a use.
+
     A "bug/feature" of this class:
     When the window is taller than the frame content, scrolling causes the content
     to move up and down the window.
@@ -40,16 +44,16 @@ class VerticalScrolledFrame(ttk.Frame):
         self.rowconfigure(0, weight=1)
         self.columnconfigure(0, weight=1)
 
-        vscrollbar = ttk.Scrollbar(self, orient=VERTICAL)
-        vscrollbar.grid(row=0, column=1, sticky=NS)
+        self.vscrollbar = ttk.Scrollbar(self, orient=VERTICAL)
+        self.vscrollbar.grid(row=0, column=1, sticky=NS)
 
         self.canvas = Canvas(
             self,
             bd=0,
             width=starting_width, height=starting_height,
-            yscrollcommand=vscrollbar.set)
+            yscrollcommand=self._on_yscroll)
         self.canvas.grid(row=0, column=0, sticky=NSEW)
-        vscrollbar.config(command=self.canvas.yview)
+        self.vscrollbar.config(command=self.canvas.yview)
 
         # Reset the view
         self.canvas.xview_moveto(0)
@@ -61,6 +65,15 @@ class VerticalScrolledFrame(ttk.Frame):
         self.bind_mousewheel()
         self.interior_id = self.canvas.create_window(0, 0, window=self.interior, anchor=NW)
 
+    def _on_yscroll(self, first, last):
+        """Called by the canvas whenever its view changes. Update the scrollbar."""
+        self.vscrollbar.set(first, last)
+        self.event_generate('<<Scrolled>>')
+
+    def visible_range(self) -> tuple[float, float]:
+        """Return the top and bottom of the visible part of the interior frame, in pixels from its top."""
+        return self.canvas.canvasy(0), self.canvas.canvasy(self.canvas.winfo_height())
+
     def _configure_interior(self, event):
         """Configure widgets when the interior frame is configured (resized)"""
         requested_width = self.interior.winfo_reqwidth()
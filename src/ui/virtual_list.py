@@ -0,0 +1,110 @@
+"""
+A list of items in a VerticalScrolledFrame that only builds widgets for the
+items that are on screen.
+
+Each item is a row of the list's frame. An item far from the visible part of
+the frame is an empty placeholder frame of about the same height, so the
+scrollbar stays accurate. As items scroll into view, a view widget is taken
+from a pool (or created, if the pool is empty), filled with the item, and
+gridded in place of the placeholder. Views that scroll far out of view go back
+to the pool. The number of views is bounded by what fits on a few screens, no
+matter how many items there are.
+"""
+from tkinter import ttk
+from typing import Any, Callable
+
+from src.ui.vertical_scrolled_frame import VerticalScrolledFrame
+
+
+class VirtualList:
+    """
+    Usage:
+        virtual_list = VirtualList(scrolled_frame, parent, create_view, show_view, estimate_height)
+        virtual_list.frame.grid(row=0, column=0)
+        virtual_list.set_items(items)
+    """
+
+    def __init__(self,
+                 scrolled_frame: VerticalScrolledFrame,
+                 parent,
+                 create_view: Callable[[ttk.Frame], Any],
+                 show_view: Callable[[Any, Any], None],
+                 estimate_height: Callable[[Any], int]):
+        """
+        :param scrolled_frame: the scrolled frame the list is in. The list
+               follows its <<Scrolled>> events.
+        :param parent: parent of the list's frame, inside scrolled_frame.interior
+        :param create_view: creates an empty view widget, given its parent
+        :param show_view: called with a view and an item, to fill the view
+               with the item. A view is reused for many items.
+        :param estimate_height: height of an item's view in pixels, for its
+               placeholder until the view has been shown
+        """
+        self.scrolled_frame = scrolled_frame
+        self.frame = ttk.Frame(parent)
+        self.frame.columnconfigure(0, weight=1)
+        self.create_view = create_view
+        self.show_view = show_view
+        self.estimate_height = estimate_height
+
+        self.items = []
+        self.placeholders: list[ttk.Frame] = []  # one per item
+        self.views = {}                          # row -> view of the items that are shown
+        self.pool = []                           # views that aren't in use
+        self._update_pending = False
+        scrolled_frame.bind('<<Scrolled>>', self.schedule_update, add='+')
+
+    def set_items(self, items: list) -> None:
+        """Replace the items. Only the views that end up on screen are filled."""
+        for row in list(self.views):
+            self._release(row)
+        for placeholder in self.placeholders:
+            placeholder.destroy()
+        self.items = list(items)
+        self.placeholders = []
+        for row, item in enumerate(self.items):
+            placeholder = ttk.Frame(self.frame, width=1, height=self.estimate_height(item))
+            placeholder.grid(row=row, column=0, padx=5, pady=5, sticky='EW')
+            self.placeholders.append(placeholder)
+        self.schedule_update()
+
+    def schedule_update(self, event=None) -> None:
+        """Update the shown views once Tk is idle. Scrolling generates many events."""
+        if not self._update_pending:
+            self._update_pending = True
+            self.frame.after_idle(self.update_views)
+
+    def update_views(self) -> None:
+        """Show the items within one screen of the visible part of the list, and release the others."""
+        self._update_pending = False
+        if not self.items or not self.frame.winfo_viewable():
+            return
+        self.frame.update_idletasks()  # lay out new placeholders, to get their positions
+        top, bottom = self.scrolled_frame.visible_range()
+        margin = bottom - top
+        offset = self.frame.winfo_rooty() - self.scrolled_frame.interior.winfo_rooty()
+        for row in range(len(self.items)):
+            widget = self.views.get(row, self.placeholders[row])
+            y = offset + widget.winfo_y()
+            near = y + widget.winfo_height() >= top - margin and y <= bottom + margin
+            if near and row not in self.views:
+                self._show(row)
+            elif not near and row in self.views:
+                self._release(row)
+
+    def _show(self, row: int) -> None:
+        view = self.pool.pop() if self.pool else self.create_view(self.frame)
+        self.show_view(view, self.items[row])
+        self.placeholders[row].grid_remove()
+        view.grid(row=row, column=0, padx=5, pady=5)
+        self.views[row] = view
+
+    def _release(self, row: int) -> None:
+        view = self.views.pop(row)
+        # The view's real height is a better estimate from now on.
+        height = view.winfo_height()
+        if height > 1:
+            self.placeholders[row].configure(height=height)
+        view.grid_forget()
+        self.placeholders[row].grid()
+        self.pool.append(view)
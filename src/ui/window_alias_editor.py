@@ -7,7 +7,8 @@ from tkinter import ttk
 from tkinter.constants import END, INSERT, SEL
 from tkinter.scrolledtext import ScrolledText
 
-from src.sql_utility import ALIASES_FILE, update_daily_sets_to_alias
+from src.common import after_future
+from src.sql_utility import ALIASES_FILE, update_daily_sets_to_alias, writer
 
 WINDOW_HEIGHT = 100
 WINDOW_WIDTH = 100
@@ -79,7 +80,10 @@ class WindowAliasEditor(Toplevel):
         with open(ALIASES_FILE, 'w') as f:
             f.write(after_edits)
 
-        update_daily_sets_to_alias()  # update SQLite
+        # Update SQLite on the writer thread. This window may be closed before
+        # the update finishes, so poll from the Import Sets tab.
+        future = writer.submit(update_daily_sets_to_alias)
+        after_future(self.tab_import_sets, future, lambda f: f.result())
 
     def close_window(self):
         # Check if the file has been modified, and ask the user if they want to
@@ -1,6 +1,18 @@
+from datetime import date
+import os
+import tempfile
 from unittest import TestCase
+from unittest.mock import MagicMock, patch
 
+import src.common as common
+from src.events import SetsEdited, bus
+import src.exercise_normalizer as normalizer
+from src.obj.exercise_set_columns import ExerciseSetColumns, to_epoch_day
+from src.plot_renderer import PlotRenderer, PlotSpec
+from src.sets_parser import SetGroup, parse_sets_string
 import src.sql_utility as su
+from src.ui.lazy_tab import RefreshWhenShown
+import src.ui.tab_progress_plots as plots
 import src.ui.tab_training_arcs as arcs
 
 class TestFunctions(TestCase):
@@ -20,4 +32,131 @@ class TestFunctions(TestCase):
         self.assertEqual(
             "10,9,5 @ 155",
             arcs.format_sets_string_for_cell("10, 9, 5 @ 155"),
-        )
\ No newline at end of file
+        )
+
+    def test_compress_html_with_zdict(self):
+        with open("html/my_workouts.html", 'r') as f:
+            content = f.read()
+        zdict = common.train_zdict([content])
+        self.assertLessEqual(len(zdict), common.ZDICT_MAX_SIZE)
+        for d in (None, common.DEFAULT_ZDICT, zdict):
+            self.assertEqual(content, common.decompress_html(common.compress_html(content, d), d))
+        self.assertLess(len(common.compress_html(content, zdict)), len(common.compress_html(content)))
+
+    def test_html_file_reader(self):
+        html_file = "html/my_workouts.html"
+        with open(html_file, 'r') as f:
+            content = f.read()
+        reader = common.HtmlFileReader(html_file, zdict=common.DEFAULT_ZDICT)
+        self.assertEqual(content.rstrip('\n').split('\n'), list(reader.lines()))
+        self.assertEqual(common.hash_html(content), reader.file_hash)
+        self.assertEqual(common.hash_html(content), common.hash_html_file(html_file))
+        self.assertEqual(content, common.decompress_html(reader.compressed_content, common.DEFAULT_ZDICT))
+
+    def test_normalize_exercise(self):
+        n = normalizer.ExerciseNormalizer(normalizer.BUILTIN_RULES)
+        # Expected names are what the chained str.replace version produced.
+        for ln, expected in [
+            ("<li>rear delt rows ss1", "rear delt row"),
+            ("<div>hex bar deadlifts (heavy)", "hb deadlift"),
+            ("<li>triceps pushdowns", "tri pushdown"),
+            ("<li>t-bar rows", "tbar row"),
+            ("<li>ez bar curls; close grip", "ezbar curl, close grip"),
+            ("<li>pull-ups (bw)", "pullup"),
+            ("<li>dumbbell lateral raises", "db lateral raise"),
+        ]:
+            self.assertEqual(expected, n.normalize(ln))
+
+    def test_normalize_exercise_with_user_rules(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            rules_file = os.path.join(tmp_dir, "replacements.txt")
+            with open(rules_file, 'w') as f:
+                f.write("# comment\nPull Down -> pulldown\nnot a rule\n")
+            n = normalizer.get_normalizer(rules_file)
+            self.assertEqual("lat pulldown", n.normalize("<li>lat pull downs"))
+            self.assertIs(n, normalizer.get_normalizer(rules_file))
+
+    def test_parse_sets_string(self):
+        self.assertEqual(
+            (SetGroup(2, 8, 135.0, False), SetGroup(1, 6, 145.0, False), SetGroup(1, 5, 145.0, False)),
+            parse_sets_string("2x8@135, 6,5@145").groups,
+        )
+        self.assertEqual(
+            (SetGroup(1, 6, 22.5, True), SetGroup(1, 7, 22.5, True), SetGroup(1, 4, 22.5, False)),
+            parse_sets_string("~6, 5+~2, 4.5@22.5").groups,
+        )
+        self.assertEqual((SetGroup(3, 10, 0.0, False),), parse_sets_string("3x10").groups)
+        s = "12@40"
+        self.assertIs(parse_sets_string(s), parse_sets_string(s))
+
+    def test_parse_sets_string_errors(self):
+        self.assertEqual([3], [e.position for e in parse_sets_string("4+ @ 245").errors])
+        self.assertEqual([1], [e.position for e in parse_sets_string("8~8@230").errors])
+        # Once there is a weight, every item needs one.
+        self.assertEqual(1, len(parse_sets_string("8@135, 6").errors))
+        self.assertFalse(su.is_sets_string_valid("3x@100"))
+
+    def test_exercise_set_columns(self):
+        day = to_epoch_day(date(2025, 6, 1))
+        sets = ExerciseSetColumns.from_rows("bb bench", [(day, 8, 135, 0), (day, 5, 17.3, 1), (day + 2, 12, 95, 0)])
+        self.assertEqual(["8@135", "5@17.3", "12@95"], [s.simple_str() for s in sets])
+        self.assertTrue(sets[1].partial_reps)
+        self.assertEqual(date(2025, 6, 3), sets.last_date)
+
+        self.assertEqual([8, 5], sets.between(end_date=date(2025, 6, 2)).reps.tolist())
+        self.assertEqual([12], sets.between(date(2025, 6, 2), date(2025, 6, 3)).reps.tolist())
+        self.assertEqual([8, 12], sets.with_reps(min_reps=6).reps.tolist())
+        self.assertEqual(0, len(sets.between(date(2025, 6, 2)).with_reps(max_reps=5)))
+
+    def test_build_sets_string(self):
+        self.assertEqual("2x8,7@200, 6@210", plots.build_sets_string(
+            [(200, 8, False), (200, 8, False), (200, 7, False), (210, 6, False)]))
+        self.assertEqual("10x5@22.5", plots.build_sets_string([(22.5, 5, False)] * 10))
+        self.assertEqual("12,~10", plots.build_sets_string([(0, 12, False), (0, 10, True)]))
+
+    def test_render_sets_text(self):
+        day = to_epoch_day(date(2025, 6, 1))
+        sets = ExerciseSetColumns.from_rows("bb bench", [(day, 8, 135, 0), (day, 8, 135, 0), (day + 2, 5, 17.3, 0)])
+        self.assertEqual("2025-06-01\n 2x8@135\n\n2025-06-03\n 5@17.3\n\n", plots.render_sets_text(sets))
+        self.assertEqual("2025-06-03\n 5@17.3\n\n", plots.render_sets_text(sets, date(2025, 6, 2)))
+        self.assertIs(plots.render_sets_text(sets), plots.render_sets_text(sets))
+
+    def test_progress_plots_redraw_on_sets_changed(self):
+        # A bare tab, without widgets, since there is no display.
+        tab = plots.TabProgressPlots.__new__(plots.TabProgressPlots)
+        tab.bind = MagicMock()
+        tab.winfo_viewable = MagicMock(return_value=True)
+        tab.combobox = MagicMock()
+        tab.combobox.get.return_value = "bb bench"
+        tab.update_text_area = MagicMock()
+        tab._show_plots = MagicMock()
+        refresher = RefreshWhenShown(tab, tab.on_sets_changed)
+        self.addCleanup(refresher.unsubscribe)
+
+        with patch.object(plots, 'get_exercise_sets_dict', return_value={"bb bench": None, "squat": None}):
+            bus.publish(SetsEdited((1,), frozenset({"squat"})))
+            bus.dispatch_pending()
+            tab._show_plots.assert_not_called()
+
+            bus.publish(SetsEdited((2,), frozenset({"bb bench"})))
+            bus.dispatch_pending()
+        tab.update_text_area.assert_called_once_with()
+        tab._show_plots.assert_called_once_with()
+
+    def test_plot_renderer(self):
+        day = to_epoch_day(date(2025, 6, 1))
+        sets = ExerciseSetColumns.from_rows("bb bench", [(day, 8, 135, 0), (day + 2, 5, 145, 0)])
+        spec = PlotSpec("bb bench", date(2025, 6, 1), date(2025, 6, 3), 1, 9,
+                        sets.days, sets.weights, sets.reps, (3.2, 2.4), 8, 5)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            renderer = PlotRenderer(cache_dir=tmp_dir, max_workers=1)
+            self.addCleanup(renderer.shutdown)
+            png_file = renderer.render(spec).result(timeout=60)
+            with open(png_file, 'rb') as f:
+                self.assertEqual(b"\x89PNG", f.read(4))
+
+            # The second render is a cache hit. Different data is a miss.
+            self.assertTrue(renderer.render(spec).done())
+            self.assertNotEqual(png_file, renderer.cached_file(spec._replace(weights=sets.weights + 5)))
+            renderer.prune(max_files=0)
+            self.assertFalse(os.path.exists(png_file))
@@ -0,0 +1,405 @@
+import datetime
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest import TestCase
+
+import src.common as common
+import src.events as events
+import src.sql_migrations as migrations
+import src.sql_utility as su
+
+LITE_HTML = "html/my_workouts_lite.html"
+
+
+class TestSqlUtility(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        su.db.open(os.path.join(self.tmp_dir.name, "test.db"))
+        su.create_tables()
+
+    def tearDown(self):
+        su.db.open(su.SQLITE_FILE)
+        self.tmp_dir.cleanup()
+
+    def test_connection_is_reused(self):
+        self.assertIs(su.db.get_connection(), su.db.get_connection())
+
+    def test_exercise_sets_cache(self):
+        su.import_sets_via_html(LITE_HTML)
+        esd = su.get_exercise_sets_dict()
+        bb_bench_sets = esd["bb bench"]
+        self.assertIs(esd, su.get_exercise_sets_dict())
+
+        # Only the edited exercise is rebuilt.
+        rowid = su.get_daily_sets_page(exercise="db bench")[0][0][0]
+        su.writer.submit(su.update_user_edited_daily_sets,
+                         [("2025-06-27", "db bench", "12@40", "", rowid)]).result(timeout=10)
+        esd = su.get_exercise_sets_dict()
+        self.assertEqual(["12@40"], [s.simple_str() for s in esd["db bench"]])
+        self.assertIs(bb_bench_sets, esd["bb bench"])
+
+    def test_exercise_table(self):
+        su.import_sets_via_html(LITE_HTML)
+        self.assertEqual(datetime.date(2021, 5, 31), su.get_first_date("bb bench"))
+        self.assertEqual(datetime.date(2021, 5, 31), su.get_first_date())
+        with su.db.cursor() as cur:
+            set_count = cur.execute("SELECT set_count FROM exercise WHERE name = 'bb bench'").fetchone()[0]
+        self.assertEqual(len(su.get_exercise_sets_dict()["bb bench"]), set_count)
+
+        # Renaming the only db bench item moves it to a new exercise.
+        rowid = su.get_daily_sets_page(exercise="db bench")[0][0][0]
+        su.update_user_edited_daily_sets([("2024-01-01", "incline db bench", "12@40", "", rowid)])
+        self.assertEqual(["bb bench", "incline db bench"], su.get_exercises())
+        self.assertEqual(datetime.date(2024, 1, 1), su.get_first_date("incline db bench"))
+        self.assertEqual(["12@40"], [s.simple_str() for s in su.get_exercise_sets_dict()["incline db bench"]])
+        self.assertNotIn("db bench", su.get_exercise_sets_dict())
+
+        # The first date moves forward when the earliest item is deleted.
+        rowid = su.get_daily_sets_page(exercise="bb bench", descending=False)[0][0][0]
+        su.delete_daily_sets([(rowid,)])
+        self.assertEqual(datetime.date(2025, 6, 26), su.get_first_date("bb bench"))
+
+    def test_update_daily_sets_to_alias(self):
+        su.ALIASES_FILE = os.path.join(self.tmp_dir.name, "aliases.txt")
+        self.addCleanup(setattr, su, "ALIASES_FILE", os.path.join("usr", "aliases.txt"))
+        with open(su.ALIASES_FILE, 'w') as f:
+            f.write(".bb bench\nbench\n")
+        su.import_sets_via_html(LITE_HTML)
+        self.assertEqual(["bb bench", "db bench"], su.get_exercises())
+        bb_bench_set_count = len(su.get_exercise_sets_dict()["bb bench"])
+
+        # Alias db bench to bb bench, then remove every alias.
+        with open(su.ALIASES_FILE, 'w') as f:
+            f.write(".bb bench\nbench\ndb bench\n")
+        su.update_daily_sets_to_alias()
+        self.assertEqual(["bb bench"], su.get_exercises())
+        self.assertEqual(bb_bench_set_count + 1, len(su.get_exercise_sets_dict()["bb bench"]))
+        self.assertEqual(1, len(su.get_daily_sets_page(search="db")[0]))
+
+        with open(su.ALIASES_FILE, 'w') as f:
+            f.write("")
+        su.update_daily_sets_to_alias()
+        self.assertEqual(["bb bench", "bench", "db bench"], su.get_exercises())
+
+        # An item renamed by the user keeps its new name.
+        rowid = su.get_daily_sets_page(exercise="db bench")[0][0][0]
+        su.update_user_edited_daily_sets([("2025-06-27", "incline db bench", "10@50", "", rowid)])
+        su.update_daily_sets_to_alias()
+        self.assertEqual(["bb bench", "bench", "incline db bench"], su.get_exercises())
+
+    def test_daily_sets_pages(self):
+        su.import_sets_via_html("html/my_workouts.html")
+        all_rows, next_key = su.get_daily_sets_page(sort_column="Exercise", descending=False, limit=100000)
+        self.assertIsNone(next_key)
+
+        paged_rows = []
+        next_key = None
+        while True:
+            rows, next_key = su.get_daily_sets_page(sort_column="Exercise", descending=False,
+                                                    after=next_key, limit=250)
+            paged_rows += rows
+            if next_key is None:
+                break
+        self.assertEqual(all_rows, paged_rows)
+        exercises = [row[2] for row in paged_rows]
+        self.assertEqual(sorted(exercises), exercises)
+
+        # Items without a date (lines before the first <h2>) are paged too.
+        with su.db.transaction() as cur:
+            cur.execute("UPDATE daily_sets SET date = NULL WHERE id IN (SELECT id FROM daily_sets LIMIT 3)")
+        for descending in (True, False):
+            all_rows, _ = su.get_daily_sets_page(descending=descending, limit=100000)
+            paged_rows = []
+            next_key = None
+            while True:
+                rows, next_key = su.get_daily_sets_page(descending=descending, after=next_key, limit=7)
+                paged_rows += rows
+                if next_key is None:
+                    break
+            self.assertEqual(all_rows, paged_rows)
+
+    def test_daily_sets_page_plan(self):
+        su.import_sets_via_html("html/my_workouts.html")
+        # Capture the page queries with their parameters, to explain them.
+        statements = []
+        con = su.db.get_connection()
+        con.set_trace_callback(statements.append)
+        try:
+            _, next_key = su.get_daily_sets_page()
+            su.get_daily_sets_page(after=next_key)
+            su.get_daily_sets_page(descending=False)
+        finally:
+            con.set_trace_callback(None)
+        page_statements = [statement for statement in statements if "LIMIT" in statement]
+        self.assertEqual(3, len(page_statements))
+        plans = [[row[3] for row in con.execute("EXPLAIN QUERY PLAN " + statement)]
+                 for statement in page_statements]
+        for plan in plans:
+            self.assertIn("idx_daily_sets_sort_date", plan[0])
+            self.assertFalse(any("TEMP B-TREE" in step for step in plan), plan)
+        # The next page seeks to its first row, instead of scanning the earlier pages.
+        self.assertTrue(plans[1][0].startswith("SEARCH"), plans[1])
+
+    def test_search(self):
+        su.import_sets_via_html("html/my_workouts.html")
+        rows, _ = su.get_daily_sets_page(search="shoulder pain", sort_column=su.RELEVANCE)
+        self.assertEqual(1, len(rows))
+        self.assertIn("right shoulder pain", rows[0][4])
+
+        # Prefix match on the last word, and syntax characters are ignored.
+        rows, _ = su.get_daily_sets_page(search='"should-', limit=100000)
+        self.assertTrue(all("should" in (row[4] + row[6]).lower() for row in rows))
+
+    def test_wal_mode(self):
+        with su.db.cursor() as cur:
+            self.assertEqual("wal", cur.execute("PRAGMA journal_mode").fetchone()[0])
+
+    def test_writer_thread_import(self):
+        future = su.writer.submit(su.import_sets_via_html, LITE_HTML)
+        future.result(timeout=10)
+        # The main thread reads through its own connection.
+        self.assertEqual(1, len(su.get_imports()))
+
+    def test_transaction_rolls_back_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with su.db.transaction() as cur:
+                cur.execute("INSERT INTO import(name) VALUES ('doomed')")
+                raise RuntimeError
+        self.assertEqual([], su.get_imports())
+
+    def test_change_events(self):
+        received = []
+        unsubscribe = events.bus.subscribe(events.SETS_CHANGED, received.append)
+        self.addCleanup(unsubscribe)
+        events.bus.dispatch_pending()
+        received.clear()
+
+        su.import_sets_via_html(LITE_HTML)
+        import_id = su.get_imports()[0][2]
+        rowid = su.get_daily_sets_page(exercise="db bench")[0][0][0]
+        su.update_user_edited_daily_sets([("2024-01-01", "incline db bench", "12@40", "", rowid)])
+        su.delete_daily_sets([(rowid,)])
+        su.delete_import(import_id)
+        # Nothing is published for a write that is rolled back.
+        with self.assertRaises(RuntimeError):
+            with su.db.transaction() as cur:
+                su.delete_daily_sets([(1,)])
+                raise RuntimeError
+        self.assertEqual([], received)  # queued until dispatched
+
+        events.bus.dispatch_pending()
+        self.assertEqual([events.SetsImported((import_id,), frozenset({"bb bench", "db bench"})),
+                          events.SetsEdited((rowid,), frozenset({"db bench", "incline db bench"})),
+                          events.SetsDeleted((rowid,), frozenset({"incline db bench"})),
+                          events.ImportDeleted(import_id, frozenset({"bb bench"}))], received)
+
+    def test_import_and_delete(self):
+        su.import_sets_via_html(LITE_HTML)
+        imports = su.get_imports()
+        self.assertEqual(1, len(imports))
+        self.assertEqual(["bb bench", "db bench"], su.get_exercises())
+
+        su.delete_import(imports[0][2])
+        self.assertEqual([], su.get_imports())
+        self.assertEqual([], su.get_exercises())
+
+    def test_sets_before_first_header(self):
+        with open(LITE_HTML, 'r') as f:
+            content = f.read()
+        content = content.replace("<h2>5/31/2021</h2>", "<div>Warmup bench: 10@45</div>\n<h2>5/31/2021</h2>")
+        html_file = os.path.join(self.tmp_dir.name, "preamble.html")
+        with open(html_file, 'w') as f:
+            f.write(content)
+
+        su.import_sets_via_html(html_file)
+        with su.db.cursor() as cur:
+            self.assertEqual(4, cur.execute("SELECT COUNT(*) FROM daily_sets").fetchone()[0])
+            self.assertEqual(1, cur.execute("SELECT COUNT(*) FROM daily_sets WHERE date IS NULL").fetchone()[0])
+        # The undated item has no individual sets, the others still do.
+        self.assertEqual(["bb bench", "db bench"], sorted(su.get_exercise_sets_dict().keys()))
+        # Its exercise is listed until its only item is deleted.
+        self.assertEqual(["bb bench", "db bench", "warmup bench"], su.get_exercises())
+        rowid = su.get_daily_sets_page(exercise="warmup bench")[0][0][0]
+        su.delete_daily_sets([(rowid,)])
+        self.assertEqual(["bb bench", "db bench"], su.get_exercises())
+
+    def test_identical_files_share_content(self):
+        su.import_sets_via_html(LITE_HTML)
+        su.import_sets_via_html(LITE_HTML)
+        (_, _, first_id), (_, _, second_id) = su.get_imports()
+        file_hash, content, _ = su.get_file_hash_and_content(first_id)
+        self.assertTrue(su.is_file_imported(file_hash))
+        with su.db.cursor() as cur:
+            self.assertEqual(1, cur.execute("SELECT count(*) FROM import_file").fetchone()[0])
+
+        # The content is kept until the last import of the file is deleted.
+        su.delete_import(first_id)
+        self.assertEqual(content, su.get_file_hash_and_content(second_id)[1])
+        su.delete_import(second_id)
+        self.assertFalse(su.is_file_imported(file_hash))
+        with su.db.cursor() as cur:
+            self.assertEqual(0, cur.execute("SELECT count(*) FROM import_file").fetchone()[0])
+
+    def test_compression_dictionary(self):
+        files = [LITE_HTML, "html/my_workouts.html", "html/my_workouts_edited_copy.html"]
+        for html_file in files:
+            su.import_sets_via_html(html_file)
+
+        # A dictionary was trained from the first two files, and every file
+        # still decompresses to its original content.
+        with su.db.cursor() as cur:
+            dictionaries = cur.execute("SELECT sample_count FROM compression_dictionary").fetchall()
+        self.assertEqual([(2,)], dictionaries)
+        for html_file, (_, _, import_id) in zip(files, su.get_imports()):
+            with open(html_file, 'r') as f:
+                self.assertEqual(f.read(), common.decompress_html(*su.get_file_hash_and_content(import_id)[1:]))
+
+    def test_batch_import(self):
+        files = [LITE_HTML, "html/my_workouts.html", "html/my_workouts_edited_copy.html"]
+        for html_file in files:
+            su.import_sets_via_html(html_file)
+        with su.db.cursor() as cur:
+            expected = cur.execute("SELECT date, sets_string, line FROM daily_sets ORDER BY id").fetchall()
+
+        # Import the same files (and a duplicate) into a fresh database.
+        su.db.open(os.path.join(self.tmp_dir.name, "batch.db"))
+        su.create_tables()
+        batch_dir = os.path.join(self.tmp_dir.name, "batch")
+        os.mkdir(batch_dir)
+        for i, html_file in enumerate(files + [LITE_HTML]):
+            shutil.copy(html_file, os.path.join(batch_dir, f"{i}.html"))
+        import_ids = su.import_html_files(batch_dir, max_workers=2)
+        self.assertEqual(3, len(import_ids))
+        with su.db.cursor() as cur:
+            actual = cur.execute("SELECT date, sets_string, line FROM daily_sets ORDER BY id").fetchall()
+        self.assertEqual(expected, actual)
+        self.assertEqual("0.html", su.get_imports()[0][0].split(",")[0])
+
+        # Every file is already imported now.
+        self.assertEqual([], su.import_html_files(os.path.join(batch_dir, "*.html")))
+
+    def test_incremental_import(self):
+        su.import_sets_via_html(LITE_HTML, incremental=True)
+
+        # A newer, cumulative export: one day changed and one day was added.
+        with open(LITE_HTML, 'r') as f:
+            content = f.read()
+        content = content.replace("3x8@115", "3x8@120")
+        content = content.replace("</body>", "<h2>7/1/25</h2>\n<div>BB Bench: 5@135</div>\n</body>")
+        newer_html = os.path.join(self.tmp_dir.name, "newer.html")
+        with open(newer_html, 'w') as f:
+            f.write(content)
+
+        su.import_sets_via_html(newer_html, incremental=True)
+        with su.db.cursor() as cur:
+            rows = cur.execute("SELECT date, sets_string FROM daily_sets ORDER BY date, id").fetchall()
+        self.assertEqual([("2021-05-31", "10@65, ~8@70, 5+1@75, 4, 5@80, 2x3@85, 2x2, ~1@90"),
+                          ("2025-06-26", "10@50"),
+                          ("2025-06-26", "3x8@120"),
+                          ("2025-07-01", "5@135")], rows)
+        self.assertEqual(2, len(su.get_imports()))
+
+        # Nothing is new the second time.
+        su.import_sets_via_html(newer_html, incremental=True)
+        self.assertEqual(2, len(su.get_imports()))
+
+    def test_incremental_import_keeps_other_files(self):
+        def write_html(name, bench_sets):
+            html_file = os.path.join(self.tmp_dir.name, name)
+            with open(html_file, 'w') as f:
+                f.write(f"<html><body>\n<h2>6/26/25</h2>\n<div>BB Bench: {bench_sets}</div>\n</body></html>\n")
+            return html_file
+
+        def get_sets_strings():
+            with su.db.cursor() as cur:
+                return [s for (s,) in cur.execute("SELECT sets_string FROM daily_sets ORDER BY id")]
+
+        # Two unrelated files with a workout on the same day as the export.
+        su.import_sets_via_html(write_html("log.html", "5@225"))
+        su.import_sets_via_html(write_html("export_1.html", "3x8@115"), incremental=True)
+        su.import_sets_via_html(write_html("other.html", "3x8@120"))
+        self.assertEqual(["5@225", "3x8@115", "3x8@120"], get_sets_strings())
+
+        # A newer export only replaces the day of the earlier export.
+        su.import_sets_via_html(write_html("export_2.html", "3x8@125"), incremental=True)
+        self.assertEqual(["5@225", "3x8@120", "3x8@125"], get_sets_strings())
+
+    def test_training_arcs(self):
+        days = [("1/1/24", "BB Bench"), ("1/4/24", "BB Bench"), ("1/7/24", "BB Bench"), ("1/10/24", "BB Bench"),
+                ("1/13/24", "BB Bench"), ("2/1/24", "Squat"), ("2/5/24", "Squat"),
+                ("3/1/24", "BB Bench"), ("3/3/24", "BB Bench"),  # too short, dropped
+                ("6/1/24", "BB Bench"), ("6/2/24", "BB Bench")]  # short, but the most recent
+        html_file = os.path.join(self.tmp_dir.name, "arcs.html")
+        with open(html_file, 'w') as f:
+            f.write("<html><body>\n" + "".join(f"<h2>{day}</h2>\n<div>{exercise}: 5@100</div>\n"
+                                                for day, exercise in days) + "</body></html>\n")
+        su.import_sets_via_html(html_file)
+
+        d = datetime.date
+        self.assertEqual([su.ArcSummary("bb bench", 1, d(2024, 1, 1), d(2024, 1, 13), 5),
+                          su.ArcSummary("squat", 1, d(2024, 2, 1), d(2024, 2, 5), 2),
+                          su.ArcSummary("bb bench", 3, d(2024, 6, 1), d(2024, 6, 2), 2)],
+                         su.get_arc_summaries(separator=30))
+        self.assertEqual([1, 1, 1, 1, 1, 3, 3], [row[0] for row in su.get_arc_daily_sets("bb bench", separator=30)])
+        # With a shorter separator, every arc but the last is too short.
+        self.assertEqual([su.ArcSummary("bb bench", 7, d(2024, 6, 1), d(2024, 6, 2), 2)],
+                         su.get_arc_summaries("bb bench", separator=3))
+
+    def test_exercise_sets_are_materialized(self):
+        su.import_sets_via_html(LITE_HTML)
+        esd = su.get_exercise_sets_dict()
+        self.assertEqual(["8@115", "8@115", "8@115"], [s.simple_str() for s in esd["bb bench"][-3:]])
+
+        # Editing a row replaces its sets. Deleting it removes them.
+        rowid = su.get_daily_sets_page(exercise="db bench")[0][0][0]
+        su.update_user_edited_daily_sets([("2025-06-27", "db bench", "2x12@40", "", rowid)])
+        self.assertEqual(["12@40", "12@40"], [s.simple_str() for s in su.get_exercise_sets_dict()["db bench"]])
+        su.delete_daily_sets([(rowid,)])
+        self.assertNotIn("db bench", su.get_exercise_sets_dict())
+
+
+class TestSqlMigrations(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.tmp_dir.name, "legacy.db")
+
+    def tearDown(self):
+        su.db.open(su.SQLITE_FILE)
+        self.tmp_dir.cleanup()
+
+    def test_legacy_file_is_upgraded_in_place(self):
+        # A file created before migrations existed: version 0, no keys.
+        con = sqlite3.connect(self.db_file)
+        migrations._migration_1_create_tables(con.cursor())
+        con.execute("INSERT INTO import(rowid, name) VALUES (7, 'old import')")
+        con.execute("INSERT INTO daily_sets(rowid, exercise, date, import_id) VALUES (3, 'bb bench', '2024-01-01', 7)")
+        con.execute("INSERT INTO daily_sets(rowid, exercise, date, import_id) VALUES (4, 'bb bench', '2024-01-02', 99)")
+        # A line from before the first <h2> of a file has no date.
+        con.execute("""INSERT INTO daily_sets(rowid, exercise, date, sets_string, is_valid, import_id)
+                       VALUES (5, 'bb bench', NULL, '10@45', 1, 7)""")
+        con.commit()
+        con.close()
+
+        su.db.open(self.db_file)
+        su.create_tables()
+        self.assertEqual(migrations.SCHEMA_VERSION, migrations.get_schema_version(su.db))
+
+        self.assertEqual(["bb bench"], su.get_exercises())
+        with su.db.cursor() as cur:
+            rows = cur.execute("SELECT id, import_id FROM daily_sets ORDER BY id").fetchall()
+            indexes = {r[0] for r in cur.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        # rowids survive the rebuild, and the dangling reference is dropped.
+        self.assertEqual([(3, 7), (4, None), (5, 7)], rows)
+        self.assertIn("idx_daily_sets_exercise_date", indexes)
+
+        su.delete_import(7)
+        with su.db.cursor() as cur:
+            self.assertEqual([(4,)], cur.execute("SELECT id FROM daily_sets").fetchall())
+
+    def test_migrate_is_idempotent(self):
+        su.db.open(self.db_file)
+        su.create_tables()
+        su.create_tables()
+        self.assertEqual(migrations.SCHEMA_VERSION, migrations.get_schema_version(su.db))